@@ -44,7 +44,7 @@ export function useChatQuery(apiBase: string) {
       let completed = false;
 
       try {
-        const payload: Record<string, unknown> = { query: queryText, stream: true };
+        const payload: Record<string, unknown> = { query: queryText, stream: true, framing: "compact" };
         if (fileIds && fileIds.length > 0) {
           payload.file_ids = fileIds;
         }
@@ -120,10 +120,12 @@ export function useChatQuery(apiBase: string) {
                 toast.error("Stream error occurred");
               }
               return;
-            } else if (eventType !== "end" && data) {
+            } else if (eventType === "message" && data) {
+              // Only unnamed events carry answer tokens; others (e.g. "queued") are status
               try {
                 const chunk = JSON.parse(data);
-                streamedAnswer += chunk.cleaned;
+                // Compact framing sends coalesced {text}; legacy sends {raw, cleaned}
+                streamedAnswer += chunk.text ?? chunk.cleaned;
                 setCurrentAnswer(streamedAnswer);
               } catch {
                 streamedAnswer += data;
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from alembic import context
+
+from backend import models  # noqa: F401  (registers tables on Base.metadata)
+from backend.database import Base, engine
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=str(engine.url),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # Reuse the app engine so migrations get the same connect-time pragmas
+    with engine.connect() as connection:
+        # SQLite cannot ALTER most constraints; batch mode recreates tables instead
+        context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
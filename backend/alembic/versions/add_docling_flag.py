@@ -0,0 +1,26 @@
+"""Add converted_with_docling field to files table
+
+Replaces the former one-off migrate_add_docling_field.py script.
+
+Revision ID: add_docling_flag
+Revises: initial_schema
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'add_docling_flag'
+down_revision = 'initial_schema'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    columns = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('files')}
+    if 'converted_with_docling' not in columns:
+        op.add_column('files', sa.Column('converted_with_docling', sa.Boolean(), nullable=True, server_default=sa.false()))
+
+
+def downgrade() -> None:
+    op.drop_column('files', 'converted_with_docling')
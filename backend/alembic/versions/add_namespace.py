@@ -0,0 +1,28 @@
+"""Add namespace field to files table
+
+Revision ID: add_namespace
+Revises: add_raw_markdown
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'add_namespace'
+down_revision = 'add_raw_markdown'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing files move into the default namespace (the original collection)
+    inspector = sa.inspect(op.get_bind())
+    if 'namespace' not in {c['name'] for c in inspector.get_columns('files')}:
+        op.add_column('files', sa.Column('namespace', sa.String(64), nullable=False, server_default='default'))
+    if 'ix_files_namespace' not in {ix['name'] for ix in inspector.get_indexes('files')}:
+        op.create_index('ix_files_namespace', 'files', ['namespace'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_files_namespace', table_name='files')
+    op.drop_column('files', 'namespace')
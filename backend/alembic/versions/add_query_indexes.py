@@ -0,0 +1,31 @@
+"""Add indexes for per-file chunk lookups and file listings
+
+Revision ID: add_query_indexes
+Revises: add_token_count
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'add_query_indexes'
+down_revision = 'add_token_count'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    chunk_indexes = {ix['name'] for ix in inspector.get_indexes('chunks')}
+    file_indexes = {ix['name'] for ix in inspector.get_indexes('files')}
+    # Leading column serves chunks.file_id lookups; the pair serves ordered per-file reads
+    if 'ix_chunks_file_id_chunk_index' not in chunk_indexes:
+        op.create_index('ix_chunks_file_id_chunk_index', 'chunks', ['file_id', 'chunk_index'])
+    # GET /files: WHERE deleted = 0 ORDER BY uploaded_at DESC
+    if 'ix_files_deleted_uploaded_at' not in file_indexes:
+        op.create_index('ix_files_deleted_uploaded_at', 'files', ['deleted', 'uploaded_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_files_deleted_uploaded_at', table_name='files')
+    op.drop_index('ix_chunks_file_id_chunk_index', table_name='chunks')
@@ -1,17 +1,24 @@
 """Add raw_markdown field to files table
 
 Revision ID: add_raw_markdown
-Revises: 
+Revises: add_docling_flag
 Create Date: 2024-12-14
 
 """
 from alembic import op
 import sqlalchemy as sa
 
+revision = 'add_raw_markdown'
+down_revision = 'add_docling_flag'
+branch_labels = None
+depends_on = None
+
 
 def upgrade() -> None:
     # Add raw_markdown column to files table if it doesn't exist
-    op.add_column('files', sa.Column('raw_markdown', sa.Text(), nullable=True))
+    columns = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('files')}
+    if 'raw_markdown' not in columns:
+        op.add_column('files', sa.Column('raw_markdown', sa.Text(), nullable=True))
 
 
 def downgrade() -> None:
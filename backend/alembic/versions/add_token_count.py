@@ -0,0 +1,25 @@
+"""Add token_count field to chunks table
+
+Revision ID: add_token_count
+Revises: add_namespace
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'add_token_count'
+down_revision = 'add_namespace'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Chunks ingested before this revision keep NULL and are counted at query time
+    columns = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('chunks')}
+    if 'token_count' not in columns:
+        op.add_column('chunks', sa.Column('token_count', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('chunks', 'token_count')
@@ -0,0 +1,48 @@
+"""Initial files and chunks tables
+
+Revision ID: initial_schema
+Revises: 
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'initial_schema'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Databases created by Base.metadata.create_all before migrations existed
+    # already have these tables; they are adopted as-is
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'files' not in tables:
+        op.create_table(
+            'files',
+            sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('filename', sa.String(255), nullable=False),
+            sa.Column('filepath', sa.String(512), nullable=False, unique=True),
+            sa.Column('filetype', sa.String(32), nullable=False),
+            sa.Column('size_mb', sa.Float(), nullable=False),
+            sa.Column('uploaded_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.Column('deleted', sa.Boolean(), nullable=True),
+        )
+    if 'chunks' not in tables:
+        op.create_table(
+            'chunks',
+            sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('file_id', sa.Integer(), sa.ForeignKey('files.id', ondelete='CASCADE'), nullable=True),
+            sa.Column('chunk_index', sa.Integer(), nullable=False),
+            sa.Column('content', sa.Text(), nullable=False),
+            sa.Column('section_heading', sa.String(255), nullable=True),
+            sa.Column('page_number', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('chunks')
+    op.drop_table('files')
@@ -0,0 +1,294 @@
+"""Open-loop SSE load test for POST /query: time to context, TTFT, token rate and tails.
+
+Requests arrive at ``--rate`` per second (Poisson by default) for ``--duration``
+seconds, independent of how fast earlier ones finish, so a saturated backend shows
+up as growing latency and errors instead of a silently lower request rate. Each
+stream is parsed as SSE (``context``/``start``/``queued``/data/``timings``/``error``/``end``)
+in either framing.
+
+Against a real model server, or a mock one for repeatable capacity numbers:
+
+    python -m backend.benchmarks.mock_ollama --port 11435 &
+    RAG_OLLAMA_BASE_URL=http://127.0.0.1:11435 uvicorn backend.main:app --port 8000 &
+    python -m backend.benchmarks.loadtest --url http://127.0.0.1:8000 --rate 5 --duration 60 \\
+        --label v0.2.0 --report reports/loadtest-v0.2.0.md --json reports/loadtest-v0.2.0.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+from ..services.tokens import count_tokens
+
+_DEFAULT_QUESTIONS = [
+    "What does the document say about the deployment process?",
+    "Summarise the main findings.",
+    "Which sections discuss performance?",
+    "What are the known limitations?",
+    "How is the data stored?",
+]
+
+
+@dataclass
+class Sample:
+    index: int
+    scheduled_s: float
+    status: int | None = None
+    error: str | None = None
+    time_to_context_ms: float | None = None
+    time_to_start_ms: float | None = None
+    ttft_ms: float | None = None
+    duration_ms: float | None = None
+    tokens: int = 0
+    tokens_per_s: float | None = None
+    queued_events: int = 0
+    correlation_id: str | None = None
+    server_timings: Dict[str, Any] | None = field(default=None, repr=False)
+
+
+class _Run:
+    def __init__(self) -> None:
+        self.inflight = 0
+        self.peak_inflight = 0
+        self.max_dispatch_lag_ms = 0.0
+
+
+def _text(data: str) -> str:
+    try:
+        chunk = json.loads(data)
+    except ValueError:
+        return data
+    if isinstance(chunk, dict):
+        return chunk.get("text") or chunk.get("cleaned") or ""
+    return str(chunk)
+
+
+async def _one(client: httpx.AsyncClient, url: str, payload: Dict[str, Any], sample: Sample, run: _Run) -> Sample:
+    run.inflight += 1
+    run.peak_inflight = max(run.peak_inflight, run.inflight)
+    started = time.perf_counter()
+
+    def elapsed_ms() -> float:
+        return round((time.perf_counter() - started) * 1000, 2)
+
+    pieces: List[str] = []
+    try:
+        async with client.stream("POST", f"{url}/query", json=payload, headers={"Accept": "text/event-stream"}) as resp:
+            sample.status = resp.status_code
+            sample.correlation_id = resp.headers.get("x-correlation-id")
+            if resp.status_code != 200:
+                body = await resp.aread()
+                try:
+                    code = json.loads(body).get("code")
+                except ValueError:
+                    code = None
+                sample.error = f"HTTP {resp.status_code}" + (f" {code}" if code else "")
+                return sample
+            event, data_lines = "message", []
+            async for line in resp.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                    continue
+                if line.startswith("data:"):
+                    data_lines.append(line[5:].removeprefix(" "))
+                    continue
+                if line:
+                    continue
+                # Blank line: dispatch the event
+                data = "\n".join(data_lines)
+                if event == "context":
+                    sample.time_to_context_ms = elapsed_ms()
+                elif event == "start":
+                    sample.time_to_start_ms = elapsed_ms()
+                elif event == "queued":
+                    sample.queued_events += 1
+                elif event == "timings" and data:
+                    sample.server_timings = json.loads(data)
+                elif event == "error":
+                    try:
+                        sample.error = "SSE " + (json.loads(data).get("code") or "error")
+                    except ValueError:
+                        sample.error = "SSE error"
+                elif event == "message" and data:
+                    if sample.ttft_ms is None:
+                        sample.ttft_ms = elapsed_ms()
+                    pieces.append(_text(data))
+                elif event == "end":
+                    break
+                event, data_lines = "message", []
+    except httpx.HTTPError as exc:
+        sample.error = type(exc).__name__
+    finally:
+        run.inflight -= 1
+        sample.duration_ms = elapsed_ms()
+
+    sample.tokens = count_tokens("".join(pieces))
+    if sample.ttft_ms is not None and sample.tokens > 1:
+        generating = (sample.duration_ms - sample.ttft_ms) / 1000
+        if generating > 0:
+            sample.tokens_per_s = round((sample.tokens - 1) / generating, 2)
+    return sample
+
+
+def _load_questions(path: Path | None) -> List[str]:
+    if path is None:
+        return list(_DEFAULT_QUESTIONS)
+    questions = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        questions.append(json.loads(line)["query"] if line.startswith("{") else line)
+    return questions
+
+
+async def run_load(args: argparse.Namespace) -> tuple[List[Sample], _Run, float]:
+    questions = _load_questions(args.questions)
+    rng = random.Random(args.seed)
+    run = _Run()
+    tasks: List[asyncio.Task] = []
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    timeout = httpx.Timeout(args.timeout, connect=10.0)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        started = time.perf_counter()
+        offset = 0.0
+        index = 0
+        while True:
+            offset += rng.expovariate(args.rate) if args.arrivals == "poisson" else 1 / args.rate
+            if offset > args.duration:
+                break
+            await asyncio.sleep(max(0.0, started + offset - time.perf_counter()))
+            run.max_dispatch_lag_ms = max(run.max_dispatch_lag_ms, (time.perf_counter() - started - offset) * 1000)
+            question = questions[index % len(questions)]
+            if not args.repeat_questions:
+                # Distinct text so coalescing and the caches do not flatter the numbers
+                question = f"{question} (#{index})"
+            payload: Dict[str, Any] = {"query": question, "stream": True, "framing": args.framing}
+            if args.namespaces:
+                payload["namespaces"] = args.namespaces.split(",")
+            sample = Sample(index=index, scheduled_s=round(offset, 3))
+            tasks.append(asyncio.create_task(_one(client, args.url.rstrip("/"), payload, sample, run)))
+            index += 1
+        samples = await asyncio.gather(*tasks)
+        wall = time.perf_counter() - started
+    return list(samples), run, wall
+
+
+def _stats(values: List[float]) -> Dict[str, float] | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def pct(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))], 2)
+
+    return {
+        "p50": pct(0.50),
+        "p95": pct(0.95),
+        "p99": pct(0.99),
+        "mean": round(sum(ordered) / len(ordered), 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+def summarize(samples: List[Sample], run: _Run, wall: float) -> Dict[str, Any]:
+    ok = [s for s in samples if s.error is None]
+    errors = Counter(s.error for s in samples if s.error is not None)
+    return {
+        "requests": len(samples),
+        "ok": len(ok),
+        "error_rate": round(sum(errors.values()) / len(samples), 4) if samples else 0.0,
+        "errors": dict(errors),
+        "achieved_rate": round(len(samples) / wall, 2) if wall else None,
+        "wall_s": round(wall, 2),
+        "peak_inflight": run.peak_inflight,
+        "max_dispatch_lag_ms": round(run.max_dispatch_lag_ms, 2),
+        "queued_requests": sum(1 for s in samples if s.queued_events),
+        "metrics": {
+            "time_to_context_ms": _stats([s.time_to_context_ms for s in ok if s.time_to_context_ms is not None]),
+            "ttft_ms": _stats([s.ttft_ms for s in ok if s.ttft_ms is not None]),
+            "duration_ms": _stats([s.duration_ms for s in ok if s.duration_ms is not None]),
+            "tokens_per_s": _stats([s.tokens_per_s for s in ok if s.tokens_per_s is not None]),
+        },
+    }
+
+
+def markdown_report(summary: Dict[str, Any], meta: Dict[str, Any]) -> str:
+    lines = [
+        f"# Load test: {meta['label'] or meta['url']}",
+        "",
+        f"- Date: {meta['timestamp']}",
+        f"- Target: `{meta['url']}`, framing `{meta['framing']}`",
+        f"- Arrivals: {meta['arrivals']} at {meta['rate']}/s for {meta['duration']} s "
+        f"(achieved {summary['achieved_rate']}/s, peak in flight {summary['peak_inflight']}, "
+        f"max dispatch lag {summary['max_dispatch_lag_ms']} ms)",
+        f"- Requests: {summary['requests']}, ok {summary['ok']}, error rate {summary['error_rate']:.2%}, "
+        f"queued {summary['queued_requests']}",
+        "",
+        "| metric | p50 | p95 | p99 | mean | max |",
+        "|---|---:|---:|---:|---:|---:|",
+    ]
+    for name, stats in summary["metrics"].items():
+        if stats is None:
+            lines.append(f"| {name} | - | - | - | - | - |")
+        else:
+            lines.append(f"| {name} | {stats['p50']} | {stats['p95']} | {stats['p99']} | {stats['mean']} | {stats['max']} |")
+    if summary["errors"]:
+        lines += ["", "| error | count |", "|---|---:|"]
+        lines += [f"| {error} | {count} |" for error, count in sorted(summary["errors"].items())]
+    return "\n".join(lines) + "\n"
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="backend base URL")
+    parser.add_argument("--rate", type=float, default=2.0, help="arrivals per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of arrivals")
+    parser.add_argument("--arrivals", choices=["poisson", "uniform"], default="poisson")
+    parser.add_argument("--framing", choices=["legacy", "compact"], default="compact")
+    parser.add_argument("--questions", type=Path, help="one question per line, or JSONL with a query field")
+    parser.add_argument("--repeat-questions", action="store_true", help="send questions verbatim (exercise coalescing/caches)")
+    parser.add_argument("--namespaces", help="comma-separated namespaces to query")
+    parser.add_argument("--timeout", type=float, default=180.0, help="per-request read timeout, seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="", help="e.g. the release being measured")
+    parser.add_argument("--json", type=Path, help="write summary, parameters and per-request samples here")
+    parser.add_argument("--report", type=Path, help="write a Markdown report here")
+    args = parser.parse_args(argv)
+
+    samples, run, wall = asyncio.run(run_load(args))
+    summary = summarize(samples, run, wall)
+    meta = {
+        "label": args.label,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "url": args.url,
+        "framing": args.framing,
+        "arrivals": args.arrivals,
+        "rate": args.rate,
+        "duration": args.duration,
+        "repeat_questions": args.repeat_questions,
+    }
+    report = markdown_report(summary, meta)
+    if args.report:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+        args.report.write_text(report, encoding="utf-8")
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"meta": meta, "summary": summary, "samples": [asdict(s) for s in samples]}
+        args.json.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+    print(report, file=sys.stderr if args.report else sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,374 @@
+"""Micro-benchmarks for chunking, Markdown conversion and retrieval on synthetic corpora.
+
+Everything is deterministic for a given ``--seed``: Markdown documents are generated
+from a fixed vocabulary, and embeddings are seeded random unit vectors (hash of the
+text for queries), so no model server is needed and runs are comparable.
+
+- chunking:   markdown_to_chunks for every ChunkingMethod on ``--doc-kb`` documents
+- conversion: Markdown from .txt and (via Docling) .docx renditions of the same documents
+- retrieval:  rag_store.retrieve per strategy (plus scoped plans) on ``--sizes`` chunk indexes
+
+Each case reports latency percentiles, throughput and peak memory (Python heap via
+tracemalloc on a separate pass, and process RSS high-water). Indexes are built once
+per size/dim/seed under ``--work-dir`` and reused, which matters for 1m.
+
+    python -m backend.benchmarks.micro --sizes 1k,100k --out bench.json
+    python -m backend.benchmarks.micro --sizes 1k --baseline bench.json --fail-on-regression
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from ..config import settings
+from ..schemas import ChunkingMethod
+from ..services import rag_store
+from ..services.conversion import _convert_with_docling_to_markdown, markdown_to_chunks
+
+_VOCABULARY = (
+    "index vector query chunk embedding retrieval model answer context document section "
+    "latency token stream cache shard namespace score rank filter batch worker memory disk "
+    "the a of to and in for with on by from as is are was be this that which"
+).split()
+_NAMESPACE = "bench"
+_CHUNKS_PER_FILE = 100
+
+
+# -- measurement ----------------------------------------------------------------
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _measure(call: Callable[[int], Any], runs: int, units_per_run: float, unit: str, warmup: int = 1) -> Dict[str, Any]:
+    """Time ``runs`` calls of call(i), then one more under tracemalloc for the heap peak."""
+    for i in range(warmup):
+        call(-1 - i)
+    samples = []
+    for i in range(runs):
+        started = time.perf_counter()
+        call(i)
+        samples.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        call(runs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    total = sum(samples)
+    return {
+        "runs": runs,
+        "mean_ms": round(total / runs * 1000, 3),
+        "p50_ms": round(_percentile(samples, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(samples, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(samples, 0.99) * 1000, 3),
+        "throughput": round(units_per_run * runs / total, 2) if total else None,
+        "unit": f"{unit}/s",
+        "peak_heap_mb": round(peak / (1024 * 1024), 2),
+        "rss_high_water_mb": round(_rss_mb(), 1),
+    }
+
+
+# -- synthetic corpora ----------------------------------------------------------
+
+
+def synthetic_markdown(kb: int, seed: int) -> str:
+    """Headings (three levels) over paragraphs of generated sentences, ~kb KiB long."""
+    rng = random.Random(seed * 7919 + kb)
+    target = kb * 1024
+    parts: List[str] = []
+    size = 0
+    section = 0
+    while size < target:
+        section += 1
+        level = 1 if section % 9 == 1 else 2 if section % 3 == 1 else 3
+        heading = f"{'#' * level} Section {section} {rng.choice(_VOCABULARY)}"
+        paragraphs = []
+        for _ in range(rng.randint(2, 5)):
+            sentences = []
+            for _ in range(rng.randint(3, 8)):
+                words = rng.choices(_VOCABULARY, k=rng.randint(6, 18))
+                sentences.append(" ".join(words).capitalize() + ".")
+            paragraphs.append(" ".join(sentences))
+        block = heading + "\n\n" + "\n\n".join(paragraphs) + "\n\n"
+        parts.append(block)
+        size += len(block)
+    return "".join(parts)
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic unit vectors: seeded by a hash of the text."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+        vec = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return (vec / np.linalg.norm(vec)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def _parse_size(text: str) -> int:
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def _index(size: int, dim: int, seed: int, work_dir: Path, results: Dict[str, Any]):
+    """Persistent Chroma collection of ``size`` synthetic chunks, built once and reused."""
+    import chromadb
+
+    client = chromadb.PersistentClient(path=str(work_dir / f"index-{size}-d{dim}-s{seed}"))
+    metadata = rag_store._collection_metadata(rag_store.get_runtime_rag())
+    collection = client.get_or_create_collection(_NAMESPACE, metadata=metadata)
+    if collection.count() == size:
+        return client, collection
+    if collection.count():
+        client.delete_collection(_NAMESPACE)
+        collection = client.create_collection(_NAMESPACE, metadata=metadata)
+
+    rng = np.random.default_rng(seed)
+    words = np.array(_VOCABULARY)
+    batch = min(client.get_max_batch_size(), 5000)
+    started = time.perf_counter()
+    for offset in range(0, size, batch):
+        n = min(batch, size - offset)
+        vectors = rng.standard_normal((n, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        ids = [str(offset + i) for i in range(n)]
+        texts = [" ".join(rng.choice(words, size=24)) for _ in range(n)]
+        metadatas = [
+            {
+                "file_id": (offset + i) // _CHUNKS_PER_FILE + 1,
+                "chunk_id": offset + i,
+                "chunk_index": (offset + i) % _CHUNKS_PER_FILE,
+                "doc_id": str((offset + i) // _CHUNKS_PER_FILE + 1),
+            }
+            for i in range(n)
+        ]
+        collection.add(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+    elapsed = time.perf_counter() - started
+    results[f"index/build/{size}"] = {
+        "runs": 1,
+        "mean_ms": round(elapsed * 1000, 1),
+        "throughput": round(size / elapsed, 1),
+        "unit": "chunks/s",
+        "rss_high_water_mb": round(_rss_mb(), 1),
+    }
+    return client, collection
+
+
+# -- stages ---------------------------------------------------------------------
+
+
+def bench_chunking(doc_kbs: List[int], runs: int, seed: int, results: Dict[str, Any]) -> None:
+    for kb in doc_kbs:
+        markdown = synthetic_markdown(kb, seed)
+        for method in ChunkingMethod:
+            # markdown_to_chunks prints and falls back to recursive splitting when a
+            # method's dependency (nltk, spacy) is missing; report that rather than hide it
+            captured = io.StringIO()
+            with contextlib.redirect_stdout(captured):
+                chunks = markdown_to_chunks(markdown, method)
+                case = _measure(lambda _: markdown_to_chunks(markdown, method), runs, kb / 1024, "MiB")
+            case["chunks"] = len(chunks)
+            case["fallback"] = "falling back" in captured.getvalue()
+            results[f"chunking/{method.value}/{kb}kb"] = case
+            print(f"chunking {method.value:>20} {kb:>6} KiB  p50 {case['p50_ms']:>9.2f} ms", file=sys.stderr)
+
+
+def bench_conversion(doc_kbs: List[int], runs: int, seed: int, work_dir: Path, results: Dict[str, Any]) -> None:
+    import docx
+
+    for kb in doc_kbs:
+        markdown = synthetic_markdown(kb, seed)
+        txt = work_dir / f"doc-{kb}kb-s{seed}.txt"
+        txt.write_text(markdown, encoding="utf-8")
+        results[f"conversion/txt/{kb}kb"] = _measure(
+            lambda _: txt.read_text(encoding="utf-8", errors="ignore"), runs, kb / 1024, "MiB"
+        )
+
+        path = work_dir / f"doc-{kb}kb-s{seed}.docx"
+        if not path.exists():
+            document = docx.Document()
+            for block in markdown.split("\n\n"):
+                if block.startswith("#"):
+                    level = len(block) - len(block.lstrip("#"))
+                    document.add_heading(block.lstrip("# "), level)
+                elif block:
+                    document.add_paragraph(block)
+            document.save(path)
+        if not _convert_with_docling_to_markdown(path):
+            results[f"conversion/docx/{kb}kb"] = {"skipped": "Docling conversion failed"}
+            continue
+        # Docling is slow; a couple of runs are enough to see a regression
+        results[f"conversion/docx/{kb}kb"] = _measure(
+            lambda _: _convert_with_docling_to_markdown(path), max(1, min(runs, 3)), kb / 1024, "MiB"
+        )
+        print(f"conversion docx {kb:>6} KiB  p50 {results[f'conversion/docx/{kb}kb']['p50_ms']:>9.2f} ms", file=sys.stderr)
+
+
+def _install_index(client, size: int, embeddings: Embeddings, rag: Dict[str, Any]) -> None:
+    """Point rag_store at the synthetic index (it is a standalone process, so patching is fine)."""
+    from langchain_chroma import Chroma
+
+    store = Chroma(client=client, collection_name=_NAMESPACE, embedding_function=embeddings)
+    shard = rag_store._Shard(namespace=_NAMESPACE, vectorstore=store)
+    models = {"embedding_provider": "bench", "embedding_model": f"fake-{size}"}
+    rag_store._shard = lambda namespace, write=False: shard
+    rag_store.list_namespaces = lambda: [_NAMESPACE]
+    rag_store.is_loaded = lambda namespace: True
+    rag_store.get_embeddings = lambda: embeddings
+    rag_store.get_runtime_models = lambda: models
+    rag_store.get_runtime_rag = lambda: rag
+
+
+def bench_retrieval(sizes: List[int], queries: int, dim: int, seed: int, top_k: int, work_dir: Path, results: Dict[str, Any]) -> None:
+    base_rag = dict(rag_store.get_runtime_rag())
+    embeddings = FakeEmbeddings(dim)
+    for size in sizes:
+        client, _ = _index(size, dim, seed, work_dir, results)
+        files = max(1, size // _CHUNKS_PER_FILE)
+        cases = {
+            "similarity": ({"retrieval_strategy": "similarity"}, None),
+            "similarity_score_threshold": ({"retrieval_strategy": "similarity_score_threshold", "score_threshold": 0.0}, None),
+            "mmr": ({"retrieval_strategy": "mmr", "fetch_k": 4 * top_k, "lambda_mult": 0.5}, None),
+            # Two files: answered by exact search over their own rows
+            "scoped_small": ({"retrieval_strategy": "similarity"}, [1, min(2, files)]),
+        }
+        large_scope = settings.scoped_exact_max_chunks // _CHUNKS_PER_FILE + 1
+        if files > 2 * large_scope:
+            # Just over the exact-search limit: ANN with over-fetch
+            cases["scoped_large"] = ({"retrieval_strategy": "similarity"}, list(range(1, large_scope + 1)))
+        for name, (overrides, file_ids) in cases.items():
+            rag = {**base_rag, **overrides}
+            _install_index(client, size, embeddings, rag)
+            # Unique question per call: the query-embedding and result caches never hit
+            case = _measure(
+                lambda i: rag_store.retrieve(f"{name} question {seed} {i}", k=top_k, file_ids=file_ids),
+                queries,
+                1,
+                "queries",
+                warmup=3,
+            )
+            results[f"retrieval/{name}/{size}"] = case
+            print(f"retrieval {name:>26} {size:>8}  p50 {case['p50_ms']:>9.2f} ms", file=sys.stderr)
+
+
+# -- reporting ------------------------------------------------------------------
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """Per-case p50 change against a baseline run; regressions exceed ``tolerance``."""
+    rows = []
+    for key, case in sorted(results.items()):
+        before = baseline.get(key)
+        if not before or "p50_ms" not in case or "p50_ms" not in before or not before["p50_ms"]:
+            continue
+        change = case["p50_ms"] / before["p50_ms"] - 1
+        rows.append(
+            {
+                "case": key,
+                "baseline_p50_ms": before["p50_ms"],
+                "p50_ms": case["p50_ms"],
+                "change": round(change, 4),
+                "regression": change > tolerance,
+            }
+        )
+    return rows
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", default="chunking,conversion,retrieval", help="comma-separated subset")
+    parser.add_argument("--sizes", default="1k,100k,1m", help="retrieval index sizes in chunks (k/m suffixes)")
+    parser.add_argument("--doc-kb", default="64,1024", help="document sizes for chunking/conversion, KiB")
+    parser.add_argument("--runs", type=int, default=10, help="timed runs per chunking/conversion case")
+    parser.add_argument("--queries", type=int, default=200, help="timed queries per retrieval case")
+    parser.add_argument("--top-k", type=int, default=settings.top_k)
+    parser.add_argument("--dim", type=int, default=128, help="fake embedding dimension")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", type=Path, default=Path(tempfile.gettempdir()) / "rag-bench", help="cached indexes and documents")
+    parser.add_argument("--out", type=Path, help="write results JSON here")
+    parser.add_argument("--baseline", type=Path, help="results JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="p50 slowdown counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 if any case regressed")
+    args = parser.parse_args(argv)
+
+    logging.getLogger("chromadb").setLevel(logging.WARNING)
+    stages = {s.strip() for s in args.stages.split(",") if s.strip()}
+    doc_kbs = [int(kb) for kb in args.doc_kb.split(",") if kb.strip()]
+    args.work_dir.mkdir(parents=True, exist_ok=True)
+
+    results: Dict[str, Any] = {}
+    if "chunking" in stages:
+        bench_chunking(doc_kbs, args.runs, args.seed, results)
+    if "conversion" in stages:
+        bench_conversion(doc_kbs, args.runs, args.seed, args.work_dir, results)
+    if "retrieval" in stages:
+        sizes = [_parse_size(s) for s in args.sizes.split(",") if s.strip()]
+        bench_retrieval(sizes, args.queries, args.dim, args.seed, args.top_k, args.work_dir, results)
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {k: str(v) for k, v in vars(args).items()},
+        },
+        "results": results,
+    }
+    regressions = 0
+    if args.baseline:
+        rows = compare(results, json.loads(args.baseline.read_text())["results"], args.tolerance)
+        report["comparison"] = rows
+        regressions = sum(row["regression"] for row in rows)
+        print(f"{'case':<48} {'base p50':>10} {'p50':>10} {'change':>8}", file=sys.stderr)
+        for row in rows:
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(
+                f"{row['case']:<48} {row['baseline_p50_ms']:>10.2f} {row['p50_ms']:>10.2f} {row['change']:>+8.1%}{flag}",
+                file=sys.stderr,
+            )
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""Minimal Ollama-compatible model server for load tests.
+
+Serves the endpoints the backend uses: ``/api/chat`` (NDJSON token stream), ``/api/embed``,
+``/api/generate`` (warm-up), ``/api/tags`` and ``/api/show``. Latency is synthetic:
+the first token after ``--ttft-ms``, then ``--tokens-per-second``, with optional jitter
+and injected failures. Embeddings are deterministic unit vectors, so retrieval
+against an index built through the mock is stable between runs.
+
+    python -m backend.benchmarks.mock_ollama --port 11435 --ttft-ms 300 --tokens-per-second 40
+    RAG_OLLAMA_BASE_URL=http://127.0.0.1:11435 uvicorn backend.main:app --port 8000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+from typing import Any, AsyncGenerator, Dict, List
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from ..config import settings
+
+_WORDS = "the answer is grounded in the retrieved context and cites each relevant document section".split()
+
+
+class MockConfig:
+    def __init__(self, args: argparse.Namespace):
+        self.ttft = args.ttft_ms / 1000
+        self.interval = 1 / args.tokens_per_second if args.tokens_per_second > 0 else 0.0
+        self.tokens = args.tokens
+        self.jitter = args.jitter
+        self.dim = args.dim
+        self.embed_delay = args.embed_ms / 1000
+        self.error_rate = args.error_rate
+        self.context_length = args.context_length
+        self.models = [m.strip() for m in args.models.split(",") if m.strip()]
+        self.rng = random.Random(args.seed)
+
+    def delay(self, seconds: float) -> float:
+        if not self.jitter:
+            return seconds
+        return max(0.0, seconds * (1 + self.rng.uniform(-self.jitter, self.jitter)))
+
+    def fails(self) -> bool:
+        return self.error_rate > 0 and self.rng.random() < self.error_rate
+
+
+def _now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def _vector(text: str, dim: int) -> List[float]:
+    seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+    vec = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return (vec / np.linalg.norm(vec)).tolist()
+
+
+def create_app(config: MockConfig) -> FastAPI:
+    app = FastAPI(title="Mock Ollama")
+
+    def _failure() -> JSONResponse:
+        return JSONResponse(status_code=500, content={"error": "injected failure"})
+
+    @app.get("/api/tags")
+    def tags() -> Dict[str, Any]:
+        return {
+            "models": [
+                {
+                    "name": model,
+                    "model": model,
+                    "modified_at": _now(),
+                    "size": 0,
+                    "digest": hashlib.sha256(model.encode()).hexdigest(),
+                    "details": {"format": "gguf", "family": "mock", "context_length": config.context_length},
+                }
+                for model in config.models
+            ]
+        }
+
+    @app.post("/api/show")
+    async def show(request: Request) -> Dict[str, Any]:
+        body = await request.json()
+        return {
+            "modelfile": "",
+            "parameters": "",
+            "template": "",
+            "details": {"format": "gguf", "family": "mock"},
+            "model_info": {"general.architecture": "mock", "mock.context_length": config.context_length},
+            "model": body.get("model") or body.get("name"),
+        }
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        return {"model": body.get("model"), "created_at": _now(), "response": "", "done": True, "done_reason": "stop"}
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        body = await request.json()
+        inputs = body.get("input")
+        texts = [inputs] if isinstance(inputs, str) else list(inputs or [])
+        await asyncio.sleep(config.delay(config.embed_delay))
+        if config.fails():
+            return _failure()
+        return {"model": body.get("model"), "embeddings": [_vector(text, config.dim) for text in texts]}
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        model = body.get("model")
+        if config.fails():
+            return _failure()
+
+        def part(content: str, done: bool, **extra: Any) -> str:
+            message = {"role": "assistant", "content": content}
+            return json.dumps({"model": model, "created_at": _now(), "message": message, "done": done, **extra}) + "\n"
+
+        if not body.get("stream", True):
+            await asyncio.sleep(config.delay(config.ttft + config.interval * (config.tokens - 1)))
+            text = " ".join(_WORDS[i % len(_WORDS)] for i in range(config.tokens))
+            return JSONResponse(json.loads(part(text, True, done_reason="stop")))
+
+        async def tokens() -> AsyncGenerator[str, None]:
+            started = time.perf_counter()
+            await asyncio.sleep(config.delay(config.ttft))
+            for i in range(config.tokens):
+                if i:
+                    await asyncio.sleep(config.delay(config.interval))
+                yield part((" " if i else "") + _WORDS[i % len(_WORDS)], False)
+            elapsed_ns = int((time.perf_counter() - started) * 1e9)
+            yield part("", True, done_reason="stop", eval_count=config.tokens, total_duration=elapsed_ns, eval_duration=elapsed_ns)
+
+        return StreamingResponse(tokens(), media_type="application/x-ndjson")
+
+    return app
+
+
+def main(argv: List[str] | None = None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--ttft-ms", type=float, default=250.0, help="delay before the first chat token")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--tokens", type=int, default=200, help="tokens per answer")
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- fraction applied to every delay")
+    parser.add_argument("--embed-ms", type=float, default=15.0, help="latency of one embed call")
+    parser.add_argument("--dim", type=int, default=768, help="embedding dimension")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of chat/embed calls answered with 500")
+    parser.add_argument("--context-length", type=int, default=8192)
+    parser.add_argument("--models", default=f"{settings.chat_model},{settings.embedding_model}")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    uvicorn.run(create_app(MockConfig(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Compare SSE token framings of POST /query: frames, bytes and writes per answer, CPU per stream.
+
+Drives the real FastAPI app in-process over raw ASGI with a synthetic model that
+emits ``--tokens`` tokens at ``--token-interval-ms``; retrieval is replaced by a
+fixed context so only the framing path is measured. Each ASGI body message is one
+socket write in production.
+
+    python -m backend.benchmarks.sse_framing --streams 50 --tokens 300
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, List
+
+from ..config import settings
+from ..main import app
+from ..routers import query as query_router
+from ..services.search import RetrievedChunk
+
+_WORDS = "the quick brown fox jumps over a lazy dog while retrieval augmented generation streams".split()
+
+
+def _fake_run_query(tokens: int, interval: float):
+    async def run_query(query_text, top_k, file_ids=None, namespaces=None):
+        async def answer():
+            for i in range(tokens):
+                await asyncio.sleep(interval)
+                yield (" " if i else "") + _WORDS[i % len(_WORDS)]
+
+        hit = RetrievedChunk(
+            chunk_id=1, file_id=1, doc_id="1", filename="bench.txt", text="context " * 50,
+            section_heading=None, page_number=None, score=0.1,
+        )
+        return answer(), [hit]
+
+    return run_query
+
+
+async def _one_stream(framing: str, index: int) -> Dict[str, int]:
+    body = json.dumps({"query": f"benchmark question {index}", "framing": framing}).encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/query", "raw_path": b"/query", "query_string": b"",
+        "root_path": "", "headers": [(b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+    }
+    sent_body = False
+    never = asyncio.Event()
+    stats = {"writes": 0, "bytes": 0, "frames": 0}
+
+    async def receive():
+        nonlocal sent_body
+        if not sent_body:
+            sent_body = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await never.wait()  # the client never disconnects
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            chunk = message["body"]
+            stats["writes"] += 1
+            stats["bytes"] += len(chunk)
+            stats["frames"] += chunk.count(b"\n\n")
+
+    await app(scope, receive, send)
+    return stats
+
+
+async def _run(framing: str, streams: int) -> Dict[str, float]:
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    results = await asyncio.gather(*(_one_stream(framing, i) for i in range(streams)))
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    return {
+        "framing": framing,
+        "streams": streams,
+        "frames_per_answer": sum(r["frames"] for r in results) / streams,
+        "writes_per_answer": sum(r["writes"] for r in results) / streams,
+        "bytes_per_answer": sum(r["bytes"] for r in results) / streams,
+        "cpu_ms_per_stream": cpu * 1000 / streams,
+        "wall_s": wall,
+    }
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=50, help="concurrent streams per framing")
+    parser.add_argument("--tokens", type=int, default=300, help="tokens per answer")
+    parser.add_argument("--token-interval-ms", type=float, default=10.0, help="synthetic model inter-token delay")
+    parser.add_argument("--framing", choices=["legacy", "compact", "both"], default="both")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    logging.getLogger("query").setLevel(logging.WARNING)
+    # Distinct questions would not coalesce anyway; keep single-flight out of the measurement
+    settings.query_coalescing_enabled = False
+    query_router.run_query = _fake_run_query(args.tokens, args.token_interval_ms / 1000)
+
+    framings = ["legacy", "compact"] if args.framing == "both" else [args.framing]
+    results = [asyncio.run(_run(framing, args.streams)) for framing in framings]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'framing':>8} {'frames':>8} {'writes':>8} {'bytes':>9} {'cpu ms/stream':>14} {'wall s':>7}")
+    for r in results:
+        print(
+            f"{r['framing']:>8} {r['frames_per_answer']:>8.1f} {r['writes_per_answer']:>8.1f} "
+            f"{r['bytes_per_answer']:>9.0f} {r['cpu_ms_per_stream']:>14.2f} {r['wall_s']:>7.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -9,6 +10,10 @@ class Settings(BaseSettings):
     file_dir: Path = storage_dir / "files"
     chroma_dir: Path = storage_dir / "chroma"
 
+    # SQLite connection pragmas (WAL is always on): lock wait and page cache size
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_cache_kb: int = 20000
+
     # Frontend origins allowed to call the API; comma-separated via env if needed
     allowed_origins: list[str] = [
         "http://localhost:3000",
@@ -16,10 +21,60 @@ class Settings(BaseSettings):
     ]
 
     chroma_collection: str = "kb_chunks"
+    # Files belong to a namespace (tenant/workspace); each namespace is its own
+    # collection shard and queries fan out across shards in parallel
+    default_namespace: str = "default"
+    shard_search_workers: int = 8
+    # Distance of newly created collections. Existing collections keep their own until
+    # rebuild_index migrates them; "l2" is Chroma's default and the original kb_chunks'
+    hnsw_space: Literal["l2", "cosine", "ip"] = "l2"
     embedding_model: str = "embeddinggemma:latest"
     chat_model: str = "gemma3:4b"
     top_k: int = 12
 
+    # Scoped retrieval planning: scopes with at most this many vectors are answered by
+    # exact search over their own rows; larger scopes use the ANN index with over-fetch
+    scoped_exact_max_chunks: int = 5000
+    # Upper bound on ANN candidates fetched for a scoped query before falling back to
+    # Chroma's metadata filter
+    scoped_overfetch_max: int = 4000
+    # Deleted files are tombstoned and skipped by retrieval (over-fetching by their
+    # vector count up to this many, else Chroma's $nin filter) until the compactor
+    # purges their vectors, chunk rows and blobs in batches of compaction_batch_size.
+    # With compaction_auto_rebuild, a namespace is rebuilt once compaction has removed
+    # compaction_rebuild_ratio of its vectors since the last rebuild, undoing HNSW
+    # fragmentation. Off by default: POST /providers/rag/index/rebuild does it on demand.
+    tombstone_overfetch_max: int = 2000
+    compaction_enabled: bool = True
+    compaction_interval_seconds: float = 30.0
+    compaction_batch_size: int = 1000
+    compaction_auto_rebuild: bool = False
+    compaction_rebuild_ratio: float = 0.2
+
+    # In-memory retrieval caches: query text -> embedding, and retrieval key -> ranked hits.
+    # Result entries are keyed by an index generation shared by all workers (a stamp file
+    # under storage/state), so an ingest/delete in any worker invalidates them everywhere.
+    query_embedding_cache_size: int = 2048
+    retrieval_cache_size: int = 1024
+
+    # Opt-in semantic answer cache: replay a stored answer when a new question retrieves
+    # the same chunks for the same chat model and is within this cosine similarity
+    answer_cache_enabled: bool = False
+    answer_cache_threshold: float = 0.95
+    answer_cache_size: int = 512
+
+    # Identical concurrent /query requests share one retrieval + generation run
+    query_coalescing_enabled: bool = True
+
+    # "compact" SSE framing: flush coalesced tokens after this window or byte count
+    sse_coalesce_ms: int = 30
+    sse_coalesce_bytes: int = 256
+
+    # Prompt budget: the chat model's context window (from ModelInfo.context_length,
+    # else this default) minus a reserve for the answer
+    default_context_length: int = 4096
+    answer_token_reserve: int = 1024
+
     max_file_mb: int = 50
     # Tighter chunks improve grounding and reduce off-topic context
     chunk_size: int = 1024
@@ -33,8 +88,58 @@ class Settings(BaseSettings):
     ]
 
     ollama_base_url: str = "http://localhost:11434"
+    # How long Ollama keeps models resident after each request (seconds, -1 = forever)
+    model_keep_alive_seconds: int = 1800
+    # Startup warm-up: preload models, touch the vector index, warm caches; /ready
+    # reports 503 until it has succeeded. Failed steps are retried at this interval.
+    warmup_enabled: bool = True
+    warmup_retry_seconds: float = 15.0
+    # Query-only processes set this false: upload/re-ingest return 403 and Docling and
+    # the text splitters are never imported. When true, warm-up imports them up front.
+    enable_ingest: bool = True
+    # Read replicas set this true: ingest, re-ingest, delete and index rebuilds return
+    # 403 and compaction is off; the index changes only by applying snapshots
+    # (backend.tools.snapshot / POST /admin/snapshot/apply)
+    read_only: bool = False
     openai_api_key: str = ""  # Set via environment variable RAG_OPENAI_API_KEY
 
+    # How often runtime_config.json is stat-ed for changes made by other workers
+    runtime_config_poll_seconds: float = 1.0
+
+    # Provider model discovery: lists are cached for the TTL (shorter after a failure)
+    # and refreshed in the background once stale; a single fetch is capped at the timeout
+    model_catalog_ttl_seconds: float = 300.0
+    model_catalog_error_ttl_seconds: float = 15.0
+    model_discovery_timeout_seconds: float = 3.0
+
+    # Admission control: concurrent chat / embedding calls per provider (each kind has
+    # its own limit), how many more may wait, and for how long before a 503
+    provider_max_concurrency: dict[str, int] = {"ollama": 4, "openai": 16}
+    provider_default_concurrency: int = 4
+    provider_max_queue: int = 32
+    provider_queue_timeout_seconds: float = 30.0
+    provider_retry_after_seconds: int = 5
+
+    # Hedging: if the primary has produced no first token / vector within its
+    # hedge_percentile latency (default delay until hedge_min_samples are recorded),
+    # race the same request against a secondary and keep whichever answers first.
+    # Chat may hedge to another provider/model; embeddings only to the same model
+    # (on hedge_ollama_base_url for Ollama, a duplicate request for OpenAI).
+    hedge_enabled: bool = False
+    hedge_chat_provider: str = ""
+    hedge_chat_model: str = ""
+    hedge_ollama_base_url: str = ""
+    hedge_percentile: float = 0.95
+    hedge_min_samples: int = 20
+    hedge_default_delay_seconds: float = 2.0
+    hedge_min_delay_seconds: float = 0.2
+
+    # Admin endpoints (profiling) require this token in X-Admin-Token; empty disables them
+    admin_token: str = ""
+    # Captured cProfile / tracemalloc files; only the newest profile_keep are kept
+    profile_dir: Path = storage_dir / "profiles"
+    profile_keep: int = 20
+
 
 def get_settings() -> Settings:
     settings = Settings()
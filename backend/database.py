@@ -3,14 +3,36 @@ from __future__ import annotations
 from contextlib import contextmanager
 from pathlib import Path
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from .config import settings
 
 DB_PATH = Path(settings.storage_dir) / "rag.db"
+
+
+def _apply_pragmas(dbapi_connection, _record) -> None:
+    # WAL lets readers proceed while an ingest writes; busy_timeout makes a blocked
+    # writer wait instead of failing with "database is locked"
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute(f"PRAGMA cache_size=-{settings.sqlite_cache_kb}")
+    cursor.close()
+
+
 engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False})
+event.listen(engine, "connect", _apply_pragmas)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+# Async path for async routes; same file, same pragmas
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{DB_PATH}")
+event.listen(async_engine.sync_engine, "connect", _apply_pragmas)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -21,3 +43,15 @@ def get_session():
         yield session
     finally:
         session.close()
+
+
+def run_migrations() -> None:
+    """Upgrade the database to the latest Alembic revision."""
+    from alembic import command
+    from alembic.config import Config
+
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    backend_dir = Path(__file__).resolve().parent
+    config = Config(str(backend_dir / "alembic.ini"))
+    config.set_main_option("script_location", str(backend_dir / "alembic"))
+    command.upgrade(config, "head")
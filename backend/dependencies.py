@@ -1,8 +1,13 @@
 from __future__ import annotations
 
-from typing import Generator
+import hmac
+from typing import AsyncGenerator, Generator
 
-from .database import SessionLocal
+from fastapi import Header, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .database import AsyncSessionLocal, SessionLocal
 
 
 def get_db() -> Generator:
@@ -11,3 +16,44 @@ def get_db() -> Generator:
         yield session
     finally:
         session.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    """Gate admin endpoints on RAG_ADMIN_TOKEN; they are disabled while it is unset."""
+    if not settings.admin_token:
+        detail = {
+            "code": "ADMIN_DISABLED",
+            "message": "Admin endpoints are disabled.",
+            "hint": "Set RAG_ADMIN_TOKEN to enable them.",
+        }
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.admin_token):
+        detail = {"code": "ADMIN_UNAUTHORIZED", "message": "Missing or invalid X-Admin-Token."}
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=detail)
+
+
+def require_ingest() -> None:
+    """Gate endpoints that need the ingestion stack on RAG_ENABLE_INGEST."""
+    if not settings.enable_ingest:
+        detail = {
+            "code": "INGEST_DISABLED",
+            "message": "Ingestion is disabled on this instance.",
+            "hint": "Send uploads to an instance with RAG_ENABLE_INGEST=true.",
+        }
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+
+
+def require_writable() -> None:
+    """Refuse index writes on read replicas (RAG_READ_ONLY), which change only by snapshot."""
+    if settings.read_only:
+        detail = {
+            "code": "READ_ONLY",
+            "message": "This instance is a read-only replica.",
+            "hint": "Send writes to the primary; replicas pick them up from its snapshots.",
+        }
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
@@ -1,17 +1,22 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 from typing import List # type: ignore
-from uuid import uuid4
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from .config import settings # pyright: ignore[reportUnusedImport]
-from .database import Base, engine
-from .routers import files, query, system, providers
+from .database import run_migrations
+from .middleware import ServerTimingMiddleware
+from .routers import admin, files, namespaces, query, system, providers
+from .services import warmup
+from .services.compactor import compactor
+from .services.file_catalog import file_catalog
+from .services.timings import correlation_id as current_correlation_id
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("rag")
@@ -20,10 +25,27 @@ logger = logging.getLogger("rag")
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    logger.info("Creating database tables if missing")
-    Base.metadata.create_all(bind=engine)
+    logger.info("Upgrading database schema to the latest migration")
+    run_migrations()
+    # Retrieval labels hits from memory; load the file catalog before serving
+    file_catalog.load()
+    # Warm up in the background so /ready can answer 503 while it runs
+    warmup_task = None
+    if settings.warmup_enabled:
+        warmup_task = asyncio.create_task(warmup.run_warmup())
+    else:
+        warmup.mark_ready()
+    # Purge tombstoned files and rebuild fragmented namespaces in the background
+    compaction_task = None
+    if settings.compaction_enabled and not settings.read_only:
+        compaction_task = asyncio.create_task(compactor.run_forever())
     yield
-    # Shutdown (if needed)
+    # Shutdown
+    for task in (warmup_task, compaction_task):
+        if task is not None and not task.done():
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
 
 
 app = FastAPI(title="RAG Chat", version="0.1.0", lifespan=lifespan)
@@ -34,13 +56,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Correlation-ID"],
 )
+app.add_middleware(ServerTimingMiddleware)
 
 
 app.include_router(system.router)
 app.include_router(files.router)
 app.include_router(query.router)
 app.include_router(providers.router)
+app.include_router(namespaces.router)
+app.include_router(admin.router)
 
 
 def _normalize_error(detail):
@@ -61,7 +87,8 @@ def _normalize_error(detail):
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    correlation_id = str(uuid4())
+    # Matches the X-Correlation-ID header set by ServerTimingMiddleware
+    correlation_id = current_correlation_id()
     code, message, hint = _normalize_error(exc.detail)
     logger.error(
         "HTTPException %s %s code=%s cid=%s detail=%s",
@@ -75,16 +102,17 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     payload = {"code": code, "message": message, "correlation_id": correlation_id}
     if hint:
         payload["hint"] = hint
-    return JSONResponse(status_code=exc.status_code, content=payload)
+    return JSONResponse(status_code=exc.status_code, content=payload, headers=exc.headers)
 
 
 @app.exception_handler(Exception)
 async def unhandled_exception_handler(request: Request, exc: Exception):
-    correlation_id = str(uuid4())
+    # Runs outside ServerTimingMiddleware, so neither its context nor its headers apply
+    correlation_id = getattr(request.state, "correlation_id", None) or current_correlation_id()
     logger.exception("Unhandled error %s %s cid=%s", request.method, request.url.path, correlation_id)
     payload = {
         "code": "UNHANDLED_ERROR",
         "message": "Something went wrong on the server.",
         "correlation_id": correlation_id,
     }
-    return JSONResponse(status_code=500, content=payload)
+    return JSONResponse(status_code=500, content=payload, headers={"X-Correlation-ID": correlation_id})
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from uuid import uuid4
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .services.timings import RequestTimings, bind
+
+
+class ServerTimingMiddleware:
+    """Time every HTTP request per stage and report it in a Server-Timing header.
+
+    Stages are recorded by services.timings.stage() anywhere below the route. SSE
+    responses are skipped: their timings are sent as a final `timings` event instead.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings(str(uuid4()))
+        # Unhandled errors are answered by Starlette's outermost middleware, after bind()
+        # below has been left; request.state is how their handler finds the id
+        scope.setdefault("state", {})["correlation_id"] = timings.correlation_id
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if not headers.get("content-type", "").startswith("text/event-stream"):
+                    headers.append("Server-Timing", timings.server_timing())
+                    headers.append("X-Correlation-ID", timings.correlation_id)
+            await send(message)
+
+        with bind(timings):
+            await self.app(scope, receive, send_with_timing)
@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import List
 
-from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, String, Text
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .database import Base
@@ -22,9 +22,13 @@ class File(Base):
     deleted: Mapped[bool] = mapped_column(Boolean, default=False)
     converted_with_docling: Mapped[bool] = mapped_column(Boolean, default=False)
     raw_markdown: Mapped[str | None] = mapped_column(Text, nullable=True)
+    namespace: Mapped[str] = mapped_column(String(64), nullable=False, default="default", index=True)
 
     chunks: Mapped[List[Chunk]] = relationship("Chunk", back_populates="file", cascade="all, delete-orphan")
 
+    # GET /files filters on deleted and orders by uploaded_at
+    __table_args__ = (Index("ix_files_deleted_uploaded_at", "deleted", "uploaded_at"),)
+
 
 class Chunk(Base):
     __tablename__ = "chunks"
@@ -35,6 +39,10 @@ class Chunk(Base):
     content: Mapped[str] = mapped_column(Text, nullable=False)
     section_heading: Mapped[str | None] = mapped_column(String(255), nullable=True)
     page_number: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    token_count: Mapped[int | None] = mapped_column(Integer, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     file: Mapped[File] = relationship("File", back_populates="chunks")
+
+    # Serves both file_id lookups (leading column) and per-file reads ordered by chunk_index
+    __table_args__ = (Index("ix_chunks_file_id_chunk_index", "file_id", "chunk_index"),)
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+from typing import Any, Dict, List
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import FileResponse
+
+from ..dependencies import require_admin
+from ..schemas import ProfileRequest, SnapshotApplyRequest, SnapshotExportRequest
+from ..services.compactor import compactor
+from ..services.profiling import ProfileTarget, profiler
+from ..services.snapshot import applied_snapshot, apply_snapshot, export_snapshot
+
+logger = logging.getLogger("admin")
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+@router.get("/profile")
+def profile_status() -> Dict[str, Any]:
+    """Targets currently armed for profiling."""
+    return profiler.status()
+
+
+@router.post("/profile")
+def arm_profile(req: ProfileRequest) -> Dict[str, Any]:
+    """Capture the next `count` requests of `target` under cProfile or tracemalloc."""
+    logger.info("arm profile target=%s mode=%s count=%s", req.target, req.mode, req.count)
+    return profiler.arm(req.target, req.mode, req.count)
+
+
+@router.delete("/profile/{target}")
+def disarm_profile(target: ProfileTarget) -> Dict[str, Any]:
+    return profiler.disarm(target)
+
+
+@router.get("/profiles")
+def list_profiles() -> List[Dict[str, Any]]:
+    return profiler.list()
+
+
+@router.get("/profiles/{name}")
+def download_profile(name: str):
+    return FileResponse(profiler.path(name), media_type="application/octet-stream", filename=name)
+
+
+@router.post("/compact")
+def compact() -> Dict[str, Any]:
+    """Run a compaction pass now instead of waiting for the next interval."""
+    return compactor.run_once()
+
+
+@router.get("/snapshot")
+def snapshot_status() -> Dict[str, Any] | None:
+    """The last snapshot applied to this node (null on a primary)."""
+    return applied_snapshot()
+
+
+@router.post("/snapshot/export")
+def snapshot_export(req: SnapshotExportRequest) -> Dict[str, Any]:
+    """Write a full bundle, or a delta against `base`, to `path` on this host."""
+    logger.info("export snapshot path=%s base=%s", req.path, req.base)
+    return export_snapshot(Path(req.path), Path(req.base) if req.base else None)
+
+
+@router.post("/snapshot/apply")
+def snapshot_apply(req: SnapshotApplyRequest) -> Dict[str, Any]:
+    """Apply a bundle from `path` on this host; allowed on read-only replicas."""
+    logger.info("apply snapshot path=%s replace=%s", req.path, req.replace)
+    return apply_snapshot(Path(req.path), replace=req.replace)
@@ -4,23 +4,29 @@ import logging
 from typing import List
 
 from fastapi import APIRouter, Depends, File, UploadFile, Form
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from ..dependencies import get_db
+from ..dependencies import get_async_db, get_db, require_ingest, require_writable
 from ..models import File as FileModel
 from ..models import Chunk
 from ..schemas import FileMeta, IngestResponse, ChunkOut, ChunkingMethod
+from ..config import settings
 from ..services.ingest import ingest_file, reingest_file, remove_file
-from ..services.rag_store import similarity_search_with_score
+from ..services.profiling import profiler
+from ..services.rag_store import similarity_search_with_score, validate_namespace
+from ..services.timings import correlation_id, stage
 
 logger = logging.getLogger("files")
 router = APIRouter()
 
 
-@router.post("/ingest", response_model=IngestResponse)
+@router.post("/ingest", response_model=IngestResponse, dependencies=[Depends(require_writable), Depends(require_ingest)])
 def ingest(
     file: UploadFile = File(...),
     chunking_method: str = Form(default=""),
+    namespace: str = Form(default=""),
     db: Session = Depends(get_db)
 ):
     # Use runtime RAG config if chunking_method not provided
@@ -29,25 +35,31 @@ def ingest(
     if not chunking_method:
         rag_config = get_runtime_rag()
         chunking_method = rag_config.get("chunking_method") or "recursive_character"
+    namespace = validate_namespace(namespace or settings.default_namespace)
     
-    logger.info("ingest: filename=%s, chunking_method=%s", file.filename, chunking_method)
+    logger.info("ingest: filename=%s, chunking_method=%s, namespace=%s", file.filename, chunking_method, namespace)
     # Validate and convert chunking_method string to enum
     try:
         method = ChunkingMethod(chunking_method)
     except ValueError:
         method = ChunkingMethod.RECURSIVE_CHARACTER
     
-    record, chunk_count, raw_markdown = ingest_file(db, file, method)
+    with profiler.capture("ingest", correlation_id()):
+        record, chunk_count, raw_markdown = ingest_file(db, file, method, namespace)
     return IngestResponse(file=record, chunks=chunk_count, raw_markdown=raw_markdown)
 
 
 @router.get("/files", response_model=List[FileMeta])
-def list_files(db: Session = Depends(get_db)):
-    files = db.query(FileModel).filter_by(deleted=False).order_by(FileModel.uploaded_at.desc()).all()
+async def list_files(namespace: str | None = None, db: AsyncSession = Depends(get_async_db)):
+    query = select(FileModel).filter_by(deleted=False)
+    if namespace:
+        query = query.filter_by(namespace=namespace)
+    with stage("db"):
+        files = (await db.scalars(query.order_by(FileModel.uploaded_at.desc()))).all()
     return files
 
 
-@router.put("/file/{file_id}", response_model=IngestResponse)
+@router.put("/file/{file_id}", response_model=IngestResponse, dependencies=[Depends(require_writable), Depends(require_ingest)])
 def update_file(
     file_id: int,
     file: UploadFile = File(...),
@@ -68,11 +80,12 @@ def update_file(
     except ValueError:
         method = ChunkingMethod.RECURSIVE_CHARACTER
     
-    record, chunk_count, raw_markdown = reingest_file(db, file_id, file, method)
+    with profiler.capture("ingest", correlation_id()):
+        record, chunk_count, raw_markdown = reingest_file(db, file_id, file, method)
     return IngestResponse(file=record, chunks=chunk_count, raw_markdown=raw_markdown)
 
 
-@router.delete("/file/{file_id}")
+@router.delete("/file/{file_id}", dependencies=[Depends(require_writable)])
 def delete_file(file_id: int, db: Session = Depends(get_db)):
     logger.info("delete file=%s", file_id)
     remove_file(db, file_id)
@@ -80,18 +93,20 @@ def delete_file(file_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/file/{file_id}/chunks", response_model=List[ChunkOut])
-def get_file_chunks(file_id: int, db: Session = Depends(get_db)):
+async def get_file_chunks(file_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get all chunks for a specific file."""
     logger.info("get chunks for file=%s", file_id)
     
     # Check if file exists
-    file = db.query(FileModel).filter_by(id=file_id, deleted=False).first()
+    with stage("db"):
+        file = (await db.scalars(select(FileModel).filter_by(id=file_id, deleted=False))).first()
     if not file:
         from fastapi import HTTPException, status as http_status
         raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="File not found")
     
     # Get all chunks for this file, ordered by chunk_index
-    chunks = db.query(Chunk).filter_by(file_id=file_id).order_by(Chunk.chunk_index).all()
+    with stage("db"):
+        chunks = (await db.scalars(select(Chunk).filter_by(file_id=file_id).order_by(Chunk.chunk_index))).all()
     return chunks
 
  
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import logging
+from typing import List
+
+from fastapi import APIRouter, HTTPException, status
+
+from ..schemas import NamespaceInfo
+from ..services.rag_store import is_loaded, list_namespaces, load_namespace, unload_namespace, validate_namespace
+
+logger = logging.getLogger("namespaces")
+router = APIRouter(prefix="/namespaces")
+
+
+def _existing(namespace: str) -> str:
+    validate_namespace(namespace)
+    if namespace not in list_namespaces():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Namespace not found")
+    return namespace
+
+
+@router.get("", response_model=List[NamespaceInfo])
+def get_namespaces():
+    return [NamespaceInfo(namespace=ns, loaded=is_loaded(ns)) for ns in list_namespaces()]
+
+
+@router.post("/{namespace}/load", response_model=NamespaceInfo)
+def load(namespace: str):
+    logger.info("load namespace=%s", namespace)
+    return NamespaceInfo(**load_namespace(_existing(namespace)))
+
+
+@router.post("/{namespace}/unload", response_model=NamespaceInfo)
+def unload(namespace: str):
+    logger.info("unload namespace=%s", namespace)
+    return NamespaceInfo(**unload_namespace(_existing(namespace)))
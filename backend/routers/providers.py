@@ -1,7 +1,10 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException
+from typing import List
 
+from fastapi import APIRouter, Depends, HTTPException
+
+from ..dependencies import require_writable
 from ..schemas import (
     ProviderListResponse,
     ProviderModelsResponse,
@@ -13,6 +16,7 @@ from ..schemas import (
     RAGProviderInfo,
     RAGSelectionRequest,
     RAGSelectionResponse,
+    IndexStatus,
 )
 from ..services.providers import (
     get_embedding_providers,
@@ -22,6 +26,7 @@ from ..services.providers import (
     serialize_providers,
 )
 from ..services.runtime_config import get_runtime_models, set_runtime_models, get_runtime_rag, set_runtime_rag, reset_runtime_rag
+from ..services.rag_store import index_status, list_namespaces, rebuild_index
 from langchain_core.vectorstores import VectorStoreRetriever
 
 router = APIRouter(prefix="/providers")
@@ -40,9 +45,10 @@ def list_embedding_providers():
 
 
 @router.get("/llm/{provider_key}/models", response_model=ProviderModelsResponse)
-def list_llm_models(provider_key: str):
+def list_llm_models(provider_key: str, refresh: bool = False):
+    # refresh=true bypasses the model catalog cache and waits for a fresh list
     try:
-        models = serialize_models(list_models_for_provider(provider_key, "llm"))
+        models = serialize_models(list_models_for_provider(provider_key, "llm", refresh=refresh))
     except KeyError:
         raise HTTPException(status_code=404, detail="LLM provider not found")
     return ProviderModelsResponse(
@@ -53,9 +59,10 @@ def list_llm_models(provider_key: str):
 
 
 @router.get("/embedding/{provider_key}/models", response_model=ProviderModelsResponse)
-def list_embedding_models(provider_key: str):
+def list_embedding_models(provider_key: str, refresh: bool = False):
+    # refresh=true bypasses the model catalog cache and waits for a fresh list
     try:
-        models = serialize_models(list_models_for_provider(provider_key, "embedding"))
+        models = serialize_models(list_models_for_provider(provider_key, "embedding", refresh=refresh))
     except KeyError:
         raise HTTPException(status_code=404, detail="Embedding provider not found")
     return ProviderModelsResponse(
@@ -142,3 +149,18 @@ def rag_update_selection(body: RAGSelectionRequest):
 def rag_reset_selection():
     updated = reset_runtime_rag()
     return RAGSelectionResponse(selection=updated)  # type: ignore[arg-type]
+
+
+@router.get("/rag/index", response_model=List[IndexStatus])
+def rag_index_status():
+    """HNSW parameters per namespace and whether a rebuild is needed to apply the config."""
+    return [IndexStatus(**status) for status in index_status()]
+
+
+@router.post("/rag/index/rebuild", response_model=List[IndexStatus], dependencies=[Depends(require_writable)])
+def rag_index_rebuild(namespace: str | None = None):
+    """Rebuild one namespace (or every namespace needing it) with the configured M/construction_ef."""
+    if namespace is not None and namespace not in list_namespaces():
+        raise HTTPException(status_code=404, detail="Namespace not found")
+    targets = [namespace] if namespace else [s["namespace"] for s in index_status() if s["rebuild_required"]]
+    return [IndexStatus(**rebuild_index(ns)) for ns in targets]
@@ -2,32 +2,45 @@ from __future__ import annotations
 
 import json
 import logging
-from typing import List
+import time
+from contextlib import aclosing
+from typing import AsyncGenerator, List
 from uuid import uuid4
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, HTTPException, Request, status
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
 
 from ..config import settings
-from ..dependencies import get_db
 from ..schemas import ContextChunk, QueryRequest, QueryResponse
-from ..services.query_service import run_query
+from ..services.metrics import tracked_stream
+from ..services.profiling import profiler
+from ..services.providers import QueuePosition, overloaded_error, provider_limiter
+from ..services.runtime_config import get_runtime_models
+from ..services.query_service import query_fingerprint, run_query
+from ..services.singleflight import query_flights
 from ..services.search import RetrievedChunk
+from ..services.streaming import coalesce_text, until_disconnected
+from ..services.timings import RequestTimings, bind
 
 router = APIRouter()
 logger = logging.getLogger("query")
 
+# Coalesced runs render frames with this in place of a correlation id; each
+# subscriber substitutes its own, so error and timings frames match its header
+_CID_PLACEHOLDER = f"cid-{uuid4().hex}"
+
 
 def _normalize_error(detail, correlation_id: str):
     """Return a consistent SSE-safe error payload."""
     code = "SERVER_ERROR"
     message = "An unexpected error occurred."
     hint = None
+    retry_after = None
     if isinstance(detail, dict):
         code = detail.get("code", code)
         message = detail.get("message", message)
         hint = detail.get("hint")
+        retry_after = detail.get("retry_after")
     elif isinstance(detail, str):
         message = detail
     else:
@@ -36,6 +49,8 @@ def _normalize_error(detail, correlation_id: str):
     payload = {"code": code, "message": message, "correlation_id": correlation_id}
     if hint:
         payload["hint"] = hint
+    if retry_after is not None:
+        payload["retry_after"] = retry_after
     return payload
 
 
@@ -56,55 +71,129 @@ def _to_context_chunks(retrieved: List[RetrievedChunk]) -> List[ContextChunk]:
     return context
 
 
-@router.post("/query")
-def query(req: QueryRequest, db: Session = Depends(get_db)):
-    correlation_id = str(uuid4())
+def _sse(event: str | None, data: str | None, compact: bool) -> List[str]:
+    """One SSE event, as separate writes (legacy) or a single write (compact)."""
+    parts = []
+    if event:
+        parts.append(f"event: {event}\n")
+    if data is not None:
+        parts.append(f"data: {data}\n")
+    parts[-1] += "\n"
+    return ["".join(parts)] if compact else parts
 
-    # Use RAG settings from runtime config instead of request
-    from ..services.runtime_config import get_runtime_rag
-    rag_config = get_runtime_rag()
-    top_k = rag_config["top_k"]
-    file_ids = req.file_ids or None
-    logger.info("query: top_k=%s (from RAG config) stream=true file_ids=%s", top_k, file_ids)
 
-    try:
-        answer_stream, retrieved = run_query(db, req.query, top_k, file_ids=file_ids)
-    except HTTPException as exc:
-        logger.error("query failure cid=%s", correlation_id, exc_info=exc)
+def _closing_frames(timings: RequestTimings, shown_id: str, compact: bool) -> List[str]:
+    """Per-stage timings of the run, then the end marker."""
+    payload = {**timings.as_dict(), "correlation_id": shown_id}
+    return _sse("timings", json.dumps(payload), compact) + _sse("end", None, compact)
 
-        def error_stream():
-            payload = _normalize_error(exc.detail, correlation_id)
-            yield "event: error\n"
-            yield f"data: {json.dumps(payload)}\n\n"
-            yield "event: end\n\n"
 
-        return StreamingResponse(error_stream(), media_type="text/event-stream")
-    except Exception as exc:  # pragma: no cover
-        logger.exception("query failure cid=%s", correlation_id)
+async def _with_correlation_id(frames: AsyncGenerator[str, None], correlation_id: str) -> AsyncGenerator[str, None]:
+    async with aclosing(frames):
+        async for frame in frames:
+            yield frame.replace(_CID_PLACEHOLDER, correlation_id) if _CID_PLACEHOLDER in frame else frame
 
-        def error_stream():
-            payload = _normalize_error(str(exc), correlation_id)
-            yield "event: error\n"
-            yield f"data: {json.dumps(payload)}\n\n"
-            yield "event: end\n\n"
 
-        return StreamingResponse(error_stream(), media_type="text/event-stream")
+async def _query_frames(req: QueryRequest, correlation_id: str, shown_id: str | None = None) -> AsyncGenerator[str, None]:
+    """Run retrieval + generation once and yield the complete SSE frame sequence.
 
-    context_payload = _to_context_chunks(retrieved)
+    correlation_id names the run in logs and profiles; frames carry shown_id
+    (default: the same id), which coalesced runs set to _CID_PLACEHOLDER.
+    """
+    shown_id = shown_id or correlation_id
+    # Use RAG settings from runtime config instead of request
+    from ..services.runtime_config import get_runtime_rag
+    rag_config = get_runtime_rag()
+    top_k = rag_config["top_k"]
+    file_ids = req.file_ids or None
+    namespaces = req.namespaces or None
+    compact = req.framing == "compact"
+    logger.info("query: top_k=%s (from RAG config) stream=true file_ids=%s namespaces=%s", top_k, file_ids, namespaces)
+    timings = RequestTimings(correlation_id)
 
-    def sse_stream():
-        yield "event: context\n"
-        yield f"data: {json.dumps([c.model_dump() for c in context_payload])}\n\n"
-        yield "event: start\n\n"
+    with profiler.capture("query", correlation_id):
+        try:
+            with bind(timings):
+                answer_stream, retrieved = await run_query(req.query, top_k, file_ids=file_ids, namespaces=namespaces)
+        except HTTPException as exc:
+            logger.error("query failure cid=%s", correlation_id, exc_info=exc)
+            for part in _sse("error", json.dumps(_normalize_error(exc.detail, shown_id)), compact):
+                yield part
+            for part in _closing_frames(timings, shown_id, compact):
+                yield part
+            return
+        except Exception as exc:  # pragma: no cover
+            logger.exception("query failure cid=%s", correlation_id)
+            for part in _sse("error", json.dumps(_normalize_error(str(exc), shown_id)), compact):
+                yield part
+            for part in _closing_frames(timings, shown_id, compact):
+                yield part
+            return
+
+        context_payload = _to_context_chunks(retrieved)
+        for part in _sse("context", json.dumps([c.model_dump() for c in context_payload]), compact):
+            yield part
+        for part in _sse("start", None, compact):
+            yield part
+        if compact:
+            # Fewer, larger frames: one write per window / byte threshold instead of per token
+            answer_stream = coalesce_text(
+                answer_stream, settings.sse_coalesce_ms / 1000, settings.sse_coalesce_bytes
+            )
+        # Measured here rather than bound: the stream's steps may run in other tasks
+        generation_started = time.perf_counter()
+        first_token = True
         try:
-            for chunk in answer_stream:
-                # chunk is now JSON with 'raw' and 'cleaned' keys
-                yield f"data: {chunk}\n\n"
+            async with aclosing(answer_stream):
+                async for piece in answer_stream:
+                    if isinstance(piece, QueuePosition):
+                        # Waiting for a model slot; tell the client where it stands
+                        for part in _sse("queued", json.dumps({"position": piece.position}), compact):
+                            yield part
+                        continue
+                    if first_token:
+                        first_token = False
+                        timings.add("first_token", time.perf_counter() - generation_started)
+                    if compact:
+                        yield f"data: {json.dumps({'text': piece})}\n\n"
+                    else:
+                        # Send both raw and cleaned versions to preserve the client contract
+                        yield f"data: {json.dumps({'raw': piece, 'cleaned': piece})}\n\n"
         except Exception as exc:  # pragma: no cover
             logger.exception("streaming failure cid=%s", correlation_id)
-            payload = _normalize_error(getattr(exc, "detail", str(exc)), correlation_id)
-            yield "event: error\n"
-            yield f"data: {json.dumps(payload)}\n\n"
-        yield "event: end\n\n"
+            payload = _normalize_error(getattr(exc, "detail", str(exc)), shown_id)
+            for part in _sse("error", json.dumps(payload), compact):
+                yield part
+        timings.add("generate", time.perf_counter() - generation_started)
+        for part in _closing_frames(timings, shown_id, compact):
+            yield part
+
 
-    return StreamingResponse(sse_stream(), media_type="text/event-stream")
+@router.post("/query")
+async def query(req: QueryRequest, request: Request):
+    correlation_id = str(uuid4())
+
+    # Frames are pre-rendered, so only requests with the same framing can share them
+    key = (query_fingerprint(req.query, req.file_ids or None, req.namespaces or None), req.framing)
+    # Joining an in-flight identical query adds no model load, so only new runs are
+    # subject to admission control: reject up front while the HTTP status can still say so
+    if not (settings.query_coalescing_enabled and key in query_flights):
+        chat_provider = get_runtime_models()["chat_provider"]
+        if provider_limiter(chat_provider, "llm").saturated():
+            raise overloaded_error(status.HTTP_429_TOO_MANY_REQUESTS, chat_provider, "Too many requests are waiting for the model.")
+
+    if settings.query_coalescing_enabled:
+        # The leader's id only names the shared run in logs; every subscriber's frames carry its own
+        frames = _with_correlation_id(
+            query_flights.subscribe(key, lambda: _query_frames(req, correlation_id, _CID_PLACEHOLDER)), correlation_id
+        )
+    else:
+        frames = _query_frames(req, correlation_id)
+
+    # Stops reading as soon as the client disconnects; the model call is aborted once
+    # no other coalesced subscriber is still listening
+    return StreamingResponse(
+        tracked_stream(until_disconnected(frames, request.is_disconnected)),
+        media_type="text/event-stream",
+        headers={"X-Correlation-ID": correlation_id},
+    )
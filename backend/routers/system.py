@@ -1,12 +1,19 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..dependencies import get_db
+from ..dependencies import get_async_db
 from ..models import Chunk, File
-from ..schemas import StatsResponse
+from ..schemas import CacheStatsResponse, StatsResponse
+from ..services import warmup
+from ..services.latency import latency_stats
+from ..services.providers import limiter_stats
+from ..services.rag_store import cache_stats
+from ..services.timings import stage
 
 router = APIRouter()
 
@@ -16,8 +23,40 @@ def health():
     return {"status": "ok"}
 
 
+@router.get("/ready")
+def ready():
+    """Readiness probe: 200 once models, index and caches are warm, 503 before."""
+    payload = warmup.state.snapshot()
+    return JSONResponse(status_code=200 if warmup.state.ready else 503, content=payload)
+
+
 @router.get("/stats", response_model=StatsResponse)
-def stats(db: Session = Depends(get_db)):
-    files = db.query(func.count(File.id)).scalar() or 0
-    chunks = db.query(func.count(Chunk.id)).scalar() or 0
+async def stats(db: AsyncSession = Depends(get_async_db)):
+    with stage("db"):
+        # Tombstoned files and their chunks are excluded before compaction removes them
+        files = await db.scalar(select(func.count(File.id)).where(File.deleted.is_(False))) or 0
+        chunks = await db.scalar(select(func.count(Chunk.id)).join(File).where(File.deleted.is_(False))) or 0
     return StatsResponse(files=files, chunks=chunks)
+
+
+@router.get("/stats/cache", response_model=CacheStatsResponse)
+def stats_cache():
+    return CacheStatsResponse(**cache_stats())
+
+
+@router.get("/stats/admission")
+def stats_admission():
+    """Active / queued / rejected counts of each provider limiter that has been used."""
+    return limiter_stats()
+
+
+@router.get("/stats/latency")
+def stats_latency():
+    """Time-to-first-token / time-to-vector histograms per provider, model and kind."""
+    return latency_stats()
+
+
+@router.get("/metrics")
+def prometheus_metrics():
+    # Sync route: the scrape-time collector reads Chroma and SQLite, keep it off the loop
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -27,6 +27,7 @@ class FileMeta(BaseModel):
     updated_at: datetime
     converted_with_docling: bool = False
     raw_markdown: str | None = None
+    namespace: str = "default"
 
     class Config:
         from_attributes = True
@@ -39,6 +40,7 @@ class ChunkOut(BaseModel):
     content: str
     section_heading: Optional[str]
     page_number: Optional[int]
+    token_count: Optional[int] = None
     created_at: datetime
 
     class Config:
@@ -71,6 +73,11 @@ class QueryRequest(BaseModel):
     query: str = Field(..., min_length=1)
     stream: bool = False
     file_ids: List[int] | None = Field(default=None, description="Optional file IDs to scope the query. Empty or omitted means all files.")
+    namespaces: List[str] | None = Field(default=None, description="Optional namespaces to search. Empty or omitted means all loaded namespaces.")
+    framing: Literal["legacy", "compact"] = Field(
+        default="legacy",
+        description='SSE token framing: "legacy" sends one {"raw", "cleaned"} frame per token; "compact" coalesces tokens into {"text"} frames.',
+    )
 
 
 class StatsResponse(BaseModel):
@@ -78,6 +85,27 @@ class StatsResponse(BaseModel):
     chunks: int
 
 
+class NamespaceInfo(BaseModel):
+    namespace: str
+    loaded: bool
+    vectors: Optional[int] = None
+    files: Optional[int] = None
+
+
+class CacheStats(BaseModel):
+    size: int
+    maxsize: int
+    hits: int
+    misses: int
+    hit_rate: float
+
+
+class CacheStatsResponse(BaseModel):
+    query_embeddings: CacheStats
+    retrieval_results: CacheStats
+    answers: CacheStats
+
+
 # Suggested questions flow removed from API
 
 
@@ -138,6 +166,9 @@ class RAGSelection(BaseModel):
     lambda_mult: float | None = Field(default=None, ge=0.0, le=1.0)
     chunking_method: ChunkingMethod | None = None
     vector_backend: str = "chroma"
+    hnsw_m: int | None = Field(default=None, ge=2, le=128)
+    hnsw_construction_ef: int | None = Field(default=None, ge=8, le=2000)
+    hnsw_search_ef: int | None = Field(default=None, ge=1, le=2000)
 
 
 class RAGSelectionResponse(BaseModel):
@@ -146,3 +177,31 @@ class RAGSelectionResponse(BaseModel):
 
 class RAGSelectionRequest(BaseModel):
     selection: RAGSelection
+
+
+class IndexStatus(BaseModel):
+    namespace: str
+    vectors: int
+    hnsw_m: Optional[int] = None
+    hnsw_construction_ef: Optional[int] = None
+    hnsw_search_ef: Optional[int] = None
+    space: Optional[str] = None
+    rebuild_required: bool
+    # Set by a rebuild that migrated the collection to the configured distance
+    previous_space: Optional[str] = None
+
+
+class ProfileRequest(BaseModel):
+    target: Literal["query", "ingest"]
+    mode: Literal["cprofile", "tracemalloc"] = "cprofile"
+    count: int = Field(default=1, ge=1, le=10, description="How many upcoming requests of the target to capture.")
+
+
+class SnapshotExportRequest(BaseModel):
+    path: str = Field(..., description="New directory on this host to write the bundle to.")
+    base: str | None = Field(default=None, description="Earlier bundle (or its manifest.json) to write a delta against.")
+
+
+class SnapshotApplyRequest(BaseModel):
+    path: str = Field(..., description="Bundle directory on this host.")
+    replace: bool = Field(default=False, description="Overwrite an index that did not come from a snapshot.")
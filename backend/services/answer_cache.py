@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+import numpy as np
+
+from ..config import settings
+from .shared_state import Stamp
+
+# (chat provider, chat model, index generation before retrieval, retrieved chunk ids)
+AnswerKey = Tuple[str, str, Stamp, FrozenSet[str]]
+
+
+@dataclass
+class _Entry:
+    embedding: np.ndarray  # unit-normalised question embedding
+    answer: str
+
+
+class AnswerCache:
+    """Semantic cache of final answers.
+
+    An answer is reused only when the new question retrieved exactly the same chunk
+    set for the same chat model and its embedding is within the cosine threshold of
+    a cached question. Keys carry the shared index generation (chunk ids can be
+    reused by a reingest), and the cache empties itself the first time it sees a
+    newer one, so a write in any worker retires every answer in all of them.
+    """
+
+    def __init__(self, maxsize: int, per_key: int = 8):
+        self.maxsize = maxsize
+        self.per_key = per_key
+        self._entries: OrderedDict[AnswerKey, List[_Entry]] = OrderedDict()
+        self._generation: Stamp = None
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _unit(embedding: Iterable[float]) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def lookup(self, key: AnswerKey, embedding: Iterable[float], threshold: float) -> str | None:
+        query = self._unit(embedding)
+        with self._lock:
+            if key[2] != self._generation:
+                # The index changed (here or in another worker) since these entries were stored
+                self._entries.clear()
+                self._generation = key[2]
+            best: _Entry | None = None
+            best_sim = threshold
+            for entry in self._entries.get(key, ()):
+                sim = float(entry.embedding @ query)
+                if sim >= best_sim:
+                    best, best_sim = entry, sim
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return best.answer
+
+    def store(self, key: AnswerKey, embedding: Iterable[float], answer: str) -> None:
+        if self.maxsize <= 0 or not answer:
+            return
+        with self._lock:
+            if key[2] != self._generation:
+                return  # written while the answer was generated; its contexts may be stale
+            bucket = self._entries.setdefault(key, [])
+            bucket.append(_Entry(embedding=self._unit(embedding), answer=answer))
+            del bucket[: -self.per_key]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float | int]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+answer_cache = AnswerCache(settings.answer_cache_size)
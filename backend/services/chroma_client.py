@@ -1,21 +1,36 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
-
-import chromadb
-from chromadb.api import Collection
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Dict, List
 
 from ..config import settings
 
+if TYPE_CHECKING:
+    from chromadb.api import ClientAPI, Collection
 
-_client = chromadb.PersistentClient(path=str(settings.chroma_dir))
+# Opened on first use: importing chromadb and opening the store cost about a second,
+# and processes that never touch the index (tools, tests, migrations) skip it
+_client: ClientAPI | None = None
+_client_lock = Lock()
 _collection: Collection | None = None
 
 
+def get_client() -> ClientAPI:
+    """Shared persistent client; every namespace collection lives in the same store."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import chromadb
+
+                _client = chromadb.PersistentClient(path=str(settings.chroma_dir))
+    return _client
+
+
 def get_collection() -> Collection:
     global _collection
     if _collection is None:
-        _collection = _client.get_or_create_collection(name=settings.chroma_collection, metadata={"hnsw:space": "cosine"})
+        _collection = get_client().get_or_create_collection(name=settings.chroma_collection, metadata={"hnsw:space": "cosine"})
     return _collection
 
 
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import Chunk, File
+from .file_catalog import file_catalog
+from .rag_store import index_status, purge_file, rebuild_index
+from .shared_state import FileLock, LockHeld, state_path, write_atomic
+
+logger = logging.getLogger("compactor")
+
+# Held by whichever worker's pass is running; the others skip their turn
+_compaction_lock = FileLock("compaction")
+# namespace -> vectors purged since its last rebuild, shared by every worker
+_PURGED_FILE = "compaction_purged.json"
+
+
+def _load_purged() -> Dict[str, int]:
+    try:
+        return json.loads(state_path(_PURGED_FILE).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_purged(purged: Dict[str, int]) -> None:
+    write_atomic(state_path(_PURGED_FILE), json.dumps(purged))
+
+
+class Compactor:
+    """Purges tombstoned files in the background and rebuilds the namespaces they fragmented.
+
+    Per file: vectors, then chunk rows (both in batches of compaction_batch_size, each
+    batch its own short write), then the blob, and the file row last, so a pass that
+    dies midway leaves a tombstone the next pass finishes. Every worker runs the loop,
+    but a lock file under storage/state lets one pass run at a time; the purge counts
+    that decide rebuilds are kept there too. Rebuilds need compaction_auto_rebuild.
+    """
+
+    def __init__(self):
+        self.last_run: Dict[str, Any] | None = None
+
+    def run_once(self, max_files: int = 50) -> Dict[str, Any]:
+        """One pass over up to max_files tombstoned files, oldest first."""
+        try:
+            with _compaction_lock.hold(blocking=False):
+                return self._run(max_files)
+        except LockHeld:
+            return {"status": "running"}
+
+    def _run(self, max_files: int) -> Dict[str, Any]:
+        started = time.perf_counter()
+        with SessionLocal() as session:
+            rows = session.execute(
+                select(File.id, File.namespace, File.filepath)
+                .where(File.deleted.is_(True))
+                .order_by(File.updated_at)
+                .limit(max_files)
+            ).all()
+        purged = _load_purged()
+        files = vectors = chunks = 0
+        try:
+            for file_id, namespace, filepath in rows:
+                try:
+                    purged_vectors, purged_chunks = self._purge(file_id, namespace, filepath)
+                except HTTPException as exc:
+                    # Namespace being rebuilt; retried next pass
+                    logger.info("compaction of file %s deferred: %s", file_id, exc.detail)
+                    continue
+                files += 1
+                vectors += purged_vectors
+                chunks += purged_chunks
+                purged[namespace] = purged.get(namespace, 0) + purged_vectors
+        finally:
+            if files:
+                # One stamp bump for the whole pass rather than one per file
+                file_catalog.announce()
+        rebuilt = self._rebuild_fragmented(purged) if settings.compaction_auto_rebuild else []
+        if files or rebuilt:
+            _save_purged(purged)
+        # Picks up tombstones set by other workers; a no-op unless the catalog stamp moved
+        file_catalog.refresh()
+        self.last_run = {
+            "status": "ok",
+            "files": files,
+            "vectors": vectors,
+            "chunks": chunks,
+            "rebuilt": rebuilt,
+            "pending": file_catalog.tombstone_count(),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        if files or rebuilt:
+            logger.info("compaction: %s", self.last_run)
+        return self.last_run
+
+    def _purge(self, file_id: int, namespace: str, filepath: str) -> Tuple[int, int]:
+        batch_size = settings.compaction_batch_size
+        vectors = purge_file(file_id, namespace, batch_size)
+        chunks = 0
+        with SessionLocal() as session:
+            while True:
+                ids = session.scalars(select(Chunk.id).where(Chunk.file_id == file_id).limit(batch_size)).all()
+                if not ids:
+                    break
+                session.execute(delete(Chunk).where(Chunk.id.in_(ids)))
+                session.commit()
+                chunks += len(ids)
+            Path(filepath).unlink(missing_ok=True)
+            session.execute(delete(File).where(File.id == file_id, File.deleted.is_(True)))
+            session.commit()
+        file_catalog.remove(file_id, announce=False)
+        return vectors, chunks
+
+    def _rebuild_fragmented(self, purged: Dict[str, int]) -> List[str]:
+        """Rebuild namespaces past compaction_rebuild_ratio; resets their counts in purged."""
+        if not any(purged.values()):
+            return []
+        remaining = {status["namespace"]: status["vectors"] for status in index_status()}
+        rebuilt = []
+        for namespace, count in list(purged.items()):
+            if count < settings.compaction_rebuild_ratio * (remaining.get(namespace, 0) + count):
+                continue
+            try:
+                rebuild_index(namespace)
+            except HTTPException:
+                continue  # a rebuild is already running
+            purged.pop(namespace, None)
+            rebuilt.append(namespace)
+        return rebuilt
+
+    async def run_forever(self) -> None:
+        while True:
+            await asyncio.sleep(settings.compaction_interval_seconds)
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception:
+                logger.exception("compaction pass failed")
+
+
+compactor = Compactor()
@@ -4,28 +4,14 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import List, Optional, Tuple, Any, Dict
 
-from docx import Document
 from langchain_core.documents.base import Document as LangchainDocument
-from pdfminer.high_level import extract_pages
-from pdfminer.layout import LTTextContainer
-from langchain_text_splitters import (
-    RecursiveCharacterTextSplitter,
-    CharacterTextSplitter,
-    MarkdownHeaderTextSplitter,
-    TokenTextSplitter,
-    NLTKTextSplitter,
-    SpacyTextSplitter,
-)
 
 from ..config import settings
 from ..schemas import ChunkingMethod
+from .metrics import ingest_stage
 
-from docling.datamodel.base_models import InputFormat
-from docling.datamodel.pipeline_options import (
-    PdfPipelineOptions,
-)
-from docling.datamodel.accelerator_options import AcceleratorDevice, AcceleratorOptions
-from docling.document_converter import DocumentConverter, PdfFormatOption
+# Docling (with torch/transformers) and the text splitters are imported inside the
+# functions that use them: they take seconds to import and only ingestion needs them.
 
 
 @dataclass
@@ -59,15 +45,17 @@ def convert_to_chunks(
 ) -> Tuple[List[ChunkPayload], bool, str]:
     """Convert file to chunks using specified chunking method. Returns (chunks, used_docling, raw_markdown)."""
     # Convert all file types to markdown first
-    if filetype in {"pdf", "docx"}:
-        # Use Docling to convert to markdown
-        markdown = _convert_with_docling_to_markdown(path)
-    else:  # txt
-        # Plain text is valid markdown
-        markdown = path.read_text(encoding="utf-8", errors="ignore")
+    with ingest_stage("convert"):
+        if filetype in {"pdf", "docx"}:
+            # Use Docling to convert to markdown
+            markdown = _convert_with_docling_to_markdown(path)
+        else:  # txt
+            # Plain text is valid markdown
+            markdown = path.read_text(encoding="utf-8", errors="ignore")
     
     # Convert markdown to chunks
-    chunks = markdown_to_chunks(markdown, chunking_method)
+    with ingest_stage("chunk"):
+        chunks = markdown_to_chunks(markdown, chunking_method)
     return chunks, True, markdown
 
 
@@ -75,6 +63,10 @@ def _convert_with_docling_to_markdown(path: Path) -> str:
     """Convert a document to Markdown using Docling. Returns empty string on failure."""
     try:
         # Import inside function to avoid import-time errors if Docling isn't installed yet.
+        from docling.datamodel.accelerator_options import AcceleratorDevice, AcceleratorOptions
+        from docling.datamodel.base_models import InputFormat
+        from docling.datamodel.pipeline_options import PdfPipelineOptions
+        from docling.document_converter import DocumentConverter, PdfFormatOption
 
         pipeline_options = PdfPipelineOptions()
         accelerator = AcceleratorOptions(device=AcceleratorDevice.CUDA, num_threads=6,)
@@ -107,6 +99,15 @@ def markdown_to_chunks(
     """Chunk Markdown text using the specified LangChain text splitter."""
     if not markdown_text:
         return []
+
+    from langchain_text_splitters import (
+        RecursiveCharacterTextSplitter,
+        CharacterTextSplitter,
+        MarkdownHeaderTextSplitter,
+        TokenTextSplitter,
+        NLTKTextSplitter,
+        SpacyTextSplitter,
+    )
     
     # Create the appropriate text splitter based on method
     docs: List[LangchainDocument] = []
@@ -3,9 +3,7 @@ from __future__ import annotations
 from typing import List
 from functools import lru_cache
 
-import ollama
 from fastapi import HTTPException, status
-from langchain_openai import OpenAIEmbeddings
 
 from ..config import settings
 from .runtime_config import get_runtime_models
@@ -13,6 +11,8 @@ from .runtime_config import get_runtime_models
 
 @lru_cache(maxsize=1)
 def _ollama_client():
+    import ollama
+
     return ollama.Client(host=settings.ollama_base_url)
 
 
@@ -20,6 +20,8 @@ def _ollama_client():
 def _openai_embeddings():
     if not settings.openai_api_key:
         raise ValueError("OpenAI API key not configured (RAG_OPENAI_API_KEY)")
+    from langchain_openai import OpenAIEmbeddings
+
     models = get_runtime_models()
     return OpenAIEmbeddings(api_key=settings.openai_api_key, model=models["embedding_model"])
 
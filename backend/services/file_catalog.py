@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict
+
+from sqlalchemy import func, select
+
+from ..database import SessionLocal
+from ..models import Chunk, File
+from .metrics import DB_LOOKUP_SECONDS, timed
+from .shared_state import SharedStamp, Stamp
+from .timings import stage
+
+logger = logging.getLogger("file_catalog")
+
+# A hit for an unknown file id (e.g. ingested by another worker) triggers a reload,
+# at most this often so orphaned vectors cannot turn every query into a DB scan
+_MISS_RELOAD_SECONDS = 5.0
+# Bumped by every change to the catalog; a worker whose copy predates it reloads
+# before serving hits, so tombstones set by another worker take effect at once
+_catalog_stamp = SharedStamp("file_catalog")
+
+
+@dataclass(frozen=True)
+class FileEntry:
+    filename: str
+    filetype: str
+    deleted: bool
+
+
+class FileCatalog:
+    """In-memory file id -> metadata map used by the retrieval path.
+
+    Loaded once from SQLite and kept current by ingest, reingest and delete, so a
+    query can label its hits without opening a DB session. Also tracks tombstoned
+    (deleted, not yet compacted) files per namespace with their vector counts, which
+    retrieval excludes. Changes made in other workers arrive through a shared stamp
+    checked by ensure_loaded() and refresh().
+    """
+
+    def __init__(self):
+        self._entries: Dict[int, FileEntry] = {}
+        # namespace -> {file_id: vectors still in the index}
+        self._tombstones: Dict[str, Dict[int, int]] = {}
+        self._lock = Lock()
+        self._loaded = False
+        self._missed_at = 0.0
+        self._stamp: Stamp = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self) -> int:
+        """(Re)read every file row; returns the number of entries."""
+        # Read before the rows, so a change committed meanwhile triggers another load
+        stamp = _catalog_stamp.current()
+        with timed(DB_LOOKUP_SECONDS, operation="file_catalog"), stage("db"), SessionLocal() as session:
+            rows = session.execute(select(File.id, File.filename, File.filetype, File.deleted, File.namespace)).all()
+            counts = dict(
+                session.execute(
+                    select(Chunk.file_id, func.count()).join(File).where(File.deleted.is_(True)).group_by(Chunk.file_id)
+                ).all()
+            )
+        entries: Dict[int, FileEntry] = {}
+        tombstones: Dict[str, Dict[int, int]] = {}
+        for file_id, filename, filetype, deleted, namespace in rows:
+            entries[file_id] = FileEntry(filename=filename, filetype=filetype, deleted=bool(deleted))
+            if deleted:
+                tombstones.setdefault(namespace, {})[file_id] = counts.get(file_id, 0)
+        with self._lock:
+            self._entries = entries
+            self._tombstones = tombstones
+            self._loaded = True
+            self._stamp = stamp
+        logger.info("file catalog loaded: %s files", len(entries))
+        return len(entries)
+
+    def stale(self) -> bool:
+        """True if never loaded or another worker changed the catalog since (one stat)."""
+        return not self._loaded or _catalog_stamp.current() != self._stamp
+
+    def reload_everywhere(self) -> int:
+        """After rows changed behind the catalog's back: reload here and in every other worker."""
+        _catalog_stamp.bump()
+        return self.load()
+
+    def ensure_loaded(self) -> None:
+        if self.stale():
+            self.load()
+
+    def refresh(self) -> None:
+        """Reload if another worker changed the catalog; no-op before the first load."""
+        if self._loaded and self.stale():
+            self.load()
+
+    def lookup(self, file_ids) -> Dict[int, FileEntry]:
+        """Entries for the given ids; reloads once (throttled) if any are unknown."""
+        self.ensure_loaded()
+        wanted = set(file_ids)
+        with self._lock:
+            found = {fid: self._entries[fid] for fid in wanted if fid in self._entries}
+        now = time.monotonic()
+        if len(found) < len(wanted) and now - self._missed_at >= _MISS_RELOAD_SECONDS:
+            self._missed_at = now
+            self.load()
+            with self._lock:
+                found = {fid: self._entries[fid] for fid in wanted if fid in self._entries}
+        return found
+
+    def needs_reload(self, file_ids) -> bool:
+        """True if lookup() would hit the database for these ids."""
+        if self.stale():
+            return True
+        with self._lock:
+            missing = any(fid not in self._entries for fid in file_ids)
+        return missing and time.monotonic() - self._missed_at >= _MISS_RELOAD_SECONDS
+
+    def put(self, file: File) -> None:
+        entry = FileEntry(filename=file.filename, filetype=file.filetype, deleted=bool(file.deleted))
+        with self._lock:
+            self._entries[file.id] = entry
+            self._announce()
+
+    def remove(self, file_id: int, announce: bool = True) -> None:
+        """Forget a purged file; with announce=False the caller announce()s once for a batch."""
+        with self._lock:
+            self._entries.pop(file_id, None)
+            for dead in self._tombstones.values():
+                dead.pop(file_id, None)
+            if announce:
+                self._announce()
+
+    def announce(self) -> None:
+        """Tell other workers to reload after changes made with announce=False."""
+        with self._lock:
+            self._announce()
+
+    def tombstone(self, file: File, vectors: int) -> None:
+        """Mark a file deleted; its vectors stay excluded from retrieval until remove()."""
+        with self._lock:
+            self._entries[file.id] = FileEntry(filename=file.filename, filetype=file.filetype, deleted=True)
+            self._tombstones.setdefault(file.namespace, {})[file.id] = vectors
+            self._announce()
+
+    def _announce(self) -> None:
+        # Caller holds self._lock. Tell other workers to reload; keep our own copy
+        # (already updated) current unless someone else changed the catalog first
+        before = _catalog_stamp.current()
+        after = _catalog_stamp.bump()
+        if self._loaded and before == self._stamp:
+            self._stamp = after
+
+    def tombstones(self, namespace: str) -> Dict[int, int]:
+        """Tombstoned file id -> vector count in a namespace (never touches the DB)."""
+        with self._lock:
+            return dict(self._tombstones.get(namespace) or {})
+
+    def tombstone_count(self) -> int:
+        with self._lock:
+            return sum(len(dead) for dead in self._tombstones.values())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = {}
+            self._tombstones = {}
+            self._loaded = False
+            self._missed_at = 0.0
+            self._stamp = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+file_catalog = FileCatalog()
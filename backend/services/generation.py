@@ -1,26 +1,36 @@
 from __future__ import annotations
 
-from typing import Generator, Iterable, List
+from contextlib import aclosing
+from typing import TYPE_CHECKING, AsyncGenerator, Generator, Iterable, List, Tuple, Union
 from functools import lru_cache
 import logging
+import time
 
 from fastapi import HTTPException, status
 from langchain_core.messages import HumanMessage
-from langchain_core.language_models import BaseChatModel
-from langchain_ollama import ChatOllama
-from langchain_openai import ChatOpenAI
 
 from ..config import settings
+from .hedging import HedgeDeclined, hedged_stream
+from .latency import hedge_delay, histogram
+from .metrics import TIME_TO_FIRST_TOKEN_SECONDS, provider_error, record_stream
+from .providers import ProviderLimiter, QueuePosition, hedge_label, list_models_for_provider, provider_limiter
 from .runtime_config import get_runtime_models
 
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+    from langchain_ollama import ChatOllama
+    from langchain_openai import ChatOpenAI
 
 logger = logging.getLogger("generation")
 
 
 @lru_cache(maxsize=4)
-def _ollama_chat_client(model: str) -> ChatOllama:
-    # Cache clients per-model to avoid recreating transports.
-    return ChatOllama(base_url=settings.ollama_base_url, model=model)
+def _ollama_chat_client(model: str, base_url: str | None = None) -> ChatOllama:
+    # Cache clients per-model (and per node, for the hedge node) to avoid recreating transports.
+    # Provider integrations are imported on first use; each costs a second or more.
+    from langchain_ollama import ChatOllama
+
+    return ChatOllama(base_url=base_url or settings.ollama_base_url, model=model, keep_alive=settings.model_keep_alive_seconds)
 
 
 @lru_cache(maxsize=4)
@@ -28,22 +38,81 @@ def _openai_chat_client(model: str) -> ChatOpenAI:
     # Cache OpenAI clients per-model
     if not settings.openai_api_key:
         raise ValueError("OpenAI API key not configured (RAG_OPENAI_API_KEY)")
-    return ChatOpenAI(api_key=settings.openai_api_key, model=model)
+    from langchain_openai import ChatOpenAI
 
+    return ChatOpenAI(api_key=settings.openai_api_key, model=model)
 
-def _get_chat() -> BaseChatModel:
-    models = get_runtime_models()
-    provider = models["chat_provider"]
-    model = models["chat_model"]
 
+def _chat_client(provider: str, model: str, base_url: str | None = None) -> BaseChatModel:
     if provider == "openai":
         return _openai_chat_client(model)
     elif provider == "ollama":
-        return _ollama_chat_client(model)
+        return _ollama_chat_client(model, base_url)
     else:
         raise ValueError(f"Unknown chat provider: {provider}")
 
 
+def _get_chat() -> BaseChatModel:
+    models = get_runtime_models()
+    return _chat_client(models["chat_provider"], models["chat_model"])
+
+
+def _chat_limiter() -> ProviderLimiter:
+    return provider_limiter(get_runtime_models()["chat_provider"], "llm")
+
+
+def _hedge_chat_target() -> Tuple[str, str, str | None] | None:
+    """(provider, model, ollama node) to hedge chat calls to, or None when not configured."""
+    if not settings.hedge_enabled:
+        return None
+    models = get_runtime_models()
+    provider = settings.hedge_chat_provider or models["chat_provider"]
+    model = settings.hedge_chat_model or models["chat_model"]
+    base_url = (settings.hedge_ollama_base_url or None) if provider == "ollama" else None
+    if (provider, model, base_url) == (models["chat_provider"], models["chat_model"], None):
+        return None
+    return provider, model, base_url
+
+
+async def _text_chunks(chat: BaseChatModel, messages: List[HumanMessage]) -> AsyncGenerator[str, None]:
+    async with aclosing(chat.astream(messages)) as stream:
+        async for chunk in stream:
+            if chunk.content:
+                yield chunk.content
+
+
+async def _hedge_chunks(target: Tuple[str, str, str | None], messages: List[HumanMessage]) -> AsyncGenerator[str, None]:
+    provider, model, base_url = target
+    # Hedges are opportunistic: never queue for the secondary, just decline
+    limiter = provider_limiter(hedge_label(provider, base_url), "llm")
+    if not limiter.try_acquire():
+        raise HedgeDeclined()
+    try:
+        async with aclosing(_text_chunks(_chat_client(provider, model, base_url), messages)) as stream:
+            async for piece in stream:
+                yield piece
+    finally:
+        limiter.release()
+
+
+def _model_context_length(provider: str, model: str) -> int | None:
+    # Not memoised: the model catalog already caches listings, and re-fetches failed
+    # ones after model_catalog_error_ttl_seconds instead of pinning None forever
+    try:
+        for info in list_models_for_provider(provider, "llm"):
+            if info.id == model:
+                return info.context_length
+    except KeyError:
+        pass
+    return None
+
+
+def chat_context_length() -> int:
+    """Context window of the selected chat model, in tokens."""
+    models = get_runtime_models()
+    return _model_context_length(models["chat_provider"], models["chat_model"]) or settings.default_context_length
+
+
 def reset_chat_client_cache() -> None:
     _ollama_chat_client.cache_clear()
     _openai_chat_client.cache_clear()
@@ -68,14 +137,78 @@ def build_prompt(question: str, contexts: Iterable[str]) -> str:
 
 def generate_answer(question: str, contexts: List[str], stream: bool = False):
     prompt = build_prompt(question, contexts)
+    models = get_runtime_models()
     try:
         chat = _get_chat()
         if stream:
-            return _stream(prompt, chat)
-        result = chat.invoke([HumanMessage(content=prompt)])
+            return _stream(prompt, chat, _chat_limiter())
+        with _chat_limiter().slot():
+            result = chat.invoke([HumanMessage(content=prompt)])
         raw = result.content or ""
         return _cleanup_text(str(raw))
+    except HTTPException:
+        raise
+    except Exception as exc:  # pragma: no cover
+        provider_error(models["chat_provider"], models["chat_model"], "llm")
+        detail = {
+            "code": "GENERATION_FAILED",
+            "message": "Generation failed while contacting the model.",
+            "hint": "Verify the model is reachable and retry.",
+        }
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=detail) from exc
+
+
+async def astream_answer(question: str, contexts: List[str]) -> AsyncGenerator[Union[str, QueuePosition], None]:
+    """Stream answer text pieces from the model's native async stream.
+
+    While the provider is at capacity this yields ``QueuePosition`` markers instead
+    of text. With hedging enabled, a secondary provider/model/node is raced against
+    the primary if no first token arrives within the primary's latency percentile.
+    Closing this generator (client disconnect) leaves the queue or closes the upstream
+    stream, which drops the HTTP connection to the provider and stops generation there.
+    """
+    messages = [HumanMessage(content=build_prompt(question, contexts))]
+    models = get_runtime_models()
+    provider, model = models["chat_provider"], models["chat_model"]
+    try:
+        chat = _chat_client(provider, model)
+        limiter = provider_limiter(provider, "llm")
+        async with aclosing(limiter.queue()) as waiting:
+            async for position in waiting:
+                yield QueuePosition(position)
+        try:
+            primary_latency = histogram(provider, model, "llm")
+            target = _hedge_chat_target()
+
+            def record(label: str, seconds: float) -> None:
+                if label == "primary":
+                    primary_latency.observe(seconds)
+                elif target is not None:
+                    histogram(hedge_label(target[0], target[2]), target[1], "llm").observe(seconds)
+
+            stream = hedged_stream(
+                lambda: _text_chunks(chat, messages),
+                (lambda: _hedge_chunks(target, messages)) if target is not None else None,
+                hedge_delay(primary_latency),
+                record,
+            )
+            started = time.perf_counter()
+            first_token_at = None
+            pieces: List[str] = []
+            async with aclosing(stream):
+                async for piece in stream:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        TIME_TO_FIRST_TOKEN_SECONDS.labels(provider=provider, model=model).observe(first_token_at - started)
+                    pieces.append(piece)
+                    yield piece
+            record_stream(provider, model, started, first_token_at, "".join(pieces))
+        finally:
+            limiter.release()
+    except HTTPException:
+        raise
     except Exception as exc:  # pragma: no cover
+        provider_error(provider, model, "llm")
         detail = {
             "code": "GENERATION_FAILED",
             "message": "Generation failed while contacting the model.",
@@ -84,14 +217,13 @@ def generate_answer(question: str, contexts: List[str], stream: bool = False):
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=detail) from exc
 
 
-def _stream(prompt: str, chat: BaseChatModel) -> Generator[str, None, None]:
-    stream = chat.stream([HumanMessage(content=prompt)])
-    for chunk in stream:
-        piece = chunk.content
-        if piece:
-            # Yield both raw and cleaned versions as JSON to preserve downstream contract
-            import json
-            yield json.dumps({"raw": piece, "cleaned": piece})
+def _stream(prompt: str, chat: BaseChatModel, limiter: ProviderLimiter) -> Generator[str, None, None]:
+    with limiter.slot():
+        stream = chat.stream([HumanMessage(content=prompt)])
+        for chunk in stream:
+            piece = chunk.content
+            if piece:
+                yield piece
 
 
 def _cleanup_text(text: str) -> str:
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from contextlib import suppress
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+
+logger = logging.getLogger("hedging")
+
+T = TypeVar("T")
+
+_EXHAUSTED = object()
+
+
+class HedgeDeclined(Exception):
+    """Raised by a hedge attempt that chooses not to run (e.g. secondary at capacity)."""
+
+
+async def hedged_stream(
+    primary: Callable[[], AsyncIterator[T]],
+    hedge: Optional[Callable[[], AsyncIterator[T]]],
+    delay: float,
+    record: Callable[[str, float], None],
+) -> AsyncIterator[T]:
+    """Yield from whichever of two equivalent streams produces its first item first.
+
+    ``primary`` starts immediately. If it has produced nothing after ``delay`` seconds,
+    or fails before producing anything, ``hedge`` is started. A hedge that raises
+    (e.g. ``HedgeDeclined`` when the secondary has no free slot) is ignored in favour
+    of the primary. The first stream to produce an item wins; the other is cancelled
+    and closed. ``record(label, seconds)`` is called with the winner's time to first
+    item only: a cancelled loser's running time is cut short when the winner answers,
+    and recording it would pull the histogram (and so the next hedge delay) down.
+    """
+    loop = asyncio.get_running_loop()
+    started: Dict[str, float] = {}
+    streams: Dict[str, AsyncIterator[T]] = {}
+    pending: Dict[asyncio.Future, str] = {}
+
+    def start(label: str, stream: AsyncIterator[T]) -> None:
+        streams[label] = stream
+        started[label] = loop.time()
+        pending[asyncio.ensure_future(stream.__anext__())] = label
+
+    def start_hedge() -> None:
+        if hedge is None or "hedge" in streams:
+            return
+        logger.info("hedging after %.3fs", loop.time() - started["primary"])
+        start("hedge", hedge())
+
+    start("primary", primary())
+    winner: Optional[str] = None
+    first: object = _EXHAUSTED
+    error: Optional[BaseException] = None
+    try:
+        done, _ = await asyncio.wait(pending, timeout=delay)
+        if not done:
+            start_hedge()
+        while pending and winner is None:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                label = pending.pop(task)
+                try:
+                    first = task.result()
+                except StopAsyncIteration:
+                    first = _EXHAUSTED
+                except HedgeDeclined:
+                    continue
+                except Exception as exc:
+                    # Fail over: let the other attempt (or a fresh hedge) answer instead
+                    logger.warning("%s attempt failed: %s", label, exc)
+                    error = error or exc
+                    start_hedge()
+                    continue
+                winner = label
+                record(label, loop.time() - started[label])
+                break
+        if winner is None:
+            raise error or HedgeDeclined()
+    finally:
+        for task, label in pending.items():
+            task.cancel()
+            with suppress(BaseException):
+                await task
+        for label, stream in streams.items():
+            if label != winner:
+                with suppress(Exception):
+                    await stream.aclose()
+
+    try:
+        if first is not _EXHAUSTED:
+            yield first
+            async for item in streams[winner]:
+                yield item
+    finally:
+        await streams[winner].aclose()
+
+
+async def hedged_call(
+    primary: Callable[[], Awaitable[T]],
+    hedge: Optional[Callable[[], Awaitable[T]]],
+    delay: float,
+    record: Callable[[str, float], None],
+) -> T:
+    """Single-result variant of ``hedged_stream``."""
+
+    async def once(factory: Callable[[], Awaitable[T]]) -> AsyncIterator[T]:
+        yield await factory()
+
+    stream = hedged_stream(
+        lambda: once(primary), (lambda: once(hedge)) if hedge is not None else None, delay, record
+    )
+    try:
+        async for result in stream:
+            return result
+    finally:
+        await stream.aclose()
+    raise RuntimeError("hedged call produced no result")
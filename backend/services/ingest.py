@@ -5,23 +5,33 @@ from pathlib import Path
 from typing import Tuple
 
 from fastapi import HTTPException, UploadFile, status
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
 from langchain_core.documents import Document
 
+from ..config import settings
 from ..models import Chunk, File
 from ..schemas import ChunkingMethod
 from .conversion import convert_to_chunks
-from .rag_store import add_documents, delete_by_file
+from .file_catalog import file_catalog
+from .metrics import ingest_stage
+from .rag_store import add_documents, delete_by_file, ensure_writable, invalidate_results
+from .tokens import count_tokens
 from .files import save_upload_file
 
 
 def ingest_file(
     session: Session,
     upload: UploadFile,
-    chunking_method: ChunkingMethod = ChunkingMethod.RECURSIVE_CHARACTER
+    chunking_method: ChunkingMethod = ChunkingMethod.RECURSIVE_CHARACTER,
+    namespace: str | None = None,
 ) -> Tuple[File, int, str]:
-    destination, filetype = save_upload_file(upload)
+    namespace = namespace or settings.default_namespace
+    # Refuse before the file row becomes visible rather than after it is committed
+    ensure_writable(namespace)
+    with ingest_stage("save"):
+        destination, filetype = save_upload_file(upload)
     size_mb = destination.stat().st_size / (1024 * 1024)
 
     file_record = File(
@@ -29,10 +39,12 @@ def ingest_file(
         filepath=str(destination),
         filetype=filetype,
         size_mb=round(size_mb, 2),
+        namespace=namespace,
     )
     session.add(file_record)
     session.commit()
     session.refresh(file_record)
+    file_catalog.put(file_record)
 
     chunk_count, used_docling, raw_markdown = _process_chunks(
         session, file_record, Path(destination), filetype, chunking_method
@@ -45,15 +57,23 @@ def ingest_file(
 
 
 def remove_file(session: Session, file_id: int):
+    """Tombstone a file: retrieval stops returning it at once, the compactor purges it later."""
     file_obj = session.get(File, file_id)
-    if not file_obj:
+    if not file_obj or file_obj.deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
-    delete_by_file(file_id)
+    vectors = session.scalar(select(func.count()).select_from(Chunk).where(Chunk.file_id == file_id)) or 0
+    # Move the blob aside so the name (and the unique filepath) can be uploaded again
+    # before compaction, and the compactor's unlink cannot hit the new upload
     path = Path(file_obj.filepath)
+    tombstoned = path.with_name(f"{path.name}.deleted-{file_id}")
     if path.exists():
-        path.unlink()
-    session.delete(file_obj)
+        path.replace(tombstoned)
+    file_obj.filepath = str(tombstoned)
+    file_obj.deleted = True
+    file_obj.updated_at = datetime.utcnow()
     session.commit()
+    file_catalog.tombstone(file_obj, vectors)
+    invalidate_results()
 
 
 def reingest_file(
@@ -63,10 +83,11 @@ def reingest_file(
     chunking_method: ChunkingMethod = ChunkingMethod.RECURSIVE_CHARACTER
 ):
     file_obj = session.get(File, file_id)
-    if not file_obj:
+    if not file_obj or file_obj.deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    ensure_writable(file_obj.namespace)
 
-    delete_by_file(file_id)
+    delete_by_file(file_id, file_obj.namespace)
     session.query(Chunk).filter_by(file_id=file_id).delete()
     session.commit()
 
@@ -74,7 +95,8 @@ def reingest_file(
     if old_path.exists():
         old_path.unlink()
 
-    destination, filetype = save_upload_file(upload)
+    with ingest_stage("save"):
+        destination, filetype = save_upload_file(upload)
     size_mb = destination.stat().st_size / (1024 * 1024)
 
     file_obj.filename = upload.filename
@@ -83,6 +105,7 @@ def reingest_file(
     file_obj.size_mb = round(size_mb, 2)
     file_obj.updated_at = datetime.utcnow()
     session.commit()
+    file_catalog.put(file_obj)
 
     chunk_count, used_docling, raw_markdown = _process_chunks(
         session, file_obj, Path(destination), filetype, chunking_method
@@ -108,12 +131,15 @@ def _process_chunks(
     doc_ids: list[str] = []
 
     for idx, payload in enumerate(chunk_payloads):
+        # Stored so the query path can budget prompts without re-tokenizing
+        token_count = count_tokens(payload.text)
         chunk = Chunk(
             file_id=file_record.id,
             chunk_index=idx,
             content=payload.text,
             section_heading=payload.section_heading,
             page_number=payload.page_number,
+            token_count=token_count,
         )
         session.add(chunk)
         session.flush()
@@ -124,13 +150,16 @@ def _process_chunks(
                     "doc_id": str(file_record.id),
                     "file_id": file_record.id,
                     "chunk_id": chunk.id,
+                    "chunk_index": idx,
+                    "token_count": token_count,
                     "section_heading": payload.section_heading,
                     "page_number": payload.page_number,
+                    "namespace": file_record.namespace,
                 },
             )
         )
         doc_ids.append(str(chunk.id))
     session.commit()
     if docs:
-        add_documents(docs, ids=doc_ids)
+        add_documents(docs, ids=doc_ids, namespace=file_record.namespace)
     return len(docs), used_docling, raw_markdown
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import bisect
+import threading
+from typing import Dict, List, Literal, Tuple
+
+from ..config import settings
+
+# Log-spaced bucket upper bounds from 5 ms to ~80 s (25% apart): fine enough to pick a
+# hedge deadline, small enough to keep one histogram per provider/model
+_BOUNDS: List[float] = [0.005 * 1.25 ** i for i in range(44)]
+
+
+class LatencyHistogram:
+    """Thread-safe bucketed latency histogram with approximate quantiles."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        index = bisect.bisect_left(_BOUNDS, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.total += seconds
+
+    def quantile(self, q: float) -> float | None:
+        """Upper bound of the bucket holding the q-th observation, or None when empty."""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = q * self.count
+            seen = 0
+            for index, count in enumerate(self._counts):
+                seen += count
+                if seen >= rank and count:
+                    return _BOUNDS[index] if index < len(_BOUNDS) else _BOUNDS[-1]
+        return _BOUNDS[-1]
+
+    def snapshot(self) -> Dict[str, float | int | None]:
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 4) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+# (provider, model, kind) -> time to first token (llm) / to the vector (embedding)
+_histograms: Dict[Tuple[str, str, str], LatencyHistogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def histogram(provider: str, model: str, kind: Literal["llm", "embedding"]) -> LatencyHistogram:
+    with _histograms_lock:
+        hist = _histograms.get((provider, model, kind))
+        if hist is None:
+            hist = _histograms[(provider, model, kind)] = LatencyHistogram()
+        return hist
+
+
+def hedge_delay(hist: LatencyHistogram) -> float:
+    """How long to wait for the primary before hedging, from its latency percentile."""
+    if hist.count < settings.hedge_min_samples:
+        return settings.hedge_default_delay_seconds
+    return max(settings.hedge_min_delay_seconds, hist.quantile(settings.hedge_percentile) or 0.0)
+
+
+def latency_stats() -> Dict[str, Dict[str, float | int | None]]:
+    with _histograms_lock:
+        items = list(_histograms.items())
+    return {f"{provider}:{model}:{kind}": hist.snapshot() for (provider, model, kind), hist in items}
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import logging
+import os
+import time
+from contextlib import aclosing, contextmanager
+from typing import AsyncGenerator, AsyncIterator, Iterator, TypeVar
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from ..config import settings
+from . import timings
+from .tokens import count_tokens
+
+logger = logging.getLogger("metrics")
+
+T = TypeVar("T")
+
+_FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_SLOW_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+QUERY_EMBEDDING_SECONDS = Histogram(
+    "rag_query_embedding_seconds",
+    "Query embedding provider call (cache misses only).",
+    ["provider", "model"],
+    buckets=_FAST_BUCKETS,
+)
+VECTOR_SEARCH_SECONDS = Histogram(
+    "rag_vector_search_seconds",
+    "Vector search across the target namespaces (result-cache misses only).",
+    ["strategy"],
+    buckets=_FAST_BUCKETS,
+)
+DB_LOOKUP_SECONDS = Histogram(
+    "rag_db_lookup_seconds",
+    "SQLite reads made on behalf of the query path and metrics.",
+    ["operation"],
+    buckets=_FAST_BUCKETS,
+)
+TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "rag_time_to_first_token_seconds",
+    "From the model call starting (after admission) to its first text piece.",
+    ["provider", "model"],
+    buckets=_SLOW_BUCKETS,
+)
+TOKENS_PER_SECOND = Histogram(
+    "rag_tokens_per_second",
+    "Generation rate after the first token.",
+    ["provider", "model"],
+    buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300),
+)
+STREAM_DURATION_SECONDS = Histogram(
+    "rag_stream_duration_seconds",
+    "Total duration of completed answer streams.",
+    ["provider", "model"],
+    buckets=_SLOW_BUCKETS,
+)
+INGEST_STAGE_SECONDS = Histogram(
+    "rag_ingest_stage_seconds",
+    "Ingest pipeline stage durations.",
+    ["stage"],
+    buckets=_SLOW_BUCKETS,
+)
+PROVIDER_ERRORS = Counter(
+    "rag_provider_errors_total",
+    "Failed chat or embedding calls to a model provider.",
+    ["provider", "model", "kind"],
+)
+INFLIGHT_STREAMS = Gauge("rag_inflight_streams", "Open /query SSE responses.")
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels: str) -> Iterator[None]:
+    """Observe the duration of the block on the labelled histogram."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - started)
+
+
+@contextmanager
+def ingest_stage(stage: str) -> Iterator[None]:
+    """Time an ingest stage into its histogram and the current request's timings."""
+    with timed(INGEST_STAGE_SECONDS, stage=stage), timings.stage(stage):
+        yield
+
+
+def provider_error(provider: str, model: str, kind: str) -> None:
+    PROVIDER_ERRORS.labels(provider=provider, model=model, kind=kind).inc()
+
+
+def record_stream(provider: str, model: str, started: float, first_token_at: float | None, text: str) -> None:
+    """Record duration and token rate of an answer stream that ran to completion."""
+    finished = time.perf_counter()
+    STREAM_DURATION_SECONDS.labels(provider=provider, model=model).observe(finished - started)
+    if first_token_at is None:
+        return
+    elapsed = finished - first_token_at
+    tokens = count_tokens(text)
+    if elapsed > 0 and tokens > 1:
+        # The first token is what TTFT measures; the rate covers the rest
+        TOKENS_PER_SECOND.labels(provider=provider, model=model).observe((tokens - 1) / elapsed)
+
+
+async def tracked_stream(source: AsyncIterator[T]) -> AsyncGenerator[T, None]:
+    """Relay source while counting it as an in-flight stream."""
+    INFLIGHT_STREAMS.inc()
+    try:
+        async with aclosing(source):
+            async for item in source:
+                yield item
+    finally:
+        INFLIGHT_STREAMS.dec()
+
+
+def _dir_bytes(path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
+
+
+class _StateCollector(Collector):
+    """Values that already live elsewhere (cache counters, index and table sizes), read at scrape time."""
+
+    def describe(self):
+        # Without this, registration would call collect() and touch Chroma/SQLite at import
+        yield CounterMetricFamily("rag_cache_requests", "", labels=["cache", "result"])
+        yield GaugeMetricFamily("rag_index_vectors", "", labels=["namespace"])
+        yield GaugeMetricFamily("rag_index_disk_bytes", "")
+        yield GaugeMetricFamily("rag_chunks", "")
+        yield GaugeMetricFamily("rag_tombstoned_files", "")
+
+    def collect(self):
+        # Imported here: these modules import this one for their own instrumentation
+        from sqlalchemy import func, select
+
+        from ..database import SessionLocal
+        from ..models import Chunk
+        from .file_catalog import file_catalog
+        from .rag_store import cache_stats, index_status
+
+        requests = CounterMetricFamily(
+            "rag_cache_requests", "Lookups in the in-process caches.", labels=["cache", "result"]
+        )
+        for cache, stats in cache_stats().items():
+            requests.add_metric([cache, "hit"], stats["hits"])
+            requests.add_metric([cache, "miss"], stats["misses"])
+        yield requests
+
+        vectors = GaugeMetricFamily("rag_index_vectors", "Vectors per namespace.", labels=["namespace"])
+        try:
+            for status in index_status():
+                vectors.add_metric([status["namespace"]], status["vectors"])
+        except Exception:
+            logger.exception("index size unavailable")
+        yield vectors
+        yield GaugeMetricFamily(
+            "rag_index_disk_bytes", "On-disk size of the Chroma directory.", value=_dir_bytes(settings.chroma_dir)
+        )
+        yield GaugeMetricFamily(
+            "rag_tombstoned_files", "Deleted files awaiting compaction.", value=file_catalog.tombstone_count()
+        )
+
+        try:
+            with timed(DB_LOOKUP_SECONDS, operation="chunk_count"), SessionLocal() as session:
+                chunks = session.scalar(select(func.count()).select_from(Chunk)) or 0
+        except Exception:
+            # A scrape should still return everything else, e.g. before migrations ran
+            logger.exception("chunk count unavailable")
+        else:
+            yield GaugeMetricFamily("rag_chunks", "Chunk rows in SQLite.", value=chunks)
+
+
+REGISTRY.register(_StateCollector())
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import cProfile
+import logging
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterator, List, Literal
+
+from fastapi import HTTPException, status
+
+from ..config import settings
+
+logger = logging.getLogger("profiling")
+
+ProfileMode = Literal["cprofile", "tracemalloc"]
+ProfileTarget = Literal["query", "ingest"]
+
+_SUFFIX = {"cprofile": "prof", "tracemalloc": "tracemalloc"}
+
+
+@dataclass
+class _Armed:
+    mode: ProfileMode
+    remaining: int
+
+
+class Profiler:
+    """One-shot profiling of the next request(s) of a kind.
+
+    An admin arms a target with a mode; the next matching request(s) run under
+    cProfile or tracemalloc and the result is written to the profile dir for download.
+    cProfile follows the thread the capture started on (the event loop for /query,
+    a worker thread for /ingest) and so also sees other work running on it meanwhile;
+    tracemalloc is process-wide.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._armed: Dict[str, _Armed] = {}
+        self._lock = Lock()
+        self._active: set[str] = set()
+
+    def arm(self, target: ProfileTarget, mode: ProfileMode, count: int = 1) -> Dict[str, Any]:
+        with self._lock:
+            self._armed[target] = _Armed(mode=mode, remaining=count)
+        logger.info("profiling armed target=%s mode=%s count=%s", target, mode, count)
+        return self.status()
+
+    def disarm(self, target: ProfileTarget) -> Dict[str, Any]:
+        with self._lock:
+            self._armed.pop(target, None)
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {target: {"mode": armed.mode, "remaining": armed.remaining} for target, armed in self._armed.items()}
+
+    def _take(self, target: str) -> ProfileMode | None:
+        with self._lock:
+            armed = self._armed.get(target)
+            if armed is None:
+                return None
+            # One capture per mode at a time: a second one would replace the first's
+            # profiler hook (cProfile) or stop its trace (tracemalloc)
+            if armed.mode in self._active or (armed.mode == "tracemalloc" and tracemalloc.is_tracing()):
+                return None
+            self._active.add(armed.mode)
+            armed.remaining -= 1
+            if armed.remaining <= 0:
+                del self._armed[target]
+            return armed.mode
+
+    @contextmanager
+    def capture(self, target: ProfileTarget, correlation_id: str) -> Iterator[str | None]:
+        """Profile the block if target is armed; yields the capture name or None."""
+        mode = self._take(target)
+        if mode is None:
+            yield None
+            return
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{target}-{correlation_id}.{_SUFFIX[mode]}"
+        path = self.directory / name
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if mode == "cprofile":
+                profile = cProfile.Profile()
+                profile.enable()
+                try:
+                    yield name
+                finally:
+                    profile.disable()
+                    profile.dump_stats(str(path))
+            else:
+                tracemalloc.start(25)
+                try:
+                    yield name
+                finally:
+                    snapshot = tracemalloc.take_snapshot()
+                    tracemalloc.stop()
+                    snapshot.dump(str(path))
+        finally:
+            with self._lock:
+                self._active.discard(mode)
+        logger.info("profile captured %s", name)
+        self._prune()
+
+    def _prune(self) -> None:
+        captures = sorted(self.directory.glob("*.*"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for stale in captures[settings.profile_keep:]:
+            stale.unlink(missing_ok=True)
+
+    def list(self) -> List[Dict[str, Any]]:
+        if not self.directory.exists():
+            return []
+        captures = sorted(self.directory.glob("*.*"), key=lambda p: p.stat().st_mtime, reverse=True)
+        return [{"name": p.name, "bytes": p.stat().st_size, "created_at": p.stat().st_mtime} for p in captures]
+
+    def path(self, name: str) -> Path:
+        path = self.directory / name
+        # Only plain names inside the profile dir can be downloaded
+        if Path(name).name != name or not path.is_file():
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+        return path
+
+
+profiler = Profiler(settings.profile_dir)
@@ -1,14 +1,24 @@
 from __future__ import annotations
 
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from contextlib import aclosing, contextmanager
 from dataclasses import asdict, dataclass
-from typing import Callable, List, Literal, Optional
+from functools import lru_cache
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Deque, Dict, Iterator, List, Literal, Optional, Tuple
+import asyncio
 import importlib.util
 import logging
+import threading
+import time
 
-import ollama
+from fastapi import HTTPException, status
 
 from ..config import settings
 
+if TYPE_CHECKING:
+    import ollama
+
 logger = logging.getLogger("providers")
 
 
@@ -42,13 +52,20 @@ def _ollama_available() -> bool:
     return _has_package("ollama")
 
 
+@lru_cache(maxsize=1)
+def _ollama_client() -> ollama.Client:
+    # One client (and connection pool) for all discovery calls; the timeout bounds a stalled node
+    import ollama
+
+    return ollama.Client(host=settings.ollama_base_url, timeout=settings.model_discovery_timeout_seconds)
+
+
 def _list_ollama_models() -> List[ModelInfo]:
     # Fetch via the Ollama Python SDK; honors configured base URL
     # Newer SDKs require using a Client to pass the host, and return
     # a response object rather than a plain dict. Handle both.
     try:
-        client = ollama.Client(host=settings.ollama_base_url)
-        data = client.list()
+        data = _ollama_client().list()
 
         # Extract models from either dict or SDK response object
         if isinstance(data, dict):
@@ -84,7 +101,8 @@ def _list_ollama_models() -> List[ModelInfo]:
         return items
     except Exception as exc:  # pragma: no cover - depends on local runtime
         logger.warning("Failed to list Ollama models: %s", exc)
-        return []
+        # Let the model catalog keep serving its last good list
+        raise
 
 
 def _openai_available() -> bool:
@@ -92,18 +110,18 @@ def _openai_available() -> bool:
     return _has_package("langchain_openai") and _has_package("openai")
 
 
-def _list_openai_models() -> List[ModelInfo]:
-    try:
-        from openai import OpenAI
-    except Exception as exc:  # pragma: no cover - optional dependency
-        logger.warning("OpenAI SDK not available: %s", exc)
-        return []
+@lru_cache(maxsize=1)
+def _openai_client():
+    from openai import OpenAI
+
+    # Use API key from settings if configured
+    api_key = settings.openai_api_key or None
+    return OpenAI(api_key=api_key, timeout=settings.model_discovery_timeout_seconds, max_retries=0)
+
 
+def _list_openai_models() -> List[ModelInfo]:
     try:
-        # Use API key from settings if configured
-        api_key = settings.openai_api_key or None
-        client = OpenAI(api_key=api_key) if api_key else OpenAI()
-        response = client.models.list()
+        response = _openai_client().models.list()
         models: List[ModelInfo] = []
         
         # Known context lengths for popular OpenAI models
@@ -163,7 +181,7 @@ def _list_openai_models() -> List[ModelInfo]:
         return models
     except Exception as exc:  # pragma: no cover - depends on credentials
         logger.warning("Failed to list OpenAI models: %s", exc)
-        return []
+        raise
 
 
 _LLM_PROVIDERS: List[ProviderSpec] = [
@@ -202,19 +220,314 @@ def get_embedding_providers() -> List[ProviderDescriptor]:
     return [spec.descriptor for spec in _EMBEDDING_PROVIDERS if spec.available()]
 
 
-def list_models_for_provider(provider_key: str, kind: Literal["llm", "embedding"]) -> List[ModelInfo]:
+@dataclass
+class _CatalogEntry:
+    models: List[ModelInfo]
+    fetched_at: float
+    ok: bool
+    refreshing: Optional[Future] = None
+
+
+class ModelCatalog:
+    """TTL cache of provider model lists with stale-while-revalidate.
+
+    A fresh entry is served directly. A stale one is served immediately while a
+    background refresh runs. Only a provider never fetched before is waited for, and
+    only up to ``model_discovery_timeout_seconds``. Failed fetches keep the previous
+    list and are retried after the shorter error TTL.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _CatalogEntry] = {}
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="model-catalog")
+
+    def _fetch(self, key: str, fetch: Callable[[], List[ModelInfo]]) -> List[ModelInfo]:
+        try:
+            models, ok = fetch(), True
+        except Exception:
+            models, ok = None, False
+        with self._lock:
+            previous = self._entries.get(key)
+            if models is None:
+                models = previous.models if previous else []
+            self._entries[key] = _CatalogEntry(models=models, fetched_at=time.monotonic(), ok=ok)
+        return models
+
+    def _schedule(self, key: str, fetch: Callable[[], List[ModelInfo]]) -> Future:
+        """Start a refresh unless one is already running (call with _lock held)."""
+        entry = self._entries.get(key)
+        if entry is not None and entry.refreshing is not None and not entry.refreshing.done():
+            return entry.refreshing
+        future = self._pool.submit(self._fetch, key, fetch)
+        if entry is not None:
+            entry.refreshing = future
+        else:
+            self._entries[key] = _CatalogEntry(models=[], fetched_at=float("-inf"), ok=False, refreshing=future)
+        return future
+
+    def get(self, key: str, fetch: Callable[[], List[ModelInfo]], refresh: bool = False) -> List[ModelInfo]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.fetched_at > float("-inf") and not refresh:
+                ttl = settings.model_catalog_ttl_seconds if entry.ok else settings.model_catalog_error_ttl_seconds
+                if time.monotonic() - entry.fetched_at >= ttl:
+                    self._schedule(key, fetch)
+                return entry.models
+            future = self._schedule(key, fetch)
+        try:
+            return future.result(timeout=settings.model_discovery_timeout_seconds)
+        except FutureTimeout:
+            logger.warning("model discovery for %s timed out", key)
+            return []
+
+    def refresh_all(self, fetchers: Dict[str, Callable[[], List[ModelInfo]]]) -> None:
+        """Refresh every provider concurrently, each bounded by the discovery timeout."""
+        with self._lock:
+            futures = [self._schedule(key, fetch) for key, fetch in fetchers.items()]
+        wait(futures, timeout=settings.model_discovery_timeout_seconds)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_catalog = ModelCatalog()
+
+
+def _spec(provider_key: str, kind: Literal["llm", "embedding"]) -> ProviderSpec:
     specs = _LLM_PROVIDERS if kind == "llm" else _EMBEDDING_PROVIDERS
     for spec in specs:
         if spec.descriptor.key == provider_key:
-            if not spec.available():
-                return []
-            return spec.list_models()
+            return spec
     raise KeyError(provider_key)
 
 
+def list_models_for_provider(
+    provider_key: str, kind: Literal["llm", "embedding"], refresh: bool = False
+) -> List[ModelInfo]:
+    """Models offered by a provider, from the model catalog (see ``ModelCatalog``)."""
+    spec = _spec(provider_key, kind)
+    if not spec.available():
+        return []
+    # LLM and embedding specs of one provider share a fetcher, hence one catalog entry
+    return _catalog.get(provider_key, spec.list_models, refresh=refresh)
+
+
+def refresh_model_catalog() -> None:
+    fetchers = {spec.descriptor.key: spec.list_models for spec in _LLM_PROVIDERS + _EMBEDDING_PROVIDERS if spec.available()}
+    _catalog.refresh_all(fetchers)
+
+
+def reset_model_catalog() -> None:
+    _ollama_client.cache_clear()
+    _openai_client.cache_clear()
+    _catalog.clear()
+
+
 def serialize_providers(providers: List[ProviderDescriptor]) -> List[dict]:
     return [asdict(provider) for provider in providers]
 
 
 def serialize_models(models: List[ModelInfo]) -> List[dict]:
     return [asdict(model) for model in models]
+
+
+# ---------------------------------------------------------------------------
+# Admission control
+#
+# Every chat / embedding call goes through a per-provider limiter: at most
+# ``provider_max_concurrency[provider]`` calls run at once, up to
+# ``provider_max_queue`` more wait in FIFO order, and anything beyond that is
+# rejected immediately with 429. Waiters that cannot get a slot within
+# ``provider_queue_timeout_seconds`` get 503. Both carry Retry-After.
+# ---------------------------------------------------------------------------
+
+
+@dataclass(eq=False)
+class _Waiter:
+    wake: Callable[[], None]
+    granted: bool = False
+
+
+@dataclass(frozen=True)
+class QueuePosition:
+    """Marker yielded by streams while they wait for a provider slot (1 = next)."""
+
+    position: int
+
+
+def overloaded_error(status_code: int, provider: str, message: str) -> HTTPException:
+    detail = {
+        "code": "PROVIDER_OVERLOADED",
+        "message": message,
+        "hint": f"The {provider} provider is at capacity; retry shortly.",
+        "retry_after": settings.provider_retry_after_seconds,
+    }
+    return HTTPException(
+        status_code=status_code,
+        detail=detail,
+        headers={"Retry-After": str(settings.provider_retry_after_seconds)},
+    )
+
+
+class ProviderLimiter:
+    """Semaphore with a bounded FIFO wait queue, usable from threads and the event loop."""
+
+    def __init__(self, provider: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.provider = provider
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _enqueue(self, waiter: _Waiter) -> int:
+        """Take a slot (returns 0) or join the queue (returns the 1-based position)."""
+        with self._lock:
+            if self._active < self.max_concurrent and not self._waiters:
+                self._active += 1
+                return 0
+            if len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                raise overloaded_error(status.HTTP_429_TOO_MANY_REQUESTS, self.provider, "Too many requests are waiting for the model.")
+            self._waiters.append(waiter)
+            return len(self._waiters)
+
+    def _position(self, waiter: _Waiter) -> int:
+        with self._lock:
+            try:
+                return self._waiters.index(waiter) + 1
+            except ValueError:
+                return 0
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Leave the queue; True if the slot was already handed over (caller must release)."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def _timeout(self) -> HTTPException:
+        with self._lock:
+            self.timed_out += 1
+        return overloaded_error(status.HTTP_503_SERVICE_UNAVAILABLE, self.provider, "Timed out waiting for the model.")
+
+    def release(self) -> None:
+        with self._lock:
+            if self._waiters:
+                # Hand the slot straight to the next waiter; _active is unchanged
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                waiter.wake()
+            else:
+                self._active -= 1
+
+    def try_acquire(self) -> bool:
+        """Take a free slot without queueing (used for opportunistic hedge requests)."""
+        with self._lock:
+            if self._active < self.max_concurrent and not self._waiters:
+                self._active += 1
+                return True
+            return False
+
+    def saturated(self) -> bool:
+        """True when a new call would be rejected outright."""
+        with self._lock:
+            return self._active >= self.max_concurrent and len(self._waiters) >= self.max_queue
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Blocking acquire for synchronous callers (ingest, thread pool work)."""
+        event = threading.Event()
+        waiter = _Waiter(event.set)
+        if self._enqueue(waiter) and not event.wait(self.queue_timeout):
+            if not self._abandon(waiter):
+                raise self._timeout()
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def queue(self) -> AsyncIterator[int]:
+        """Wait for a slot, yielding the queue position whenever it changes.
+
+        Yields nothing when a slot is free. Once iteration finishes the caller holds a
+        slot and must call ``release()``; closing the iterator early gives it up.
+        """
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        waiter = _Waiter(wake)
+        position = self._enqueue(waiter)
+        if not position:
+            return
+        deadline = loop.time() + self.queue_timeout
+        try:
+            yield position
+            while not waiter.granted:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise self._timeout()
+                await asyncio.wait({granted}, timeout=min(remaining, 1.0))
+                current = self._position(waiter)
+                if current and current != position:
+                    position = current
+                    yield position
+        except BaseException:
+            if self._abandon(waiter):
+                self.release()
+            raise
+
+    async def acquire(self) -> None:
+        """Async acquire without position reporting."""
+        async with aclosing(self.queue()) as waiting:
+            async for _ in waiting:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "active": self._active,
+                "queued": len(self._waiters),
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
+
+
+_limiters: Dict[Tuple[str, str], ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def provider_limiter(provider: str, kind: Literal["llm", "embedding"]) -> ProviderLimiter:
+    """Limiter for calls of ``kind`` to ``provider`` (chat and embeddings are limited separately)."""
+    with _limiters_lock:
+        limiter = _limiters.get((provider, kind))
+        if limiter is None:
+            limiter = ProviderLimiter(
+                provider,
+                settings.provider_max_concurrency.get(provider, settings.provider_default_concurrency),
+                settings.provider_max_queue,
+                settings.provider_queue_timeout_seconds,
+            )
+            _limiters[(provider, kind)] = limiter
+        return limiter
+
+
+def hedge_label(provider: str, base_url: str | None) -> str:
+    """Limiter / latency key of a hedge target: a separate Ollama node is its own provider."""
+    return f"{provider}-hedge" if base_url else provider
+
+
+def limiter_stats() -> Dict[str, Dict[str, int]]:
+    with _limiters_lock:
+        return {f"{provider}:{kind}": limiter.stats() for (provider, kind), limiter in _limiters.items()}
@@ -1,42 +1,177 @@
 from __future__ import annotations
 
-from typing import Generator, Iterable, List, Tuple
+import asyncio
+from dataclasses import dataclass
+from typing import AsyncGenerator, Dict, Hashable, List, Tuple
 
-from sqlalchemy.orm import Session
+from ..config import settings
+from .answer_cache import answer_cache
+from .generation import astream_answer, build_prompt, chat_context_length
+from .rag_store import aembed_query, index_generation
+from .runtime_config import get_runtime_models, get_runtime_rag
+from .search import RetrievedChunk, aretrieve_chunks
+from .timings import stage
+from .tokens import count_tokens
 
-from .generation import generate_answer
-from .search import RetrievedChunk, retrieve_chunks
+# Overlaps shorter than this are treated as coincidence, not splitter overlap
+_MIN_OVERLAP_CHARS = 16
 
 
-def _context_texts(retrieved: Iterable[RetrievedChunk]) -> List[str]:
-    texts: List[str] = []
+@dataclass
+class _Block:
+    """A run of hits from one file merged into a single contiguous passage."""
+
+    hits: List[RetrievedChunk]
+    text: str
+    tokens: int
+    rank: int
+
+
+def _hit_tokens(hit: RetrievedChunk) -> int:
+    return hit.token_count if hit.token_count is not None else count_tokens(hit.text)
+
+
+def _merge_text(head: str, tail: str) -> Tuple[str, int]:
+    """Append tail to head, dropping the longest suffix/prefix overlap.
+
+    Returns the merged text and the number of tail characters dropped.
+    """
+    limit = min(len(head), len(tail), settings.chunk_overlap * 2)
+    for size in range(limit, _MIN_OVERLAP_CHARS - 1, -1):
+        if head.endswith(tail[:size]):
+            return head + tail[size:], size
+    return f"{head}\n{tail}", 0
+
+
+def _merge_blocks(retrieved: List[RetrievedChunk]) -> List[_Block]:
+    """Merge adjacent/overlapping chunks of the same file and drop repeated text."""
+    ranks = {id(hit): rank for rank, hit in enumerate(retrieved)}
+    seen_texts: set[str] = set()
+    by_file: Dict[int, List[RetrievedChunk]] = {}
     for hit in retrieved:
-        meta = []
-        meta.append(f"doc_id={hit.doc_id}")
-        if hit.page_number is not None:
-            meta.append(f"page={hit.page_number}")
-        if hit.section_heading:
-            meta.append(f"section=\"{hit.section_heading}\"")
-        header = ", ".join(meta)
-        texts.append(f"[{header}]\n{hit.text}")
-    return texts
+        if hit.text in seen_texts:
+            continue
+        seen_texts.add(hit.text)
+        by_file.setdefault(hit.file_id, []).append(hit)
+
+    blocks: List[_Block] = []
+    for hits in by_file.values():
+        ordered = sorted(hits, key=lambda h: (h.chunk_index is None, h.chunk_index or 0))
+        current: _Block | None = None
+        for hit in ordered:
+            contiguous = (
+                current is not None
+                and hit.chunk_index is not None
+                and current.hits[-1].chunk_index is not None
+                and hit.chunk_index - current.hits[-1].chunk_index == 1
+            )
+            if contiguous:
+                current.text, dropped = _merge_text(current.text, hit.text)
+                kept = 1 - dropped / max(len(hit.text), 1)
+                current.tokens += round(_hit_tokens(hit) * kept)
+                current.hits.append(hit)
+                current.rank = min(current.rank, ranks[id(hit)])
+                continue
+            current = _Block(hits=[hit], text=hit.text, tokens=_hit_tokens(hit), rank=ranks[id(hit)])
+            blocks.append(current)
+    blocks.sort(key=lambda b: b.rank)
+    return blocks
 
 
-def run_query(session: Session, query_text: str, top_k: int, file_ids: List[int] | None = None):
-    retrieved = retrieve_chunks(session, query_text, top_k=top_k, file_ids=file_ids)
+def _block_header(block: _Block) -> str:
+    first = block.hits[0]
+    meta = [f"doc_id={first.doc_id}"]
+    pages = sorted({h.page_number for h in block.hits if h.page_number is not None})
+    if pages:
+        meta.append(f"page={pages[0]}" if len(pages) == 1 else f"pages={pages[0]}-{pages[-1]}")
+    if first.section_heading:
+        meta.append(f"section=\"{first.section_heading}\"")
+    return f"[{', '.join(meta)}]"
 
-    contexts = _context_texts(retrieved)
+
+def pack_contexts(question: str, retrieved: List[RetrievedChunk], context_length: int) -> Tuple[List[str], List[RetrievedChunk]]:
+    """Fit the retrieved passages into the model's prompt budget.
+
+    Neighbouring chunks of a file are merged (their splitter overlap removed), then
+    blocks are added best-rank first while they fit into
+    context_length - answer reserve - prompt scaffolding. Returns the context texts
+    and the hits that made it into the prompt.
+    """
+    budget = context_length - settings.answer_token_reserve - count_tokens(build_prompt(question, []))
+    contexts: List[str] = []
+    used: List[RetrievedChunk] = []
+    for block in _merge_blocks(retrieved):
+        header = _block_header(block)
+        cost = block.tokens + count_tokens(header) + 1
+        if cost > budget:
+            continue
+        budget -= cost
+        contexts.append(f"{header}\n{block.text}")
+        used.extend(block.hits)
+    return contexts, used
+
+
+def query_fingerprint(query_text: str, file_ids: List[int] | None, namespaces: List[str] | None) -> Hashable:
+    """Key under which identical concurrent queries share one pipeline run."""
+    models = get_runtime_models()
+    rag = get_runtime_rag()
+    return (
+        " ".join(query_text.split()).casefold(),
+        tuple(sorted(set(file_ids))) if file_ids else None,
+        tuple(sorted(set(namespaces))) if namespaces else None,
+        tuple(sorted(rag.items())),
+        models["chat_provider"],
+        models["chat_model"],
+    )
+
+
+async def run_query(
+    query_text: str,
+    top_k: int,
+    file_ids: List[int] | None = None,
+    namespaces: List[str] | None = None,
+):
+    # Read before retrieving, so an answer never outlives the index state it was built from
+    generation = index_generation()
+    with stage("retrieve"):
+        retrieved = await aretrieve_chunks(query_text, top_k=top_k, file_ids=file_ids, namespaces=namespaces)
+
+    with stage("prompt"):
+        # Model metadata may need a provider round trip on first use; keep it off the loop
+        context_length = await asyncio.to_thread(chat_context_length)
+        contexts, used = pack_contexts(query_text, retrieved, context_length)
 
     fallback = "I don't know based on the provided documents."
 
     # For streaming, if no context, emit the fallback once
     if not contexts:
-        def empty_streamer() -> Generator[str, None, None]:
+        async def empty_streamer() -> AsyncGenerator[str, None]:
             yield fallback
-        return empty_streamer(), retrieved
+        return empty_streamer(), used
+
+    if not settings.answer_cache_enabled:
+        return astream_answer(query_text, contexts), used
+
+    models = get_runtime_models()
+    key = (models["chat_provider"], models["chat_model"], generation, frozenset(str(hit.chunk_id) for hit in retrieved))
+    embedding = await aembed_query(query_text)  # served from the query-embedding LRU
+    cached = answer_cache.lookup(key, embedding, settings.answer_cache_threshold)
+    if cached is not None:
+        async def replay_streamer() -> AsyncGenerator[str, None]:
+            yield cached
+        return replay_streamer(), used
 
-    def streamer() -> Generator[str, None, None]:
-        for piece in generate_answer(query_text, contexts, stream=True):
-            yield piece
+    async def caching_streamer() -> AsyncGenerator[str, None]:
+        pieces: List[str] = []
+        stream = astream_answer(query_text, contexts)
+        try:
+            async for piece in stream:
+                if isinstance(piece, str):
+                    pieces.append(piece)
+                yield piece
+        finally:
+            await stream.aclose()
+        # Only completed answers are stored; a disconnect or error never reaches here
+        answer_cache.store(key, embedding, "".join(pieces))
 
-    return streamer(), retrieved
+    return caching_streamer(), used
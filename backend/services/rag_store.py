@@ -1,49 +1,199 @@
 from __future__ import annotations
 
+import asyncio
+import heapq
+import json
+import logging
+import math
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from functools import lru_cache
-from typing import List
+from itertools import islice
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Dict, List, Set, Tuple
 
-from langchain_ollama import OllamaEmbeddings
-from langchain_openai import OpenAIEmbeddings
-from langchain_chroma import Chroma
-from langchain_core.vectorstores import VectorStore
+import numpy as np
+from fastapi import HTTPException, status
+from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 
 from ..config import settings
+from .answer_cache import answer_cache
+from .cache import LRUCache
+from .chroma_client import get_client
+from .file_catalog import file_catalog
+from .hedging import HedgeDeclined, hedged_call
+from .latency import hedge_delay, histogram
+from .metrics import QUERY_EMBEDDING_SECONDS, VECTOR_SEARCH_SECONDS, ingest_stage, provider_error, timed
+from .providers import ProviderLimiter, hedge_label, provider_limiter
 from .runtime_config import get_runtime_models, get_runtime_rag
+from .shared_state import FileLock, LockHeld, SharedStamp, Stamp, state_path, write_atomic
+from .timings import stage
+
+logger = logging.getLogger("rag_store")
+
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
+# langchain_chroma/chromadb and the provider integrations cost seconds to import;
+# they are imported where first used so query-only startup does not pay for them.
 
 
 @lru_cache(maxsize=4)
-def _ollama_embedding_client(model: str) -> Embeddings:
-    return OllamaEmbeddings(base_url=settings.ollama_base_url, model=model)
+def _ollama_embedding_client(model: str, base_url: str | None = None) -> Embeddings:
+    from langchain_ollama import OllamaEmbeddings
+
+    return OllamaEmbeddings(base_url=base_url or settings.ollama_base_url, model=model, keep_alive=settings.model_keep_alive_seconds)
 
 
 @lru_cache(maxsize=4)
 def _openai_embedding_client(model: str) -> Embeddings:
     if not settings.openai_api_key:
         raise ValueError("OpenAI API key not configured (RAG_OPENAI_API_KEY)")
+    from langchain_openai import OpenAIEmbeddings
+
     return OpenAIEmbeddings(api_key=settings.openai_api_key, model=model)
 
 
+class _AdmittedEmbeddings(Embeddings):
+    """Embedding client whose calls go through the provider's admission limiter."""
+
+    def __init__(self, inner: Embeddings, limiter: ProviderLimiter):
+        self.inner = inner
+        self.limiter = limiter
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self.limiter.slot():
+            return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with self.limiter.slot():
+            return self.inner.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await self.limiter.acquire()
+        try:
+            return await self.inner.aembed_documents(texts)
+        finally:
+            self.limiter.release()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await self.limiter.acquire()
+        try:
+            return await self.inner.aembed_query(text)
+        finally:
+            self.limiter.release()
+
+
 def _get_embedding_client(provider: str, model: str) -> Embeddings:
     """Get the appropriate embedding client based on the provider."""
     if provider == "openai":
-        return _openai_embedding_client(model)
+        client = _openai_embedding_client(model)
     elif provider == "ollama":
-        return _ollama_embedding_client(model)
+        client = _ollama_embedding_client(model)
     else:
         raise ValueError(f"Unknown embedding provider: {provider}")
+    return _AdmittedEmbeddings(client, provider_limiter(provider, "embedding"))
 
 
-@lru_cache(maxsize=4)
-def _vectorstore(provider: str, model: str) -> Chroma:
-    return Chroma(
-        collection_name=settings.chroma_collection,
-        embedding_function=_get_embedding_client(provider, model),
-        persist_directory=str(settings.chroma_dir),
+# Chroma collection names must start and end with a letter or digit
+NAMESPACE_PATTERN = re.compile(r"^[A-Za-z0-9](?:[A-Za-z0-9_-]{0,61}[A-Za-z0-9])?$")
+
+
+def collection_name(namespace: str) -> str:
+    """Chroma collection backing a namespace; the default keeps the original name."""
+    if namespace == settings.default_namespace:
+        return settings.chroma_collection
+    return f"{settings.chroma_collection}-{namespace}"
+
+
+def _existing_collection(name: str):
+    """The named collection, or None; never creates one (read paths must not)."""
+    client = get_client()
+    if name not in {getattr(c, "name", c) for c in client.list_collections()}:
+        return None
+    return client.get_collection(name)
+
+
+def _namespace_not_found(namespace: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail={
+            "code": "NAMESPACE_NOT_FOUND",
+            "message": f"Namespace '{namespace}' does not exist.",
+            "hint": "GET /namespaces lists the namespaces that have files.",
+        },
     )
 
 
+def validate_namespace(namespace: str) -> str:
+    if not NAMESPACE_PATTERN.match(namespace):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "code": "INVALID_NAMESPACE",
+                "message": f"Invalid namespace '{namespace}'.",
+                "hint": "Use 1-63 letters, digits, '-' or '_', starting and ending with a letter or digit.",
+            },
+        )
+    return namespace
+
+
+@dataclass
+class _Shard:
+    """One namespace's vector collection plus its file_id -> vector ids index."""
+
+    namespace: str
+    vectorstore: Chroma
+    # Built lazily from collection metadata and kept current by add_documents/
+    # delete_by_file. Lets scoped queries size and address their rows.
+    file_rows: Dict[int, Set[str]] | None = None
+    # Index generation file_rows was loaded at, and per file the generation its entry
+    # was last read or written at; entries older than the current generation may have
+    # been changed by another worker and are re-read before use
+    rows_generation: Stamp = None
+    row_generations: Dict[int, Stamp] = field(default_factory=dict)
+    lock: Lock = field(default_factory=Lock)
+
+
+# (embedding provider, embedding model, namespace) -> loaded shard
+_shards: Dict[Tuple[str, str, str], _Shard] = {}
+_shards_lock = Lock()
+# Namespaces taken offline via unload_namespace; excluded from fan-out until loaded.
+# Kept in a state file so an unload in one worker applies to all of them; each worker
+# re-reads it when the file's stat changes.
+_UNLOADED_FILE = "unloaded_namespaces.json"
+_unloaded_stamp = SharedStamp(_UNLOADED_FILE)
+_unloaded_lock = FileLock("unloaded_namespaces")
+_unloaded: Set[str] = set()
+_unloaded_seen: Stamp = None
+_known_namespaces: Set[str] | None = None
+# Bumped when a collection is created or swapped in by rebuild_index, so other
+# workers re-list namespaces and reopen shards whose collection was replaced
+_layout_stamp = SharedStamp("index_layout")
+_known_stamp: Stamp = None
+_shards_layout: Stamp = None
+# How long a rebuild keeps the replaced collection for queries already running on it
+_RETIRE_GRACE_SECONDS = 2.0
+_fanout_pool: ThreadPoolExecutor | None = None
+
+# (document, distance, embedding or None)
+Candidate = Tuple[Document, float, Any]
+
+# Bumped on every index mutation; part of the retrieval cache key so cached results
+# never outlive the index state they were computed from. Shared through a stamp file
+# that is stat-ed before each cache lookup, so a write in any worker invalidates all.
+_index_stamp = SharedStamp("index_generation")
+
+# (provider, model, query text) -> query embedding
+_query_embedding_cache = LRUCache(settings.query_embedding_cache_size)
+# (provider, model, strategy params, file_ids, namespaces, generation) -> ranked (doc, score) hits
+_retrieval_cache = LRUCache(settings.retrieval_cache_size)
+
+
 def get_embeddings() -> Embeddings:
     """Return a cached embedding model for reuse across requests."""
     models = get_runtime_models()
@@ -52,30 +202,511 @@ def get_embeddings() -> Embeddings:
     return _get_embedding_client(provider, model)
 
 
-def get_vectorstore() -> Chroma:
-    """Return a cached Chroma vector store backed by LangChain."""
+def _collection_metadata(rag, space: str | None = None) -> Dict[str, Any]:
+    """Metadata for a new collection; existing collections keep their distance."""
+    return {
+        "hnsw:space": space or settings.hnsw_space,
+        "hnsw:M": rag["hnsw_m"],
+        "hnsw:construction_ef": rag["hnsw_construction_ef"],
+        "hnsw:search_ef": rag["hnsw_search_ef"],
+    }
+
+
+def _hnsw_config(collection) -> Dict[str, Any]:
+    """Effective HNSW parameters of an existing collection."""
+    hnsw = (collection.configuration or {}).get("hnsw") or {}
+    meta = collection.metadata or {}
+    return {
+        "hnsw_m": hnsw.get("max_neighbors") or meta.get("hnsw:M"),
+        "hnsw_construction_ef": hnsw.get("ef_construction") or meta.get("hnsw:construction_ef"),
+        "hnsw_search_ef": hnsw.get("ef_search") or meta.get("hnsw:search_ef"),
+    }
+
+
+def _sync_search_ef(collection, rag) -> None:
+    # search_ef is a query-time knob, so it is applied in place; M and
+    # construction_ef only change through rebuild_index
+    if _hnsw_config(collection)["hnsw_search_ef"] != rag["hnsw_search_ef"]:
+        collection.modify(configuration={"hnsw": {"ef_search": rag["hnsw_search_ef"]}})
+
+
+def _rebuilding_error(namespace: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={
+            "code": "INDEX_REBUILDING",
+            "message": f"The index for namespace '{namespace}' is being rebuilt.",
+            "hint": "Retry once the rebuild has finished.",
+        },
+    )
+
+
+def _writes_lock(namespace: str) -> FileLock:
+    # Writers hold it shared; rebuild_index holds it exclusively from copy to swap
+    return FileLock(f"writes-{namespace}")
+
+
+@contextmanager
+def _writing(namespace: str):
+    """Hold the namespace's write lock; 409 while any worker is rebuilding it."""
+    try:
+        with _writes_lock(namespace).hold(exclusive=False, blocking=False):
+            yield
+    except LockHeld:
+        raise _rebuilding_error(namespace) from None
+
+
+def ensure_writable(namespace: str) -> None:
+    """409 INDEX_REBUILDING now, for callers about to commit rows they will index."""
+    with _writing(namespace):
+        pass
+
+
+def _drop_replaced_shards() -> None:
+    # Caller holds _shards_lock. A shard whose collection was swapped out by a
+    # rebuild in any worker still points at the retired one
+    live = {getattr(c, "name", c): getattr(c, "id", None) for c in get_client().list_collections()}
+    for key, shard in list(_shards.items()):
+        if live.get(collection_name(key[2])) != shard.vectorstore._collection.id:
+            del _shards[key]
+
+
+def _refresh_unloaded() -> Set[str]:
+    """The shared unloaded set, re-read if another worker changed it; caller holds _shards_lock."""
+    global _unloaded, _unloaded_seen
+    stamp = _unloaded_stamp.current()
+    if stamp != _unloaded_seen:
+        try:
+            _unloaded = set(json.loads(_unloaded_stamp.path.read_text(encoding="utf-8")))
+        except (FileNotFoundError, ValueError):
+            _unloaded = set()
+        _unloaded_seen = stamp
+        # Another worker's unload frees this worker's handles too
+        for key in [key for key in _shards if key[2] in _unloaded]:
+            del _shards[key]
+    return _unloaded
+
+
+def _mark_unloaded(namespace: str, unloaded: bool) -> bool:
+    """Record a load or unload for every worker; False if it was already so. Caller holds _shards_lock."""
+    with _unloaded_lock.hold():
+        names = set(_refresh_unloaded())
+        if (namespace in names) == unloaded:
+            return False
+        if unloaded:
+            names.add(namespace)
+        else:
+            names.discard(namespace)
+        write_atomic(state_path(_UNLOADED_FILE), json.dumps(sorted(names)))
+        _refresh_unloaded()
+    return True
+
+
+def _shard(namespace: str, write: bool = False) -> _Shard:
+    global _shards_layout
     models = get_runtime_models()
-    provider = models["embedding_provider"]
-    model = models["embedding_model"]
-    return _vectorstore(provider, model)
+    key = (models["embedding_provider"], models["embedding_model"], namespace)
+    with _shards_lock:
+        layout = _layout_stamp.current()
+        if layout != _shards_layout:
+            _drop_replaced_shards()
+            _shards_layout = layout
+        if namespace in _refresh_unloaded():
+            if not write:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail={
+                        "code": "NAMESPACE_UNLOADED",
+                        "message": f"Namespace '{namespace}' is unloaded.",
+                        "hint": f"POST /namespaces/{namespace}/load to bring it back online.",
+                    },
+                )
+            # Writing to a namespace brings it back online
+            _mark_unloaded(namespace, False)
+        shard = _shards.get(key)
+        if shard is None:
+            from langchain_chroma import Chroma
+
+            created = _existing_collection(collection_name(namespace)) is None
+            if created and not write:
+                # Chroma(...) would get-or-create it
+                raise _namespace_not_found(namespace)
+            rag = get_runtime_rag()
+            shard = _Shard(
+                namespace=namespace,
+                vectorstore=Chroma(
+                    collection_name=collection_name(namespace),
+                    embedding_function=_get_embedding_client(key[0], key[1]),
+                    client=get_client(),
+                    collection_metadata=_collection_metadata(rag) if created else None,
+                ),
+            )
+            _sync_search_ef(shard.vectorstore._collection, rag)
+            _shards[key] = shard
+            if _known_namespaces is not None:
+                _known_namespaces.add(namespace)
+            if created:
+                _layout_stamp.bump()
+        return shard
+
+
+def get_vectorstore(namespace: str | None = None) -> Chroma:
+    """Return a cached Chroma vector store backed by LangChain."""
+    return _shard(namespace or settings.default_namespace).vectorstore
+
+
+def list_namespaces() -> List[str]:
+    """Namespaces that have a collection, whether loaded or not."""
+    global _known_namespaces, _known_stamp
+    with _shards_lock:
+        stamp = _layout_stamp.current()
+        if _known_namespaces is None or stamp != _known_stamp:
+            prefix = f"{settings.chroma_collection}-"
+            names = {settings.default_namespace}
+            for collection in get_client().list_collections():
+                name = getattr(collection, "name", collection)
+                # Skips staging/retired collections from rebuild_index ("<name>.rebuild")
+                if name.startswith(prefix) and NAMESPACE_PATTERN.match(name[len(prefix):]):
+                    names.add(name[len(prefix):])
+            _known_namespaces = names
+            _known_stamp = stamp
+        return sorted(_known_namespaces)
+
+
+def is_loaded(namespace: str) -> bool:
+    with _shards_lock:
+        return namespace not in _refresh_unloaded()
+
+
+def load_namespace(namespace: str) -> Dict[str, Any]:
+    """Bring a namespace online and touch its index so the first query is warm."""
+    with _shards_lock:
+        changed = _mark_unloaded(namespace, False)
+    if changed:
+        # Fan-out now includes it again. Warm-up reloads loaded namespaces on every
+        # worker start; bumping then would flush every worker's caches for nothing.
+        _bump_generation()
+    if _existing_collection(collection_name(namespace)) is None:
+        # Known but empty (the default namespace before its first upload)
+        return {"namespace": namespace, "loaded": True, "vectors": 0, "files": 0}
+    shard = _shard(namespace)
+    rows = _file_row_index(shard)
+    collection = shard.vectorstore._collection
+    count = collection.count()
+    if count:
+        sample = collection.peek(1)
+        collection.query(query_embeddings=[sample["embeddings"][0]], n_results=1, include=[])
+    return {"namespace": namespace, "loaded": True, "vectors": count, "files": len(rows)}
+
+
+def unload_namespace(namespace: str) -> Dict[str, Any]:
+    """Drop a namespace's handles and row index and exclude it from fan-out.
+
+    Chroma's own segment cache is bounded by its LRU policy; this releases what the
+    app holds and stops queries from pulling the shard back into memory.
+    """
+    with _shards_lock:
+        for key in [key for key in _shards if key[2] == namespace]:
+            del _shards[key]
+        _mark_unloaded(namespace, True)
+    _bump_generation()
+    return {"namespace": namespace, "loaded": False, "vectors": None, "files": None}
+
+
+def index_status() -> List[Dict[str, Any]]:
+    """Per-namespace HNSW parameters versus the configured ones."""
+    rag = get_runtime_rag()
+    statuses = []
+    for namespace in list_namespaces():
+        collection = _existing_collection(collection_name(namespace))
+        if collection is None:
+            continue
+        current = _hnsw_config(collection)
+        space = collection_space(collection)
+        statuses.append(
+            {
+                "namespace": namespace,
+                "vectors": collection.count(),
+                **current,
+                "space": space,
+                "rebuild_required": (
+                    current["hnsw_m"] != rag["hnsw_m"]
+                    or current["hnsw_construction_ef"] != rag["hnsw_construction_ef"]
+                    or space != settings.hnsw_space
+                ),
+            }
+        )
+    return statuses
+
+
+def rebuild_index(namespace: str, batch_size: int = 1000) -> Dict[str, Any]:
+    """Rebuild a namespace's collection with the configured build-time HNSW parameters.
+
+    Vectors are copied into a staging collection in batches, then the staging
+    collection is swapped in by rename. A lock file under storage/state keeps it to one
+    rebuild per namespace across workers and refuses writes (409) from every worker
+    until the swap; other workers reopen the collection when the layout stamp moves.
+    The distance is kept unless settings.hnsw_space differs, in which case the rebuild
+    migrates it and reports the old one as previous_space.
+    """
+    rag = get_runtime_rag()
+    client = get_client()
+    name = collection_name(namespace)
+    try:
+        with FileLock(f"rebuild-{namespace}").hold(blocking=False):
+            source = _existing_collection(name)
+            if source is None:
+                raise _namespace_not_found(namespace)
+            previous_space = collection_space(source)
+            if previous_space != settings.hnsw_space:
+                logger.warning(
+                    "rebuild_index: migrating namespace %s from %s to %s distance; "
+                    "score_threshold values tuned for %s no longer apply",
+                    namespace, previous_space, settings.hnsw_space, previous_space,
+                )
+            staging_name, retired_name = f"{name}.rebuild", f"{name}.retired"
+            for stale in (staging_name, retired_name):
+                if _existing_collection(stale) is not None:
+                    client.delete_collection(stale)
+            # Waits for in-flight writes; once held, new ones get 409 until the swap
+            with _writes_lock(namespace).hold():
+                staging = client.create_collection(staging_name, metadata=_collection_metadata(rag))
+                offset = 0
+                while True:
+                    page = source.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+                    if not len(page["ids"]):
+                        break
+                    staging.add(ids=page["ids"], embeddings=page["embeddings"], documents=page["documents"], metadatas=page["metadatas"])
+                    offset += len(page["ids"])
+                source.modify(name=retired_name)
+                staging.modify(name=name)
+                _layout_stamp.bump()
+                with _shards_lock:
+                    for key in [key for key in _shards if key[2] == namespace]:
+                        del _shards[key]
+                _bump_generation()
+            # Queries that opened the old collection before the swap finish on it
+            time.sleep(_RETIRE_GRACE_SECONDS)
+            client.delete_collection(retired_name)
+    except LockHeld:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "code": "INDEX_REBUILDING",
+                "message": f"The index for namespace '{namespace}' is already being rebuilt.",
+                "hint": "GET /providers/rag/index shows the result once it has finished.",
+            },
+        ) from None
+    rebuilt = client.get_collection(name)
+    result = {
+        "namespace": namespace,
+        "vectors": offset,
+        **_hnsw_config(rebuilt),
+        "space": collection_space(rebuilt),
+        "rebuild_required": False,
+    }
+    if previous_space != result["space"]:
+        result["previous_space"] = previous_space
+    return result
 
 
 def reset_vectorstore_cache() -> None:
-    _vectorstore.cache_clear()
+    with _shards_lock:
+        _shards.clear()
+    _bump_generation()
+    answer_cache.clear()
     _ollama_embedding_client.cache_clear()
     _openai_embedding_client.cache_clear()
 
 
-def add_documents(documents, ids: List[str]):
+def _bump_generation() -> Stamp:
+    return _index_stamp.bump()
+
+
+def index_generation() -> Stamp:
+    """Current index generation, as seen by every worker."""
+    return _index_stamp.current()
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Hit/miss counters for the query-embedding and retrieval-result caches."""
+    return {
+        "query_embeddings": _query_embedding_cache.stats(),
+        "retrieval_results": _retrieval_cache.stats(),
+        "answers": answer_cache.stats(),
+    }
+
+
+def _load_file_rows(vs: Chroma, batch_size: int = 5000) -> Dict[int, Set[str]]:
+    rows: Dict[int, Set[str]] = {}
+    offset = 0
+    while True:
+        page = vs.get(include=["metadatas"], limit=batch_size, offset=offset)
+        ids = page.get("ids") or []
+        for vector_id, meta in zip(ids, page.get("metadatas") or []):
+            file_id = (meta or {}).get("file_id")
+            if file_id is not None:
+                rows.setdefault(int(file_id), set()).add(vector_id)
+        if len(ids) < batch_size:
+            return rows
+        offset += batch_size
+
+
+def _file_row_index(shard: _Shard) -> Dict[int, Set[str]]:
+    with shard.lock:
+        if shard.file_rows is None:
+            shard.rows_generation = index_generation()
+            shard.file_rows = _load_file_rows(shard.vectorstore)
+        return shard.file_rows
+
+
+def _note_rows(shard: _Shard, generation: Stamp, added: Dict[int, Set[str]] | None = None, removed: List[int] = ()) -> None:
+    """Apply this process's own write to the row index."""
+    index = _file_row_index(shard)
+    with shard.lock:
+        for file_id in removed:
+            index.pop(file_id, None)
+            shard.row_generations[file_id] = generation
+        for file_id, vector_ids in (added or {}).items():
+            index.setdefault(file_id, set()).update(vector_ids)
+            shard.row_generations[file_id] = generation
+
+
+def _scope_rows(shard: _Shard, file_ids: List[int]) -> Tuple[List[str], int]:
+    """Vector ids of a scope and the shard's total, current as of the shared generation.
+
+    Entries of files that may have changed in another worker since they were read
+    are re-read from the collection with one metadata query for the stale part of
+    the scope, so files ingested or re-ingested elsewhere are found with their
+    current vector ids.
+    """
+    generation = index_generation()
+    index = _file_row_index(shard)
+    wanted = set(file_ids)
+    with shard.lock:
+        stale = [fid for fid in wanted if shard.row_generations.get(fid, shard.rows_generation) != generation]
+    if stale:
+        page = shard.vectorstore._collection.get(where={"file_id": {"$in": stale}}, include=["metadatas"])
+        fresh: Dict[int, Set[str]] = {}
+        for vector_id, meta in zip(page["ids"], page["metadatas"]):
+            fresh.setdefault(int(meta["file_id"]), set()).add(vector_id)
+        with shard.lock:
+            for file_id in stale:
+                if file_id in fresh:
+                    index[file_id] = fresh[file_id]
+                else:
+                    index.pop(file_id, None)
+                shard.row_generations[file_id] = generation
+    with shard.lock:
+        scoped = [vid for fid in wanted for vid in index.get(fid, ())]
+        total = sum(len(rows) for rows in index.values())
+    if shard.rows_generation != generation:
+        # Files other workers wrote are missing from the sum; only the count is exact
+        total = max(total, shard.vectorstore._collection.count())
+    return scoped, total
+
+
+def add_documents(documents, ids: List[str], namespace: str | None = None):
     """Add documents with explicit IDs so they align to chunk records."""
-    vectorstore = get_vectorstore()
-    vectorstore.add_documents(documents=documents, ids=ids)
+    namespace = namespace or settings.default_namespace
+    with _writing(namespace):
+        shard = _shard(namespace, write=True)
+        texts = [doc.page_content for doc in documents]
+        # Embedding and upsert done separately (as Chroma.add_documents would) so each is timed
+        with ingest_stage("embed"):
+            embeddings = shard.vectorstore.embeddings.embed_documents(texts)
+        with ingest_stage("upsert"):
+            _upsert(shard, ids, embeddings, texts, [doc.metadata for doc in documents])
+
+
+def upsert_vectors(ids: List[str], embeddings, documents: List[str], metadatas: List[Dict[str, Any]], namespace: str) -> None:
+    """Write precomputed vectors (e.g. from a snapshot) without calling the embedding model."""
+    with _writing(namespace):
+        _upsert(_shard(namespace, write=True), ids, embeddings, documents, metadatas)
 
 
-def delete_by_file(file_id: int):
+def _upsert(shard: _Shard, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict[str, Any]]) -> None:
+    shard.vectorstore._collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+    generation = _bump_generation()
+    added: Dict[int, Set[str]] = {}
+    for meta, vector_id in zip(metadatas, ids):
+        file_id = meta.get("file_id")
+        if file_id is not None:
+            added.setdefault(int(file_id), set()).add(vector_id)
+    _note_rows(shard, generation, added=added)
+
+
+def delete_by_file(file_id: int, namespace: str | None = None):
     """Remove all vectors for a given file id."""
-    vectorstore = get_vectorstore()
-    vectorstore.delete(where={"file_id": file_id})
+    namespace = namespace or settings.default_namespace
+    with _writing(namespace):
+        shard = _shard(namespace, write=True)
+        shard.vectorstore.delete(where={"file_id": file_id})
+        _note_rows(shard, _bump_generation(), removed=[file_id])
+
+
+def invalidate_results() -> None:
+    """Drop cached retrieval results, e.g. once a file is tombstoned and must stop matching."""
+    _bump_generation()
+
+
+def purge_file(file_id: int, namespace: str, batch_size: int = 1000) -> int:
+    """Delete a (tombstoned) file's vectors in batches; returns how many were removed.
+
+    Goes through the client rather than a shard so compaction does not bring an
+    unloaded namespace back online. Refused (409) while the namespace is rebuilt.
+    """
+    with _writing(namespace):
+        collection = _existing_collection(collection_name(namespace))
+        if collection is None:
+            return 0
+        purged = 0
+        while True:
+            ids = collection.get(where={"file_id": file_id}, include=[], limit=batch_size)["ids"]
+            if not ids:
+                break
+            collection.delete(ids=ids)
+            purged += len(ids)
+    generation = _bump_generation()
+    with _shards_lock:
+        shards = [shard for key, shard in _shards.items() if key[2] == namespace]
+    for shard in shards:
+        with shard.lock:
+            if shard.file_rows is not None:
+                shard.file_rows.pop(file_id, None)
+                shard.row_generations[file_id] = generation
+    return purged
+
+
+def namespace_space(namespace: str) -> str | None:
+    """Distance of a namespace's collection, or None if it has none (never creates one)."""
+    collection = _existing_collection(collection_name(namespace))
+    return collection_space(collection) if collection is not None else None
+
+
+def ensure_collection(namespace: str, space: str) -> str:
+    """Create a namespace's collection with the given distance unless it exists; returns its distance."""
+    existing = namespace_space(namespace)
+    if existing is not None:
+        return existing
+    get_client().get_or_create_collection(collection_name(namespace), metadata=_collection_metadata(get_runtime_rag(), space))
+    _layout_stamp.bump()
+    return namespace_space(namespace)
+
+
+def fetch_embeddings(namespace: str, ids: List[str], batch_size: int = 1000) -> Dict[str, Any]:
+    """Stored vectors by id; ids without a vector are absent.
+
+    Reads through the client so exporting does not bring an unloaded namespace back online.
+    """
+    collection = _existing_collection(collection_name(namespace))
+    if collection is None:
+        return {}
+    found: Dict[str, Any] = {}
+    for start in range(0, len(ids), batch_size):
+        page = collection.get(ids=ids[start:start + batch_size], include=["embeddings"])
+        found.update(zip(page["ids"], page["embeddings"]))
+    return found
 
 
 def similarity_search_with_score(query: str, k: int):
@@ -84,36 +715,372 @@ def similarity_search_with_score(query: str, k: int):
     return vectorstore.similarity_search_with_score(query, k=k)
 
 
-def retrieve(query: str, k: int, file_ids: List[int] | None = None):
+def collection_space(collection) -> str:
+    """Distance a collection was built with: "l2", "cosine" or "ip"."""
+    hnsw = (collection.configuration or {}).get("hnsw") or {}
+    return hnsw.get("space") or (collection.metadata or {}).get("hnsw:space") or "l2"
+
+
+def _space(vs: Chroma) -> str:
+    return collection_space(vs._collection)
+
+
+def _distances(matrix: np.ndarray, q: np.ndarray, space: str) -> np.ndarray:
+    """Distances from q to each row of matrix, as Chroma reports them for the space."""
+    if space == "cosine":
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(q) or 1.0)
+        return 1.0 - (matrix @ q) / np.where(norms == 0, 1.0, norms)
+    if space == "ip":
+        return 1.0 - matrix @ q
+    # l2 (squared, as reported by Chroma)
+    diff = matrix - q
+    return np.einsum("ij,ij->i", diff, diff)
+
+
+def _to_candidates(ids, documents, metadatas, distances, embeddings) -> List[Candidate]:
+    candidates: List[Candidate] = []
+    for i, vector_id in enumerate(ids):
+        if documents[i] is None:
+            continue
+        doc = Document(page_content=documents[i], metadata=metadatas[i] or {}, id=vector_id)
+        candidates.append((doc, float(distances[i]), embeddings[i] if embeddings is not None else None))
+    return candidates
+
+
+def _ann_candidates(vs: Chroma, embedding: List[float], n: int, where: dict | None, with_embeddings: bool) -> List[Candidate]:
+    include = ["metadatas", "documents", "distances"] + (["embeddings"] if with_embeddings else [])
+    res = vs._collection.query(query_embeddings=[embedding], n_results=n, where=where, include=include)
+    return _to_candidates(
+        res["ids"][0],
+        res["documents"][0],
+        res["metadatas"][0],
+        res["distances"][0],
+        res["embeddings"][0] if with_embeddings else None,
+    )
+
+
+def _exact_candidates(vs: Chroma, embedding: List[float], n: int, ids: List[str], with_embeddings: bool) -> List[Candidate]:
+    """Brute-force search over an explicit set of rows, using the collection's distance."""
+    res = vs._collection.get(ids=ids, include=["embeddings", "documents", "metadatas"])
+    if not len(res["ids"]):
+        return []
+    matrix = np.asarray(res["embeddings"], dtype=np.float32)
+    distances = _distances(matrix, np.asarray(embedding, dtype=np.float32), _space(vs))
+    n = min(n, len(distances))
+    top = np.argpartition(distances, n - 1)[:n]
+    order = top[np.argsort(distances[top])]
+    return _to_candidates(
+        [res["ids"][i] for i in order],
+        [res["documents"][i] for i in order],
+        [res["metadatas"][i] for i in order],
+        distances[order],
+        matrix[order] if with_embeddings else None,
+    )
+
+
+def _scoped_candidates(
+    shard: _Shard, embedding: List[float], n: int, file_ids: List[int], with_embeddings: bool
+) -> List[Candidate]:
+    """Pick a plan for a file-scoped search from the scope's selectivity.
+
+    - small scopes: exact search over just the scope's rows (no ANN, no post-filter)
+    - broad scopes: unfiltered ANN, over-fetching by 1/selectivity and growing the
+      fetch until n candidates pass the filter
+    - scopes too sparse for over-fetch: Chroma's own metadata filter
+    """
+    vs = shard.vectorstore
+    scoped_ids, total = _scope_rows(shard, file_ids)
+    if not scoped_ids:
+        return []
+    if len(scoped_ids) <= settings.scoped_exact_max_chunks:
+        return _exact_candidates(vs, embedding, n, scoped_ids, with_embeddings)
+
+    selectivity = len(scoped_ids) / max(total, 1)
+    wanted = min(n, len(scoped_ids))
+    fetch = math.ceil(wanted / selectivity * 1.5)
+    allowed = set(file_ids)
+    while fetch <= settings.scoped_overfetch_max:
+        candidates = _ann_candidates(vs, embedding, min(fetch, total), None, with_embeddings)
+        passed = [c for c in candidates if c[0].metadata.get("file_id") in allowed]
+        if len(passed) >= wanted or fetch >= total:
+            return passed[:n]
+        fetch *= 2
+    return _ann_candidates(vs, embedding, n, {"file_id": {"$in": file_ids}}, with_embeddings)
+
+
+def _shard_candidates(shard: _Shard, embedding: List[float], n: int, file_ids: List[int] | None, with_embeddings: bool) -> List[Candidate]:
+    """Top-n of one shard, excluding files tombstoned but not yet compacted.
+
+    Unscoped searches over-fetch by the tombstoned vector count and drop those hits,
+    or fall back to Chroma's metadata filter when that count is too large.
+    """
+    dead = file_catalog.tombstones(shard.namespace)
+    if file_ids:
+        live = [fid for fid in file_ids if fid not in dead]
+        return _scoped_candidates(shard, embedding, n, live, with_embeddings) if live else []
+    if not dead:
+        return _ann_candidates(shard.vectorstore, embedding, n, None, with_embeddings)
+    extra = sum(dead.values())
+    if extra > settings.tombstone_overfetch_max:
+        return _ann_candidates(shard.vectorstore, embedding, n, {"file_id": {"$nin": list(dead)}}, with_embeddings)
+    candidates = _ann_candidates(shard.vectorstore, embedding, n + extra, None, with_embeddings)
+    return [c for c in candidates if c[0].metadata.get("file_id") not in dead][:n]
+
+
+def _fanout() -> ThreadPoolExecutor:
+    global _fanout_pool
+    with _shards_lock:
+        if _fanout_pool is None:
+            _fanout_pool = ThreadPoolExecutor(max_workers=settings.shard_search_workers, thread_name_prefix="shard-search")
+        return _fanout_pool
+
+
+def _candidates(
+    shards: List[_Shard], embedding: List[float], n: int, file_ids: List[int] | None, with_embeddings: bool = False
+) -> List[Candidate]:
+    """Search every shard in parallel and merge their sorted hits into a global top-n.
+
+    Shards whose collections use different distances (before a migrating rebuild) are
+    rescored in settings.hnsw_space first, so the merge compares like with like.
+    """
+    if len(shards) == 1:
+        return _shard_candidates(shards[0], embedding, n, file_ids, with_embeddings)
+    mixed = len({_space(shard.vectorstore) for shard in shards}) > 1
+    pool = _fanout()
+    futures = [pool.submit(_shard_candidates, shard, embedding, n, file_ids, with_embeddings or mixed) for shard in shards]
+    per_shard = [future.result() for future in futures]
+    if mixed:
+        per_shard = [_rescored(candidates, embedding, with_embeddings) for candidates in per_shard]
+    return list(islice(heapq.merge(*per_shard, key=lambda c: c[1]), n))
+
+
+def _rescored(candidates: List[Candidate], embedding: List[float], keep_embeddings: bool) -> List[Candidate]:
+    if not candidates:
+        return candidates
+    matrix = np.asarray([c[2] for c in candidates], dtype=np.float32)
+    distances = _distances(matrix, np.asarray(embedding, dtype=np.float32), settings.hnsw_space)
+    return sorted(
+        ((c[0], float(d), c[2] if keep_embeddings else None) for c, d in zip(candidates, distances)),
+        key=lambda c: c[1],
+    )
+
+
+def _embedding_key(query: str) -> Tuple[str, str, str]:
+    models = get_runtime_models()
+    return (models["embedding_provider"], models["embedding_model"], query)
+
+
+@contextmanager
+def _embedding_call(key: Tuple[str, str, str]):
+    """Time a query-embedding provider call and count its failures."""
+    provider, model, _ = key
+    try:
+        with timed(QUERY_EMBEDDING_SECONDS, provider=provider, model=model), stage("embed"):
+            yield
+    except HTTPException:
+        raise
+    except Exception:
+        provider_error(provider, model, "embedding")
+        raise
+
+
+def embed_query(query: str) -> List[float]:
+    """Embed a query through the LRU so repeated questions skip the embedding call."""
+    key = _embedding_key(query)
+    embedding = _query_embedding_cache.get(key)
+    if embedding is None:
+        with _embedding_call(key):
+            embedding = get_embeddings().embed_query(query)
+        _query_embedding_cache.put(key, embedding)
+    return embedding
+
+
+def embed_queries(queries: List[str]) -> List[List[float]]:
+    """Embed many queries with a single provider call for the LRU misses.
+
+    The vectors land in the query-embedding LRU, so a following retrieve/aretrieve of
+    the same text skips its own embedding call.
+    """
+    keys = [_embedding_key(query) for query in queries]
+    vectors = [_query_embedding_cache.get(key) for key in keys]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        # Timed as one call, like a single query; failures count as provider errors
+        with _embedding_call(keys[missing[0]]):
+            fresh = get_embeddings().embed_documents([queries[i] for i in missing])
+        for i, vector in zip(missing, fresh):
+            vectors[i] = vector
+            _query_embedding_cache.put(keys[i], vector)
+    return vectors
+
+
+def _hedge_embedding_client(provider: str, model: str) -> Tuple[str, Embeddings] | None:
+    """(latency label, raw client) serving the same embedding model elsewhere, if configured.
+
+    Vectors from a different model would not be comparable, so only the node changes.
+    """
+    if not settings.hedge_enabled:
+        return None
+    if provider == "ollama" and settings.hedge_ollama_base_url:
+        return hedge_label(provider, settings.hedge_ollama_base_url), _ollama_embedding_client(model, settings.hedge_ollama_base_url)
+    if provider == "openai":
+        return provider, _openai_embedding_client(model)
+    return None
+
+
+async def _hedged_aembed(query: str) -> List[float]:
+    models = get_runtime_models()
+    provider, model = models["embedding_provider"], models["embedding_model"]
+    primary_latency = histogram(provider, model, "embedding")
+    hedge = _hedge_embedding_client(provider, model)
+
+    async def secondary() -> List[float]:
+        label, client = hedge
+        limiter = provider_limiter(label, "embedding")
+        if not limiter.try_acquire():
+            raise HedgeDeclined()
+        try:
+            return await client.aembed_query(query)
+        finally:
+            limiter.release()
+
+    def record(label: str, seconds: float) -> None:
+        if label == "primary":
+            primary_latency.observe(seconds)
+        elif hedge is not None:
+            histogram(hedge[0], model, "embedding").observe(seconds)
+
+    return await hedged_call(
+        lambda: get_embeddings().aembed_query(query),
+        secondary if hedge is not None else None,
+        hedge_delay(primary_latency),
+        record,
+    )
+
+
+async def aembed_query(query: str) -> List[float]:
+    """Async embed_query; uses the provider's native async client on a miss."""
+    key = _embedding_key(query)
+    embedding = _query_embedding_cache.get(key)
+    if embedding is None:
+        with _embedding_call(key):
+            embedding = await _hedged_aembed(query)
+        _query_embedding_cache.put(key, embedding)
+    return embedding
+
+
+def _targets(namespaces: List[str] | None) -> List[str]:
+    if namespaces:
+        wanted = sorted({validate_namespace(ns) for ns in namespaces})
+        known = set(list_namespaces())
+        for namespace in wanted:
+            if namespace not in known:
+                raise _namespace_not_found(namespace)
+        return wanted
+    return [ns for ns in list_namespaces() if is_loaded(ns)]
+
+
+def _plan(query: str, k: int, file_ids: List[int] | None, namespaces: List[str] | None):
+    """Resolve the runtime config, target namespaces and result-cache key for a retrieval."""
+    models = get_runtime_models()
+    rag = get_runtime_rag()
+    targets = _targets(namespaces)
+    key = (
+        models["embedding_provider"],
+        models["embedding_model"],
+        query,
+        k,
+        rag["retrieval_strategy"],
+        rag.get("score_threshold"),
+        rag.get("fetch_k"),
+        rag.get("lambda_mult"),
+        tuple(sorted(set(file_ids))) if file_ids else None,
+        tuple(targets),
+        index_generation(),
+    )
+    return rag, targets, key
+
+
+def _search(targets: List[str], rag, embedding: List[float], k: int, file_ids: List[int] | None):
+    # Picks up tombstones set in other workers before their hits can be served
+    file_catalog.refresh()
+    shards = []
+    for namespace in targets:
+        try:
+            shards.append(_shard(namespace))
+        except HTTPException as exc:
+            # No collection yet (the default namespace before its first upload)
+            if exc.status_code != status.HTTP_404_NOT_FOUND:
+                raise
+    return _retrieve(shards, rag, embedding, k, file_ids) if shards else []
+
+
+def search_embedding(
+    embedding: List[float], k: int, rag, file_ids: List[int] | None = None, namespaces: List[str] | None = None
+):
+    """Search with an explicit retrieval config, bypassing the runtime config and result cache.
+
+    For offline evaluation of settings that are not (yet) the live ones.
+    """
+    return _search(_targets(namespaces), rag, embedding, k, file_ids)
+
+
+def retrieve(query: str, k: int, file_ids: List[int] | None = None, namespaces: List[str] | None = None):
     """Retrieve documents using configured strategy.
 
     - similarity: scored search
     - similarity_score_threshold: thresholded scored search
     - mmr: maximal marginal relevance (no score available)
+
+    Scoped queries (file_ids) are planned by selectivity, see _scoped_candidates.
+    Without explicit namespaces the search fans out over every loaded namespace.
+    Results are cached per (embedding model, strategy, file_ids, namespaces, index generation).
     """
-    vs = get_vectorstore()
-    rag = get_runtime_rag()
+    rag, targets, key = _plan(query, k, file_ids, namespaces)
+    cached = _retrieval_cache.get(key)
+    if cached is not None:
+        return list(cached)
+    embedding = embed_query(query)
+    with timed(VECTOR_SEARCH_SECONDS, strategy=rag["retrieval_strategy"]), stage("search"):
+        results = _search(targets, rag, embedding, k, file_ids)
+    _retrieval_cache.put(key, tuple(results))
+    return results
+
+
+async def aretrieve(query: str, k: int, file_ids: List[int] | None = None, namespaces: List[str] | None = None):
+    """Async retrieve: native async embedding, blocking Chroma search off the event loop."""
+    rag, targets, key = _plan(query, k, file_ids, namespaces)
+    cached = _retrieval_cache.get(key)
+    if cached is not None:
+        return list(cached)
+    embedding = await aembed_query(query)
+    with timed(VECTOR_SEARCH_SECONDS, strategy=rag["retrieval_strategy"]), stage("search"):
+        results = await asyncio.to_thread(_search, targets, rag, embedding, k, file_ids)
+    _retrieval_cache.put(key, tuple(results))
+    return results
+
+
+def _retrieve(shards: List[_Shard], rag, embedding: List[float], k: int, file_ids: List[int] | None):
     stype = rag["retrieval_strategy"]
-    filter_clause = {"file_id": {"$in": file_ids}} if file_ids else None
-    if stype == "similarity":
-        return vs.similarity_search_with_score(query, k=k, filter=filter_clause)
-    if stype == "similarity_score_threshold":
-        # Use similarity search as fallback for threshold strategy
-        # The relevance_scores method can produce invalid scores outside 0-1 range
-        # depending on the embedding model, so we filter manually
-        threshold = rag.get("score_threshold") or 0.0
-        results = vs.similarity_search_with_score(query, k=k * 2, filter=filter_clause)  # Get more to filter
-        filtered = [(doc, score) for doc, score in results if score >= threshold]
-        return filtered[:k]
     if stype == "mmr":
-        docs = vs.max_marginal_relevance_search(
-            query,
+        candidates = _candidates(shards, embedding, max(rag.get("fetch_k") or 20, k), file_ids, with_embeddings=True)
+        if not candidates:
+            return []
+        from langchain_chroma.vectorstores import maximal_marginal_relevance
+
+        selected = maximal_marginal_relevance(
+            np.array(embedding, dtype=np.float32),
+            [c[2] for c in candidates],
             k=k,
-            fetch_k=rag.get("fetch_k") or 20,
             lambda_mult=rag.get("lambda_mult") or 0.5,
-            filter=filter_clause,
         )
-        # Align interface: return (doc, score) pairs with score None
-        return [(d, None) for d in docs]
-    # Fallback to similarity
-    return vs.similarity_search_with_score(query, k=k, filter=filter_clause)
+        # Align interface: (doc, score) pairs with score None, in MMR's selection order
+        return [(candidates[i][0], None) for i in selected]
+    if stype == "similarity_score_threshold":
+        # The relevance_scores method can produce invalid scores outside 0-1 range
+        # depending on the embedding model, so we filter manually
+        threshold = rag.get("score_threshold") or 0.0
+        candidates = _candidates(shards, embedding, k * 2, file_ids)  # Get more to filter
+        return [(doc, score) for doc, score, _ in candidates if score >= threshold][:k]
+    # similarity, and fallback for unknown strategies
+    return [(doc, score) for doc, score, _ in _candidates(shards, embedding, k, file_ids)]
@@ -1,9 +1,16 @@
 from __future__ import annotations
 
+import contextlib
 import json
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass
 from pathlib import Path
 from threading import Lock
-from typing import Literal, TypedDict, Optional
+from types import MappingProxyType
+from typing import Any, Dict, Literal, Mapping, Optional, Tuple, TypedDict
 
 from ..config import settings
 from .providers import (
@@ -28,11 +35,17 @@ class RuntimeRAG(TypedDict):
     lambda_mult: Optional[float]
     chunking_method: Optional[str]
     vector_backend: str
+    # HNSW index parameters; M and construction_ef are fixed at build time, search_ef is live
+    hnsw_m: int
+    hnsw_construction_ef: int
+    hnsw_search_ef: int
 
 
 _CONFIG_PATH: Path = settings.storage_dir / "runtime_config.json"
 _LOCK = Lock()
 
+logger = logging.getLogger("runtime_config")
+
 
 def _ensure_storage_dir() -> None:
     _CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
@@ -56,55 +69,147 @@ def _rag_defaults() -> RuntimeRAG:
         "lambda_mult": 0.5,
         "chunking_method": None,
         "vector_backend": "chroma",
+        "hnsw_m": 16,
+        "hnsw_construction_ef": 100,
+        "hnsw_search_ef": 100,
     }
 
 
-def _read_config() -> RuntimeModels:
-    _ensure_storage_dir()
-    if not _CONFIG_PATH.exists():
-        models = _defaults()
-        data = {**models, "rag": _rag_defaults()}
-        _CONFIG_PATH.write_text(json.dumps(data, indent=2), encoding="utf-8")
-        return models
-
+def _parse_models(raw: Dict[str, Any]) -> RuntimeModels:
+    return RuntimeModels(
+        chat_provider=raw.get("chat_provider") or "ollama",
+        chat_model=raw.get("chat_model") or settings.chat_model,
+        embedding_provider=raw.get("embedding_provider") or "ollama",
+        embedding_model=raw.get("embedding_model") or settings.embedding_model,
+    )
+
+
+def _parse_rag(raw: Dict[str, Any]) -> RuntimeRAG:
+    rag = raw.get("rag") or _rag_defaults()
+    return RuntimeRAG(
+        retrieval_strategy=rag.get("retrieval_strategy") or "similarity",
+        top_k=int(rag.get("top_k") or settings.top_k),
+        score_threshold=rag.get("score_threshold"),
+        fetch_k=rag.get("fetch_k"),
+        lambda_mult=rag.get("lambda_mult"),
+        chunking_method=rag.get("chunking_method"),
+        vector_backend=rag.get("vector_backend") or "chroma",
+        hnsw_m=int(rag.get("hnsw_m") or 16),
+        hnsw_construction_ef=int(rag.get("hnsw_construction_ef") or 100),
+        hnsw_search_ef=int(rag.get("hnsw_search_ef") or 100),
+    )
+
+
+@dataclass(frozen=True)
+class RuntimeSnapshot:
+    """Immutable view of runtime_config.json as of one file version."""
+
+    version: int
+    models: Mapping[str, Any]
+    rag: Mapping[str, Any]
+    # (mtime_ns, size, inode) of the file this was parsed from; None = defaults, no file
+    stamp: Optional[Tuple[int, int, int]]
+
+
+def _snapshot(raw: Dict[str, Any], stamp: Optional[Tuple[int, int, int]]) -> RuntimeSnapshot:
+    return RuntimeSnapshot(
+        version=int(raw.get("version") or 0),
+        models=MappingProxyType(dict(_parse_models(raw))),
+        rag=MappingProxyType(dict(_parse_rag(raw))),
+        stamp=stamp,
+    )
+
+
+def _stamp() -> Optional[Tuple[int, int, int]]:
     try:
-        raw = json.loads(_CONFIG_PATH.read_text(encoding="utf-8"))
-        models = RuntimeModels(
-            chat_provider=raw.get("chat_provider") or "ollama",
-            chat_model=raw.get("chat_model") or settings.chat_model,
-            embedding_provider=raw.get("embedding_provider") or "ollama",
-            embedding_model=raw.get("embedding_model") or settings.embedding_model,
-        )
-        # Ensure RAG block exists
-        if "rag" not in raw:
-            raw["rag"] = _rag_defaults()
-            _CONFIG_PATH.write_text(json.dumps(raw, indent=2), encoding="utf-8")
-        return models
-    except Exception:
-        models = _defaults()
-        _CONFIG_PATH.write_text(json.dumps({**models, "rag": _rag_defaults()}, indent=2), encoding="utf-8")
-        return models
+        st = os.stat(_CONFIG_PATH)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+_current: RuntimeSnapshot = _snapshot({}, None)
+_loaded = False
+_checked_at = 0.0
+
+
+def _refresh() -> RuntimeSnapshot:
+    """Re-parse the file if its stat stamp changed; the read path never writes."""
+    global _current, _loaded
+    stamp = _stamp()
+    if _loaded and stamp == _current.stamp:
+        return _current
+    if stamp is None:
+        _current = _snapshot({}, None)
+    else:
+        try:
+            raw = json.loads(_CONFIG_PATH.read_text(encoding="utf-8"))
+            _current = _snapshot(raw, stamp)
+        except (OSError, ValueError) as exc:
+            # Keep serving the last good snapshot; the file is only rewritten by a setter
+            logger.warning("ignoring unreadable runtime config %s: %s", _CONFIG_PATH, exc)
+    _loaded = True
+    return _current
+
+
+def get_runtime_snapshot() -> RuntimeSnapshot:
+    """Current config snapshot; the file is stat-ed at most once per poll interval.
+
+    Writes from this process install their snapshot immediately; writes from other
+    workers are picked up on the next stat after they rename the new file in place.
+    """
+    global _checked_at
+    now = time.monotonic()
+    if _loaded and now - _checked_at < settings.runtime_config_poll_seconds:
+        return _current
+    with _LOCK:
+        _checked_at = now
+        return _refresh()
 
 
 def get_runtime_models() -> RuntimeModels:
-    with _LOCK:
-        return _read_config()
+    return RuntimeModels(**get_runtime_snapshot().models)  # type: ignore[typeddict-item]
 
 
 def get_runtime_rag() -> RuntimeRAG:
-    with _LOCK:
-        _ensure_storage_dir()
-        raw = json.loads(_CONFIG_PATH.read_text(encoding="utf-8")) if _CONFIG_PATH.exists() else {}
-        rag = raw.get("rag") or _rag_defaults()
-        return RuntimeRAG(
-            retrieval_strategy=rag.get("retrieval_strategy") or "similarity",
-            top_k=int(rag.get("top_k") or settings.top_k),
-            score_threshold=rag.get("score_threshold"),
-            fetch_k=rag.get("fetch_k"),
-            lambda_mult=rag.get("lambda_mult"),
-            chunking_method=rag.get("chunking_method"),
-            vector_backend=rag.get("vector_backend") or "chroma",
-        )
+    return RuntimeRAG(**get_runtime_snapshot().rag)  # type: ignore[typeddict-item]
+
+
+def _read_raw() -> Dict[str, Any]:
+    """Latest file contents for a read-modify-write (call with _LOCK held)."""
+    try:
+        return json.loads(_CONFIG_PATH.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {**_defaults(), "rag": _rag_defaults()}
+    except ValueError:
+        logger.warning("overwriting unreadable runtime config %s", _CONFIG_PATH)
+        return {**_defaults(), "rag": _rag_defaults()}
+
+
+def _write_raw(data: Dict[str, Any]) -> RuntimeSnapshot:
+    """Atomically replace the file (temp file + rename) and install the new snapshot.
+
+    Call with _LOCK held. Readers in other workers see either the old or the new file,
+    never a partial write.
+    """
+    global _current, _loaded, _checked_at
+    _ensure_storage_dir()
+    data = {**data, "version": int(data.get("version") or 0) + 1}
+    fd, tmp = tempfile.mkstemp(dir=_CONFIG_PATH.parent, prefix=".runtime_config.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump(data, handle, indent=2)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp, _CONFIG_PATH)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
+    _current = _snapshot(data, _stamp())
+    _loaded = True
+    _checked_at = time.monotonic()
+    return _current
 
 
 def _validate_provider(provider_key: str, kind: Literal["llm", "embedding"]) -> None:
@@ -131,15 +236,16 @@ def set_runtime_models(
         _validate_model(chat_provider, "llm", chat_model)
         _validate_model(embedding_provider, "embedding", embedding_model)
 
-        prev = json.loads(_CONFIG_PATH.read_text(encoding="utf-8")) if _CONFIG_PATH.exists() else {}
+        prev = _read_raw()
         data: dict = {
+            **prev,
             "chat_provider": chat_provider,
             "chat_model": chat_model,
             "embedding_provider": embedding_provider,
             "embedding_model": embedding_model,
             "rag": prev.get("rag") or _rag_defaults(),
         }
-        _CONFIG_PATH.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        snapshot = _write_raw(data)
 
     # Refresh caches after releasing the lock to avoid circular imports during validation
     try:
@@ -154,7 +260,7 @@ def set_runtime_models(
         # Cache refresh best-effort; failures should not block persisted config
         pass
 
-    return data
+    return RuntimeModels(**snapshot.models)  # type: ignore[typeddict-item]
 
 
 def set_runtime_rag(selection: RuntimeRAG) -> RuntimeRAG:
@@ -163,7 +269,9 @@ def set_runtime_rag(selection: RuntimeRAG) -> RuntimeRAG:
         allowed = {"similarity", "similarity_score_threshold", "mmr"}
         if selection["retrieval_strategy"] not in allowed:
             raise ValueError(f"Unsupported retrieval strategy '{selection['retrieval_strategy']}'")
-        prev = json.loads(_CONFIG_PATH.read_text(encoding="utf-8")) if _CONFIG_PATH.exists() else {}
+        prev = _read_raw()
+        # Clients that predate the HNSW fields omit them; keep the stored values
+        prev_rag = prev.get("rag") or {}
         prev["rag"] = {
             "retrieval_strategy": selection.get("retrieval_strategy") or "similarity",
             "top_k": int(selection.get("top_k") or settings.top_k),
@@ -172,8 +280,11 @@ def set_runtime_rag(selection: RuntimeRAG) -> RuntimeRAG:
             "lambda_mult": selection.get("lambda_mult"),
             "chunking_method": selection.get("chunking_method"),
             "vector_backend": selection.get("vector_backend") or "chroma",
+            "hnsw_m": int(selection.get("hnsw_m") or prev_rag.get("hnsw_m") or 16),
+            "hnsw_construction_ef": int(selection.get("hnsw_construction_ef") or prev_rag.get("hnsw_construction_ef") or 100),
+            "hnsw_search_ef": int(selection.get("hnsw_search_ef") or prev_rag.get("hnsw_search_ef") or 100),
         }
-        _CONFIG_PATH.write_text(json.dumps(prev, indent=2), encoding="utf-8")
+        snapshot = _write_raw(prev)
 
     try:
         from .rag_store import reset_vectorstore_cache
@@ -181,12 +292,12 @@ def set_runtime_rag(selection: RuntimeRAG) -> RuntimeRAG:
     except Exception:
         pass
 
-    return get_runtime_rag()
+    return RuntimeRAG(**snapshot.rag)  # type: ignore[typeddict-item]
 
 
 def reset_runtime_rag() -> RuntimeRAG:
     with _LOCK:
-        prev = json.loads(_CONFIG_PATH.read_text(encoding="utf-8")) if _CONFIG_PATH.exists() else {}
+        prev = _read_raw()
         prev["rag"] = _rag_defaults()
-        _CONFIG_PATH.write_text(json.dumps(prev, indent=2), encoding="utf-8")
-    return get_runtime_rag()
+        snapshot = _write_raw(prev)
+    return RuntimeRAG(**snapshot.rag)  # type: ignore[typeddict-item]
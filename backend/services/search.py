@@ -1,12 +1,11 @@
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass
 from typing import List
 
-from sqlalchemy.orm import Session
-
-from ..models import File
-from .rag_store import retrieve
+from .file_catalog import file_catalog
+from .rag_store import aretrieve, retrieve
 
 
 @dataclass
@@ -19,11 +18,42 @@ class RetrievedChunk:
     section_heading: str | None
     page_number: int | None
     score: float
+    chunk_index: int | None = None
+    token_count: int | None = None
+
+
+def retrieve_chunks(
+    query: str,
+    top_k: int,
+    file_ids: List[int] | None = None,
+    namespaces: List[str] | None = None,
+) -> List[RetrievedChunk]:
+    """LangChain-powered retrieval from vector store, labelled from the file catalog."""
+    results = retrieve(query, k=top_k, file_ids=file_ids, namespaces=namespaces)
+    return label_results(results)
+
+
+def label_results(results) -> List[RetrievedChunk]:
+    """RetrievedChunks for raw (doc, score) store results, labelled from the file catalog."""
+    return _label(_to_retrieved(results))
+
 
+async def aretrieve_chunks(
+    query: str,
+    top_k: int,
+    file_ids: List[int] | None = None,
+    namespaces: List[str] | None = None,
+) -> List[RetrievedChunk]:
+    """Async retrieve_chunks; only touches SQLite when the catalog must (re)load."""
+    results = await aretrieve(query, k=top_k, file_ids=file_ids, namespaces=namespaces)
+    retrieved = _to_retrieved(results)
+    ids = {hit.file_id for hit in retrieved}
+    if file_catalog.needs_reload(ids):
+        return await asyncio.to_thread(_label, retrieved)
+    return _label(retrieved)
 
-def retrieve_chunks(session: Session, query: str, top_k: int, file_ids: List[int] | None = None) -> List[RetrievedChunk]:
-    """LangChain-powered retrieval from vector store with stored metadata."""
-    results = retrieve(query, k=top_k, file_ids=file_ids)
+
+def _to_retrieved(results) -> List[RetrievedChunk]:
     retrieved: List[RetrievedChunk] = []
 
     for doc, score in results:
@@ -36,22 +66,27 @@ def retrieve_chunks(session: Session, query: str, top_k: int, file_ids: List[int
                 chunk_id=chunk_id,
                 file_id=file_id,
                 doc_id=doc_id,
-                filename="",  # Will be populated from database
+                filename="",  # Filled in from the file catalog
                 text=doc.page_content,
                 section_heading=meta.get("section_heading"),
                 page_number=meta.get("page_number"),
                 score=score or 0.0,
+                chunk_index=meta.get("chunk_index"),
+                token_count=meta.get("token_count"),
             )
         )
+    return retrieved
 
-    # Populate filenames from database
-    file_cache = {}
-    for hit in retrieved:
-        if hit.file_id not in file_cache:
-            file = session.get(File, hit.file_id)
-            file_cache[hit.file_id] = file
-        file = file_cache[hit.file_id]
-        if file:
-            hit.filename = file.filename
 
-    return retrieved
+def _label(retrieved: List[RetrievedChunk]) -> List[RetrievedChunk]:
+    """Fill in filenames and drop hits from files flagged as deleted."""
+    entries = file_catalog.lookup({hit.file_id for hit in retrieved})
+    labelled: List[RetrievedChunk] = []
+    for hit in retrieved:
+        entry = entries.get(hit.file_id)
+        if entry is not None:
+            if entry.deleted:
+                continue
+            hit.filename = entry.filename
+        labelled.append(hit)
+    return labelled
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import os
+import tempfile
+import uuid
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from ..config import settings
+
+# Marker files shared by every worker process; read at call time so tests can redirect it
+_DIR: Path = settings.storage_dir / "state"
+
+Stamp = Optional[Tuple[int, int, int]]
+
+
+def state_path(name: str) -> Path:
+    return _DIR / name
+
+
+def write_atomic(path: Path, text: str) -> None:
+    """Replace path's contents in one rename (temp file + os.replace, as runtime_config does)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            handle.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
+
+
+class SharedStamp:
+    """Change marker visible to every worker through one file's stat.
+
+    bump() atomically replaces the file (write_atomic), so its (mtime_ns, size, inode)
+    changes; current() is a single os.stat, cheap enough to call before every cache
+    lookup. None means never bumped.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    @property
+    def path(self) -> Path:
+        return state_path(self.name)
+
+    def current(self) -> Stamp:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def bump(self) -> Stamp:
+        write_atomic(self.path, uuid.uuid4().hex)
+        return self.current()
+
+
+class LockHeld(RuntimeError):
+    """A non-blocking FileLock.hold() found the lock taken."""
+
+
+class FileLock:
+    """Advisory lock (flock) on a file under the state directory.
+
+    flock locks belong to the open file, so threads of one worker exclude each other
+    just as separate workers do, and a crashed holder releases its lock with its fds.
+    Shared holders coexist; an exclusive holder excludes everyone.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    @property
+    def path(self) -> Path:
+        return state_path(f"{self.name}.lock")
+
+    @contextlib.contextmanager
+    def hold(self, exclusive: bool = True, blocking: bool = True) -> Iterator[None]:
+        path = self.path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            try:
+                fcntl.flock(fd, flags if blocking else flags | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise LockHeld(self.name) from None
+            yield
+        finally:
+            # Closing the fd releases the lock
+            os.close(fd)
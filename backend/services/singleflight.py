@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from contextlib import aclosing
+from typing import AsyncIterator, Callable, Dict, Hashable, List
+
+logger = logging.getLogger("singleflight")
+
+
+class _Flight:
+    """One running pipeline whose output frames are buffered for every subscriber."""
+
+    def __init__(self, key: Hashable, source: AsyncIterator[str], on_done: Callable[["_Flight"], None]):
+        self.key = key
+        self.frames: List[str] = []
+        self.done = False
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self._on_done = on_done
+        self.task = asyncio.create_task(self._pump(source))
+
+    def _notify(self) -> None:
+        # Swap the event so waiters wake once and new waiters block on a fresh one
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def _pump(self, source: AsyncIterator[str]) -> None:
+        try:
+            async with aclosing(source):
+                async for frame in source:
+                    self.frames.append(frame)
+                    self._notify()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("coalesced pipeline failed key=%s", self.key)
+        finally:
+            self.done = True
+            self._notify()
+            self._on_done(self)
+
+    async def frames_from_start(self) -> AsyncIterator[str]:
+        index = 0
+        while True:
+            while index < len(self.frames):
+                yield self.frames[index]
+                index += 1
+            if self.done:
+                return
+            await self._changed.wait()
+
+
+class SingleFlight:
+    """Coalesce identical concurrent requests onto a single producer.
+
+    The first caller for a key starts the producer; later callers with the same key
+    attach to it and replay every frame produced so far before following live output.
+    The producer is cancelled when its last subscriber leaves.
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.started = 0
+        self.joined = 0
+
+    def _finished(self, flight: _Flight) -> None:
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+    async def subscribe(self, key: Hashable, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(key, factory(), self._finished)
+            self._flights[key] = flight
+            self.started += 1
+        else:
+            self.joined += 1
+        flight.subscribers += 1
+        try:
+            async for frame in flight.frames_from_start():
+                yield frame
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Nobody is listening any more: abort retrieval / generation
+                self._finished(flight)
+                flight.task.cancel()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._flights), "started": self.started, "joined": self.joined}
+
+
+query_flights = SingleFlight()
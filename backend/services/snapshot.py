@@ -0,0 +1,369 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import shutil
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+from fastapi import HTTPException, status
+from sqlalchemy import DateTime, delete, insert, select, text
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import Chunk, File
+from .file_catalog import file_catalog
+from .rag_store import ensure_collection, fetch_embeddings, invalidate_results, namespace_space, purge_file, upsert_vectors
+from .runtime_config import get_runtime_models
+from .shared_state import FileLock, write_atomic
+
+logger = logging.getLogger("snapshot")
+
+FORMAT_VERSION = 1
+# Chunk rows (and their vectors) per part file
+PART_ROWS = 20000
+_BATCH = 1000
+_STATE_PATH = Path(settings.storage_dir) / "snapshot_state.json"
+# One apply at a time across workers
+_apply_lock = FileLock("snapshot_apply")
+
+
+def _error(code: int, key: str, message: str, hint: str | None = None) -> HTTPException:
+    detail = {"code": key, "message": message}
+    if hint:
+        detail["hint"] = hint
+    return HTTPException(status_code=code, detail=detail)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _decode(table, row: Dict[str, Any]) -> Dict[str, Any]:
+    for column in table.columns:
+        if isinstance(column.type, DateTime) and row.get(column.name):
+            row[column.name] = datetime.fromisoformat(row[column.name])
+    return row
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _schema_revision(session) -> str | None:
+    return session.execute(text("SELECT version_num FROM alembic_version")).scalar()
+
+
+def _version(file: Dict[str, Any]) -> str:
+    stamp = file["updated_at"] or file["uploaded_at"]
+    return stamp.isoformat() if stamp else ""
+
+
+class _PartWriter:
+    """One namespace's chunk rows and vectors, written as aligned JSONL/.npy parts."""
+
+    def __init__(self, directory: Path, namespace: str):
+        self.directory = directory
+        self.namespace = namespace
+        self.rows: List[Dict[str, Any]] = []
+        self.vectors: List[Any] = []
+        self.parts: List[Dict[str, Any]] = []
+        self.dim: int | None = None
+
+    def add(self, row: Dict[str, Any], vector: Any) -> None:
+        self.rows.append(row)
+        self.vectors.append(vector)
+        if len(self.rows) >= PART_ROWS:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.rows:
+            return
+        stem = f"{self.namespace}-{len(self.parts):05d}"
+        part = {"namespace": self.namespace, "chunks": f"chunks-{stem}.jsonl", "vectors": f"vectors-{stem}.npy", "rows": len(self.rows)}
+        with (self.directory / part["chunks"]).open("w", encoding="utf-8") as handle:
+            for row in self.rows:
+                handle.write(json.dumps(row, default=_json_default) + "\n")
+        vectors = np.asarray(self.vectors, dtype=np.float32)
+        self.dim = int(vectors.shape[1])
+        np.save(self.directory / part["vectors"], vectors)
+        self.parts.append(part)
+        self.rows, self.vectors = [], []
+
+
+def read_manifest(path: Path) -> Dict[str, Any]:
+    """Manifest of a bundle, given the bundle directory or its manifest.json."""
+    path = Path(path)
+    manifest_path = path / "manifest.json" if path.is_dir() else path
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as exc:
+        raise _error(status.HTTP_400_BAD_REQUEST, "SNAPSHOT_INVALID", f"Cannot read {manifest_path}: {exc}")
+    if manifest.get("format") != FORMAT_VERSION:
+        raise _error(
+            status.HTTP_400_BAD_REQUEST,
+            "SNAPSHOT_INVALID",
+            f"Unsupported snapshot format {manifest.get('format')!r}.",
+            f"This version reads format {FORMAT_VERSION}.",
+        )
+    return manifest
+
+
+def verify_snapshot(bundle: Path) -> Dict[str, Any]:
+    """Manifest of a bundle after checking every data file against its checksum."""
+    bundle = Path(bundle)
+    manifest = read_manifest(bundle)
+    for name, expected in manifest["checksums"].items():
+        path = bundle / name
+        if not path.is_file() or _sha256(path) != expected:
+            raise _error(status.HTTP_400_BAD_REQUEST, "SNAPSHOT_INVALID", f"{name} is missing or does not match its checksum.")
+    return manifest
+
+
+def export_snapshot(out_dir: Path, base: Path | None = None) -> Dict[str, Any]:
+    """Write a full bundle, or with base a delta of the files changed since that bundle.
+
+    Rows come from a single SQLite read transaction, so they are consistent with each
+    other; a file whose vectors do not all exist yet (ingest or reingest in flight)
+    is left out and picked up by the next delta. The bundle is written to a staging
+    directory and renamed into place with the manifest last.
+    """
+    out_dir = Path(out_dir)
+    if out_dir.exists():
+        raise _error(status.HTTP_409_CONFLICT, "SNAPSHOT_EXISTS", f"{out_dir} already exists.", "Export to a new directory.")
+    base_manifest = read_manifest(base) if base is not None else None
+    base_files: Dict[str, str] = base_manifest["files"] if base_manifest else {}
+    staging = out_dir.with_name(f".{out_dir.name}.partial")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    started = time.perf_counter()
+    models = get_runtime_models()
+
+    versions: Dict[str, str] = {}
+    skipped: List[int] = []
+    writers: Dict[str, _PartWriter] = {}
+    written_files = written_chunks = 0
+    with SessionLocal() as session, (staging / "files.jsonl").open("w", encoding="utf-8") as files_out:
+        # pysqlite only opens transactions for writes; BEGIN explicitly so every SELECT
+        # below reads the same WAL snapshot
+        session.connection().exec_driver_sql("BEGIN")
+        revision = _schema_revision(session)
+        files = session.execute(
+            select(File.__table__).where(File.deleted.is_(False)).order_by(File.namespace, File.id)
+        ).mappings().all()
+        for file in files:
+            key, version = str(file["id"]), _version(file)
+            if base_files.get(key) == version:
+                versions[key] = version
+                continue
+            chunks = session.execute(
+                select(Chunk.__table__).where(Chunk.file_id == file["id"]).order_by(Chunk.chunk_index)
+            ).mappings().all()
+            vectors = fetch_embeddings(file["namespace"], [str(chunk["id"]) for chunk in chunks])
+            if len(vectors) < len(chunks):
+                skipped.append(file["id"])
+                if key in base_files:
+                    # Replicas keep the copy they have until a later delta carries the new one
+                    versions[key] = base_files[key]
+                continue
+            versions[key] = version
+            files_out.write(json.dumps(dict(file), default=_json_default) + "\n")
+            writer = writers.setdefault(file["namespace"], _PartWriter(staging, file["namespace"]))
+            for chunk in chunks:
+                writer.add(dict(chunk), vectors[str(chunk["id"])])
+            written_files += 1
+            written_chunks += len(chunks)
+    for writer in writers.values():
+        writer.flush()
+
+    parts = [part for writer in writers.values() for part in writer.parts]
+    dims = {writer.dim for writer in writers.values() if writer.dim is not None}
+    created = datetime.now(timezone.utc)
+    manifest = {
+        "format": FORMAT_VERSION,
+        "snapshot_id": f"{created.strftime('%Y%m%dT%H%M%SZ')}-{uuid.uuid4().hex[:8]}",
+        "kind": "delta" if base_manifest else "full",
+        "base": base_manifest["snapshot_id"] if base_manifest else None,
+        "created_at": created.isoformat(),
+        "schema_revision": revision,
+        "embedding": {
+            "provider": models["embedding_provider"],
+            "model": models["embedding_model"],
+            "dim": dims.pop() if len(dims) == 1 else (base_manifest or {}).get("embedding", {}).get("dim"),
+        },
+        # Replicas build each namespace's collection with the primary's distance
+        "spaces": {**(base_manifest or {}).get("spaces", {}), **{ns: namespace_space(ns) for ns in writers}},
+        "counts": {"files": written_files, "chunks": written_chunks, "live_files": len(versions)},
+        "skipped_files": skipped,
+        "parts": parts,
+        # Every live file with its version: deltas diff against it and replicas drop what is not listed
+        "files": versions,
+        "checksums": {path.name: _sha256(path) for path in sorted(staging.iterdir())},
+    }
+    (staging / "manifest.json").write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
+    staging.rename(out_dir)
+    logger.info(
+        "exported %s snapshot %s: %s files, %s chunks in %.2fs",
+        manifest["kind"], manifest["snapshot_id"], written_files, written_chunks, time.perf_counter() - started,
+    )
+    return {key: value for key, value in manifest.items() if key not in ("files", "checksums")}
+
+
+def applied_snapshot() -> Dict[str, Any] | None:
+    """The last bundle applied to this node, or None."""
+    try:
+        return json.loads(_STATE_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    with path.open(encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _vector_metadata(row: Dict[str, Any], namespace: str) -> Dict[str, Any]:
+    # Same shape as ingest writes
+    return {
+        "doc_id": str(row["file_id"]),
+        "file_id": row["file_id"],
+        "chunk_id": row["id"],
+        "chunk_index": row["chunk_index"],
+        "token_count": row["token_count"],
+        "section_heading": row["section_heading"],
+        "page_number": row["page_number"],
+        "namespace": namespace,
+    }
+
+
+def _check_compatible(manifest: Dict[str, Any], replace: bool) -> None:
+    state = applied_snapshot()
+    with SessionLocal() as session:
+        revision = _schema_revision(session)
+        has_files = session.execute(select(File.id).limit(1)).first() is not None
+    if manifest["kind"] == "delta" and (state is None or state["snapshot_id"] != manifest["base"]):
+        raise _error(
+            status.HTTP_409_CONFLICT,
+            "SNAPSHOT_BASE_MISMATCH",
+            f"Delta {manifest['snapshot_id']} applies on top of {manifest['base']}, "
+            f"but this node is at {state['snapshot_id'] if state else 'no snapshot'}.",
+            "Apply the missing snapshots in order, or start again from a full snapshot.",
+        )
+    if manifest["kind"] == "full" and state is None and has_files and not replace:
+        raise _error(
+            status.HTTP_409_CONFLICT,
+            "SNAPSHOT_TARGET_NOT_EMPTY",
+            "This node has files that did not come from a snapshot.",
+            "Pass replace to overwrite its index with the snapshot.",
+        )
+    if manifest["schema_revision"] != revision:
+        raise _error(
+            status.HTTP_409_CONFLICT,
+            "SNAPSHOT_INCOMPATIBLE",
+            f"Snapshot schema revision {manifest['schema_revision']} differs from this node's {revision}.",
+            "Run the same release on the primary and the replica.",
+        )
+    models = get_runtime_models()
+    embedding = manifest["embedding"]
+    if (embedding["provider"], embedding["model"]) != (models["embedding_provider"], models["embedding_model"]):
+        raise _error(
+            status.HTTP_409_CONFLICT,
+            "SNAPSHOT_INCOMPATIBLE",
+            f"Snapshot vectors come from {embedding['provider']}/{embedding['model']}, "
+            f"this node embeds queries with {models['embedding_provider']}/{models['embedding_model']}.",
+            "Select the snapshot's embedding model on this node first.",
+        )
+    for namespace, space in (manifest.get("spaces") or {}).items():
+        local = namespace_space(namespace)
+        if local is not None and local != space:
+            raise _error(
+                status.HTTP_409_CONFLICT,
+                "SNAPSHOT_INCOMPATIBLE",
+                f"Namespace '{namespace}' uses {space} distance on the primary and {local} here.",
+                f"Rebuild it on this node with RAG_HNSW_SPACE={space} first.",
+            )
+
+
+def apply_snapshot(bundle: Path, replace: bool = False) -> Dict[str, Any]:
+    """Load a full or delta bundle into this node's database and vector index.
+
+    Files the bundle carries, and local files its manifest no longer lists, are
+    removed first; then file rows, chunk rows and vectors are inserted part by part.
+    The applied snapshot id is recorded last, so an apply that fails midway can be
+    repeated. Missing collections are created with the primary's distance. Other
+    workers pick the result up through the shared catalog stamp and index generation.
+    """
+    bundle = Path(bundle)
+    with _apply_lock.hold():
+        started = time.perf_counter()
+        manifest = verify_snapshot(bundle)
+        _check_compatible(manifest, replace)
+        incoming = [_decode(File.__table__, row) for row in _jsonl(bundle / "files.jsonl")]
+        incoming_ids = {row["id"] for row in incoming}
+        with SessionLocal() as session:
+            local = session.execute(select(File.id, File.namespace)).all()
+        stale = [(file_id, namespace) for file_id, namespace in local if file_id in incoming_ids or str(file_id) not in manifest["files"]]
+
+        for file_id, namespace in stale:
+            purge_file(file_id, namespace, _BATCH)
+        with SessionLocal() as session:
+            stale_ids = [file_id for file_id, _ in stale]
+            for start in range(0, len(stale_ids), _BATCH):
+                batch = stale_ids[start:start + _BATCH]
+                session.execute(delete(Chunk).where(Chunk.file_id.in_(batch)))
+                session.execute(delete(File).where(File.id.in_(batch)))
+            for start in range(0, len(incoming), _BATCH):
+                session.execute(insert(File.__table__), incoming[start:start + _BATCH])
+            session.commit()
+
+        for namespace, space in (manifest.get("spaces") or {}).items():
+            ensure_collection(namespace, space)
+        chunks = 0
+        for part in manifest["parts"]:
+            namespace = part["namespace"]
+            rows = [_decode(Chunk.__table__, row) for row in _jsonl(bundle / part["chunks"])]
+            vectors = np.load(bundle / part["vectors"])
+            with SessionLocal() as session:
+                for start in range(0, len(rows), _BATCH):
+                    session.execute(insert(Chunk.__table__), rows[start:start + _BATCH])
+                session.commit()
+            for start in range(0, len(rows), _BATCH):
+                batch = rows[start:start + _BATCH]
+                upsert_vectors(
+                    ids=[str(row["id"]) for row in batch],
+                    embeddings=vectors[start:start + _BATCH],
+                    documents=[row["content"] for row in batch],
+                    metadatas=[_vector_metadata(row, namespace) for row in batch],
+                    namespace=namespace,
+                )
+            chunks += len(rows)
+
+        result = {
+            "snapshot_id": manifest["snapshot_id"],
+            "kind": manifest["kind"],
+            "created_at": manifest["created_at"],
+            "applied_at": datetime.now(timezone.utc).isoformat(),
+            "removed_files": len(stale),
+            "files": len(incoming),
+            "chunks": chunks,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        write_atomic(_STATE_PATH, json.dumps(result, indent=2))
+        # Every worker reloads its catalog and drops cached results
+        file_catalog.reload_everywhere()
+        invalidate_results()
+        logger.info("applied snapshot: %s", result)
+        return result
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import asyncio
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+async def until_disconnected(
+    source: AsyncIterator[T],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    poll_interval: float = 0.5,
+) -> AsyncGenerator[T, None]:
+    """Relay items from source, abandoning it as soon as the client goes away.
+
+    A slow model can sit between tokens for a long time, and a disconnect is only
+    noticed on the next write. Waiting for the next item with a timeout lets us poll
+    the connection meanwhile. When the client is gone, the pending read is cancelled
+    and the source is closed, which aborts the upstream call.
+    """
+    pending: asyncio.Future | None = None
+    try:
+        while True:
+            pending = asyncio.ensure_future(source.__anext__())
+            while True:
+                done, _ = await asyncio.wait({pending}, timeout=poll_interval)
+                if done:
+                    break
+                if await is_disconnected():
+                    return
+            try:
+                item = pending.result()
+            except StopAsyncIteration:
+                pending = None
+                return
+            pending = None
+            yield item
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+            try:
+                await pending
+            except (asyncio.CancelledError, Exception):
+                pass
+        aclose = getattr(source, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+async def coalesce_text(
+    source: AsyncIterator[T],
+    window: float,
+    max_bytes: int,
+) -> AsyncGenerator[T, None]:
+    """Merge consecutive text pieces into larger ones.
+
+    Buffered text is emitted once ``window`` seconds have passed since its first piece
+    arrived or it reaches ``max_bytes`` (UTF-8), whichever comes first. Non-string
+    items (e.g. queue markers) flush the buffer and are passed through unchanged.
+    """
+    loop = asyncio.get_running_loop()
+    buffer: list[str] = []
+    size = 0
+    deadline = 0.0
+    pending: asyncio.Future | None = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(source.__anext__())
+            timeout = max(0.0, deadline - loop.time()) if buffer else None
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                # Window elapsed with the next piece still outstanding
+                yield "".join(buffer)
+                buffer, size = [], 0
+                continue
+            try:
+                item = pending.result()
+            except StopAsyncIteration:
+                pending = None
+                break
+            pending = None
+            if not isinstance(item, str):
+                if buffer:
+                    yield "".join(buffer)
+                    buffer, size = [], 0
+                yield item
+                continue
+            if not buffer:
+                deadline = loop.time() + window
+            buffer.append(item)
+            size += len(item.encode("utf-8"))
+            if size >= max_bytes:
+                yield "".join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+            try:
+                await pending
+            except (asyncio.CancelledError, Exception):
+                pass
+        aclose = getattr(source, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator
+from uuid import uuid4
+
+_current: ContextVar["RequestTimings | None"] = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """Per-stage wall time of one request, keyed by stage name (repeated stages add up)."""
+
+    def __init__(self, correlation_id: str):
+        self.correlation_id = correlation_id
+        self.stages: Dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def total(self) -> float:
+        return time.perf_counter() - self._started
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "correlation_id": self.correlation_id,
+            "stages_ms": {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()},
+            "total_ms": round(self.total() * 1000, 2),
+        }
+
+    def server_timing(self) -> str:
+        """Value for the Server-Timing response header."""
+        entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages.items()]
+        entries.append(f"total;dur={self.total() * 1000:.2f}")
+        return ", ".join(entries)
+
+
+def current() -> RequestTimings | None:
+    return _current.get()
+
+
+def correlation_id() -> str:
+    """The current request's correlation id, or a fresh one outside a request."""
+    timings = _current.get()
+    return timings.correlation_id if timings is not None else str(uuid4())
+
+
+@contextmanager
+def bind(timings: RequestTimings) -> Iterator[RequestTimings]:
+    """Make timings the current request's for the block.
+
+    Must not span a yield of an async generator: its next step may run in another
+    task (and context), e.g. under until_disconnected.
+    """
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the block into the current request's timings, if any."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    with timings.stage(name):
+        yield
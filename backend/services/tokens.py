@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from functools import lru_cache
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:  # pragma: no cover - tiktoken missing or encoding not downloadable
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Token count for budgeting prompts.
+
+    Uses tiktoken's cl100k_base when available. Local models tokenize differently,
+    but it is close enough for budgeting with a reserve. Otherwise falls back to ~4 chars/token.
+    """
+    if not text:
+        return 0
+    encoder = _encoder()
+    if encoder is None:
+        return max(1, len(text) // 4)
+    return len(encoder.encode(text, disallowed_special=()))
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
+
+from ..config import settings
+
+logger = logging.getLogger("warmup")
+
+
+@dataclass
+class WarmupState:
+    ready: bool = False
+    started_at: float | None = None
+    finished_at: float | None = None
+    # step name -> "pending" | "ok" | "error: ..." | "skipped: ..."
+    steps: Dict[str, str] = field(default_factory=dict)
+
+    def snapshot(self) -> Dict:
+        return {
+            "status": "ready" if self.ready else "warming",
+            "steps": dict(self.steps),
+            "warmup_seconds": (
+                round(self.finished_at - self.started_at, 3)
+                if self.started_at is not None and self.finished_at is not None
+                else None
+            ),
+        }
+
+
+state = WarmupState()
+
+
+def _import_query_stack() -> None:
+    # The provider integrations and Chroma are imported lazily, by the preload steps below
+    from . import generation, query_service, rag_store  # noqa: F401
+
+
+def _import_ingest_stack() -> None:
+    # Docling (torch, transformers) and the splitters; otherwise the first upload pays
+    from docling.document_converter import DocumentConverter  # noqa: F401
+    from langchain_text_splitters import RecursiveCharacterTextSplitter  # noqa: F401
+
+
+def _preload_chat_model() -> None:
+    from .generation import _get_chat
+    from .runtime_config import get_runtime_models
+
+    models = get_runtime_models()
+    if models["chat_provider"] == "ollama":
+        import ollama
+
+        # An empty prompt loads the model into memory without generating
+        ollama.Client(host=settings.ollama_base_url).generate(
+            model=models["chat_model"], prompt="", keep_alive=settings.model_keep_alive_seconds
+        )
+    _get_chat()
+
+
+def _preload_embedding_model() -> None:
+    from .rag_store import embed_query
+
+    # Goes through the regular client (with keep_alive) and seeds the query-embedding LRU
+    embed_query("warm-up")
+
+
+def _touch_index() -> None:
+    from .rag_store import is_loaded, list_namespaces, load_namespace
+
+    for namespace in list_namespaces():
+        if is_loaded(namespace):
+            load_namespace(namespace)
+
+
+def _warm_caches() -> None:
+    from .generation import chat_context_length
+    from .providers import refresh_model_catalog
+
+    refresh_model_catalog()
+    chat_context_length()
+
+
+STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("imports", _import_query_stack),
+    ("chat_model", _preload_chat_model),
+    ("embedding_model", _preload_embedding_model),
+    ("vector_index", _touch_index),
+    ("caches", _warm_caches),
+]
+
+
+# Only save first-request latency: if they fail (e.g. Docling can't load), readiness
+# shouldn't wait on them, and the failure resurfaces on the first upload anyway
+_BEST_EFFORT = {"ingest_imports"}
+
+
+def _steps() -> List[Tuple[str, Callable[[], None]]]:
+    if settings.enable_ingest and not settings.read_only:
+        return [*STEPS, ("ingest_imports", _import_ingest_stack)]
+    return list(STEPS)
+
+
+async def run_warmup() -> None:
+    """Run every warm-up step, retrying failures until all succeed (best-effort steps run once)."""
+    state.started_at = time.perf_counter()
+    pending = _steps()
+    for name, _ in pending:
+        state.steps[name] = "pending"
+    while pending:
+        failed = []
+        for name, step in pending:
+            try:
+                await asyncio.to_thread(step)
+                state.steps[name] = "ok"
+            except Exception as exc:
+                if name in _BEST_EFFORT:
+                    logger.warning("warm-up step %s failed, skipping it: %s", name, exc)
+                    state.steps[name] = f"skipped: {exc}"
+                    continue
+                logger.warning("warm-up step %s failed: %s", name, exc)
+                state.steps[name] = f"error: {exc}"
+                failed.append((name, step))
+        pending = failed
+        if pending:
+            await asyncio.sleep(settings.warmup_retry_seconds)
+    state.finished_at = time.perf_counter()
+    state.ready = True
+    logger.info("warm-up complete in %.2fs", state.finished_at - state.started_at)
+
+
+def mark_ready() -> None:
+    """Used when warm-up is disabled: the instance is ready as soon as it starts."""
+    state.ready = True
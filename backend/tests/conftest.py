@@ -0,0 +1,9 @@
+import pytest
+
+from backend.services import shared_state
+
+
+@pytest.fixture(autouse=True)
+def _isolated_shared_state(monkeypatch, tmp_path):
+    """Keep cross-worker stamp and lock files out of backend/storage."""
+    monkeypatch.setattr(shared_state, "_DIR", tmp_path / "state")
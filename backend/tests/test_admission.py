@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from backend.services.providers import ProviderLimiter
+
+
+def test_queue_reports_positions_and_rejects_when_full():
+    async def scenario():
+        limiter = ProviderLimiter("ollama", max_concurrent=1, max_queue=1, queue_timeout=5)
+        await limiter.acquire()
+        positions = []
+
+        async def waiter():
+            async for position in limiter.queue():
+                positions.append(position)
+            limiter.release()
+
+        task = asyncio.create_task(waiter())
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException) as exc:
+            await limiter.acquire()
+        limiter.release()
+        await task
+        return positions, exc.value, limiter.stats()
+
+    positions, rejected, stats = asyncio.run(scenario())
+    assert positions == [1]
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"]
+    assert stats["active"] == 0 and stats["queued"] == 0 and stats["rejected"] == 1
+
+
+def test_waiters_time_out_with_503_and_threads_share_the_limit():
+    limiter = ProviderLimiter("ollama", max_concurrent=1, max_queue=4, queue_timeout=0.05)
+    with limiter.slot():
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(limiter.acquire())
+        assert exc.value.status_code == 503
+
+        entered = threading.Event()
+
+        def worker():
+            with limiter.slot():
+                entered.set()
+
+        limiter.queue_timeout = 5
+        thread = threading.Thread(target=worker)
+        thread.start()
+        assert not entered.wait(0.05)
+    thread.join(1)
+    assert entered.is_set()
+    assert limiter.stats()["active"] == 0
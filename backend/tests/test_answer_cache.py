@@ -0,0 +1,32 @@
+from backend.services.answer_cache import AnswerCache
+
+GEN = (1, 32, 100)
+NEXT_GEN = (2, 32, 101)
+
+
+def test_lookup_requires_same_chunks_and_close_question():
+    cache = AnswerCache(maxsize=4)
+    key = ("ollama", "gemma3:4b", GEN, frozenset({"1", "2"}))
+    cache.lookup(key, [1.0, 0.0], threshold=0.95)
+    cache.store(key, [1.0, 0.0], "answer")
+
+    assert cache.lookup(key, [0.99, 0.05], threshold=0.95) == "answer"
+    assert cache.lookup(key, [0.0, 1.0], threshold=0.95) is None
+    other_chunks = ("ollama", "gemma3:4b", GEN, frozenset({"1", "3"}))
+    assert cache.lookup(other_chunks, [1.0, 0.0], threshold=0.95) is None
+
+
+def test_new_index_generation_retires_every_answer():
+    cache = AnswerCache(maxsize=4)
+    key = ("ollama", "m", GEN, frozenset({"1"}))
+    cache.lookup(key, [1.0, 0.0], threshold=0.9)
+    cache.store(key, [1.0, 0.0], "a")
+
+    # Another worker reingested: chunk id 1 may now hold different text
+    reused = ("ollama", "m", NEXT_GEN, frozenset({"1"}))
+    assert cache.lookup(reused, [1.0, 0.0], threshold=0.9) is None
+    assert cache.stats()["size"] == 0
+
+    # An answer generated from the old index arrives late and is not stored
+    cache.store(key, [1.0, 0.0], "stale")
+    assert cache.lookup(reused, [1.0, 0.0], threshold=0.9) is None
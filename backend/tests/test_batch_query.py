@@ -0,0 +1,107 @@
+import json
+
+from backend.services.search import RetrievedChunk
+from backend.tools import batch_query
+
+
+def _hit(query: str) -> RetrievedChunk:
+    return RetrievedChunk(
+        chunk_id=1, file_id=1, doc_id="1", filename="f.txt", text=f"about {query}", section_heading=None,
+        page_number=None, score=0.0, chunk_index=0, token_count=10,
+    )
+
+
+def _fake_pipeline(monkeypatch):
+    """Stubs retrieval and generation; returns the embedding batches and the questions answered."""
+    embedded, answered = [], []
+
+    async def run_query(query, top_k, file_ids=None, namespaces=None):
+        answered.append(query)
+        if query == "boom":
+            raise RuntimeError("provider down")
+
+        async def stream():
+            yield f"answer to {query}"
+
+        return stream(), [_hit(query)]
+
+    monkeypatch.setattr(batch_query, "run_query", run_query)
+    monkeypatch.setattr(batch_query, "embed_queries", lambda queries: embedded.append(list(queries)))
+    monkeypatch.setattr(batch_query, "get_runtime_rag", lambda: {"top_k": 3})
+    monkeypatch.setattr(batch_query, "run_migrations", lambda: None)
+    monkeypatch.setattr(batch_query.file_catalog, "load", lambda: None)
+    return embedded, answered
+
+
+def _results(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_questions_are_embedded_once_per_batch(monkeypatch, tmp_path):
+    embedded, answered = _fake_pipeline(monkeypatch)
+    questions = tmp_path / "questions.jsonl"
+    questions.write_text("".join(json.dumps({"query": f"q{i}"}) + "\n" for i in range(5)), encoding="utf-8")
+    output = tmp_path / "answers.jsonl"
+
+    batch_query.main([str(questions), "--output", str(output), "--batch-size", "2"])
+
+    assert embedded == [["q0", "q1"], ["q2", "q3"], ["q4"]]
+    assert sorted(answered) == [f"q{i}" for i in range(5)]
+    results = {r["id"]: r for r in _results(output)}
+    assert results[1]["answer"] == "answer to q0"
+    assert results[1]["contexts"][0]["text"] == "about q0"
+    assert set(results[1]["timings"]) == {"embed_ms", "retrieve_ms", "generate_ms", "total_ms"}
+
+
+def test_rerun_resumes_and_retries_errors(monkeypatch, tmp_path):
+    embedded, answered = _fake_pipeline(monkeypatch)
+    questions = tmp_path / "questions.jsonl"
+    questions.write_text(
+        "".join(json.dumps(item) + "\n" for item in [{"id": "a", "query": "one"}, {"id": "b", "query": "boom"}, {"id": "c", "query": "three"}]),
+        encoding="utf-8",
+    )
+    output = tmp_path / "answers.jsonl"
+    # An earlier run answered "a", failed "b" and was cut off while writing "c"
+    output.write_text(
+        json.dumps({"id": "a", "answer": "old", "error": None}) + "\n"
+        + json.dumps({"id": "b", "answer": None, "error": "provider down"}) + "\n"
+        + '{"id": "c", "ans',
+        encoding="utf-8",
+    )
+    assert batch_query.completed_ids(output, retry_errors=False) == {"a", "b"}
+    assert batch_query.completed_ids(output, retry_errors=True) == {"a"}
+
+    batch_query.main([str(questions), "--output", str(output)])
+    assert answered == ["three"]
+    # The fragment was cut off before appending, so every line parses
+    assert [r["id"] for r in _results(output)] == ["a", "b", "c"]
+
+    answered.clear()
+    batch_query.main([str(questions), "--output", str(output), "--retry-errors"])
+    assert answered == ["boom"]
+    # Appended: the newest line for an id wins
+    assert [(r["id"], r["error"]) for r in _results(output)[-2:]] == [("c", None), ("b", "provider down")]
+
+
+def test_no_generate_packs_against_the_chat_model_window(monkeypatch, tmp_path):
+    _fake_pipeline(monkeypatch)
+    budgets = []
+
+    async def aretrieve_chunks(query, top_k, file_ids=None, namespaces=None):
+        return [_hit(query)]
+
+    def pack_contexts(query, retrieved, context_length):
+        budgets.append(context_length)
+        return [], retrieved
+
+    monkeypatch.setattr(batch_query, "aretrieve_chunks", aretrieve_chunks)
+    monkeypatch.setattr(batch_query, "pack_contexts", pack_contexts)
+    monkeypatch.setattr(batch_query, "chat_context_length", lambda: 32768)
+    questions = tmp_path / "questions.jsonl"
+    questions.write_text(json.dumps({"query": "q"}) + "\n", encoding="utf-8")
+    output = tmp_path / "hits.jsonl"
+
+    batch_query.main([str(questions), "--output", str(output), "--no-generate"])
+
+    assert budgets == [32768]
+    assert _results(output)[0]["answer"] is None
@@ -0,0 +1,60 @@
+from backend.benchmarks.micro import FakeEmbeddings, _parse_size, compare, synthetic_markdown
+
+
+def test_synthetic_inputs_are_deterministic():
+    assert synthetic_markdown(4, seed=1) == synthetic_markdown(4, seed=1)
+    assert synthetic_markdown(4, seed=1) != synthetic_markdown(4, seed=2)
+    assert len(synthetic_markdown(4, seed=1)) >= 4 * 1024
+    embeddings = FakeEmbeddings(dim=8)
+    assert embeddings.embed_query("q") == embeddings.embed_documents(["q"])[0]
+    assert [_parse_size(s) for s in ("1k", "100k", "1m", "250")] == [1_000, 100_000, 1_000_000, 250]
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {"a": {"p50_ms": 10.0}, "b": {"p50_ms": 10.0}, "gone": {"p50_ms": 1.0}}
+    results = {"a": {"p50_ms": 11.0}, "b": {"p50_ms": 13.0}, "new": {"p50_ms": 1.0}}
+    rows = {row["case"]: row for row in compare(results, baseline, tolerance=0.2)}
+    assert set(rows) == {"a", "b"}
+    assert not rows["a"]["regression"]
+    assert rows["b"]["regression"]
+
+
+def test_loadtest_parses_sse_stream_and_summarizes():
+    import asyncio
+
+    import httpx
+
+    from backend.benchmarks.loadtest import Sample, _one, _Run, markdown_report, summarize
+
+    body = (
+        "event: context\ndata: []\n\n"
+        "event: start\ndata: {}\n\n"
+        'data: {"text": "hello"}\n\n'
+        'data: {"text": " world"}\n\n'
+        'event: timings\ndata: {"stages_ms": {"retrieve": 1.0}}\n\n'
+        "event: end\ndata: {}\n\n"
+    )
+
+    def handler(request):
+        if b"fail" in request.content:
+            return httpx.Response(429, json={"code": "RATE_LIMITED"})
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    async def go():
+        run = _Run()
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            ok = await _one(client, "http://t", {"query": "q"}, Sample(0, 0.0), run)
+            bad = await _one(client, "http://t", {"query": "fail"}, Sample(1, 0.1), run)
+        return [ok, bad], run
+
+    samples, run = asyncio.run(go())
+    ok, bad = samples
+    assert ok.error is None and ok.time_to_context_ms is not None and ok.ttft_ms is not None
+    assert ok.tokens >= 2 and ok.server_timings == {"stages_ms": {"retrieve": 1.0}}
+    assert bad.error == "HTTP 429 RATE_LIMITED"
+
+    summary = summarize(samples, run, wall=1.0)
+    assert summary["error_rate"] == 0.5 and summary["errors"] == {"HTTP 429 RATE_LIMITED": 1}
+    assert summary["metrics"]["ttft_ms"]["p99"] == ok.ttft_ms
+    meta = {"label": "v1", "timestamp": "t", "url": "u", "framing": "compact", "arrivals": "poisson", "rate": 1, "duration": 1}
+    assert "| ttft_ms |" in markdown_report(summary, meta)
@@ -0,0 +1,133 @@
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from backend.config import settings
+from backend.database import Base
+from backend.models import Chunk, File
+from backend.services import compactor as compactor_module
+from backend.services import file_catalog as catalog_module
+from backend.services import ingest
+from backend.services.compactor import Compactor
+from backend.services.file_catalog import FileCatalog
+
+
+def _db(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'compact.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    catalog = FileCatalog()
+    for module in (compactor_module, catalog_module):
+        monkeypatch.setattr(module, "SessionLocal", factory)
+    for module in (compactor_module, ingest):
+        monkeypatch.setattr(module, "file_catalog", catalog)
+    return factory, catalog
+
+
+def _file(factory, tmp_path, name, chunks):
+    blob = tmp_path / name
+    blob.write_text("x")
+    with factory() as session:
+        record = File(filename=name, filepath=str(blob), filetype="txt", size_mb=0.0, namespace="default")
+        session.add(record)
+        session.flush()
+        session.add_all(Chunk(file_id=record.id, chunk_index=i, content=f"c{i}") for i in range(chunks))
+        session.commit()
+        return record.id, blob
+
+
+def test_delete_tombstones_then_compactor_purges(monkeypatch, tmp_path):
+    factory, catalog = _db(monkeypatch, tmp_path)
+    kept, _ = _file(factory, tmp_path, "kept.txt", 2)
+    gone, blob = _file(factory, tmp_path, "gone.txt", 5)
+    catalog.load()
+
+    with factory() as session:
+        ingest.remove_file(session, gone)
+    assert catalog.tombstones("default") == {gone: 5}
+    assert catalog.lookup({gone})[gone].deleted
+    moved = blob.with_name(f"gone.txt.deleted-{gone}")
+    assert moved.exists() and not blob.exists()
+    # The name can be uploaded again before compaction
+    _file(factory, tmp_path, "gone.txt", 1)
+
+    purged, rebuilt = [], []
+    monkeypatch.setattr(settings, "compaction_batch_size", 2)
+    monkeypatch.setattr(settings, "compaction_auto_rebuild", True)
+    monkeypatch.setattr(compactor_module, "purge_file", lambda fid, ns, batch: purged.append((fid, ns, batch)) or 5)
+    monkeypatch.setattr(compactor_module, "index_status", lambda: [{"namespace": "default", "vectors": 2}])
+    monkeypatch.setattr(compactor_module, "rebuild_index", lambda ns: rebuilt.append(ns))
+
+    result = Compactor().run_once()
+    assert purged == [(gone, "default", 2)]
+    assert (result["files"], result["vectors"], result["chunks"], result["pending"]) == (1, 5, 5, 0)
+    # 5 of 7 vectors purged is past the rebuild ratio
+    assert rebuilt == ["default"] and result["rebuilt"] == ["default"]
+    assert not moved.exists() and blob.exists()
+    with factory() as session:
+        assert session.scalar(select(func.count()).select_from(File)) == 2
+        assert session.scalar(select(func.count()).select_from(Chunk).where(Chunk.file_id == gone)) == 0
+    assert catalog.tombstones("default") == {}
+    assert catalog.lookup({kept})[kept].filename == "kept.txt"
+
+
+def test_one_pass_at_a_time_and_purge_counts_shared_across_workers(monkeypatch, tmp_path):
+    factory, catalog = _db(monkeypatch, tmp_path)
+    _file(factory, tmp_path, "kept.txt", 2)
+    rebuilt = []
+    monkeypatch.setattr(compactor_module, "purge_file", lambda fid, ns, batch: 5)
+    monkeypatch.setattr(compactor_module, "index_status", lambda: [{"namespace": "default", "vectors": 2}])
+    monkeypatch.setattr(compactor_module, "rebuild_index", lambda ns: rebuilt.append(ns))
+
+    # Another worker's pass holds the lock
+    with compactor_module._compaction_lock.hold():
+        assert Compactor().run_once() == {"status": "running"}
+
+    gone, _ = _file(factory, tmp_path, "gone.txt", 5)
+    with factory() as session:
+        ingest.remove_file(session, gone)
+    result = Compactor().run_once()
+    # Auto-rebuild is opt-in; the purge still counts towards the namespace's next rebuild
+    assert (result["files"], result["rebuilt"], rebuilt) == (1, [], [])
+    assert compactor_module._load_purged() == {"default": 5}
+
+    monkeypatch.setattr(settings, "compaction_auto_rebuild", True)
+    assert Compactor().run_once()["rebuilt"] == ["default"]  # a different worker's compactor
+    assert compactor_module._load_purged() == {}
+
+
+def test_tombstones_survive_a_catalog_reload(monkeypatch, tmp_path):
+    factory, catalog = _db(monkeypatch, tmp_path)
+    gone, _ = _file(factory, tmp_path, "gone.txt", 3)
+    with factory() as session:
+        session.get(File, gone).deleted = True
+        session.commit()
+    catalog.load()
+    assert catalog.tombstones("default") == {gone: 3}
+    catalog.remove(gone)
+    assert catalog.tombstone_count() == 0
+    catalog.tombstone(SimpleNamespace(id=9, filename="n", filetype="txt", namespace="other"), vectors=1)
+    assert catalog.tombstones("other") == {9: 1}
+
+
+
+def test_idle_passes_skip_the_catalog_reload_and_purges_reach_other_workers(monkeypatch, tmp_path):
+    factory, catalog = _db(monkeypatch, tmp_path)
+    _file(factory, tmp_path, "kept.txt", 1)
+    gone, _ = _file(factory, tmp_path, "gone.txt", 2)
+    catalog.load()
+    loads = []
+    monkeypatch.setattr(catalog, "load", lambda: loads.append(1))
+    monkeypatch.setattr(compactor_module, "purge_file", lambda fid, ns, batch: 2)
+
+    assert Compactor().run_once()["files"] == 0
+    assert loads == []
+
+    with factory() as session:
+        ingest.remove_file(session, gone)
+    other_worker = FileCatalog()
+    other_worker.load()
+    assert Compactor().run_once()["files"] == 1
+    assert loads == []  # our own removals keep this worker's copy current
+    assert other_worker.stale()
@@ -0,0 +1,44 @@
+from backend.config import settings
+from backend.services import generation
+from backend.services.providers import ModelInfo
+from backend.services.query_service import pack_contexts
+from backend.services.search import RetrievedChunk
+
+
+def _hit(file_id: int, index: int, text: str, tokens: int = 10) -> RetrievedChunk:
+    return RetrievedChunk(
+        chunk_id=file_id * 100 + index, file_id=file_id, doc_id=str(file_id), filename="f.txt",
+        text=text, section_heading=None, page_number=None, score=0.0,
+        chunk_index=index, token_count=tokens,
+    )
+
+
+def test_adjacent_chunks_merge_without_repeating_overlap():
+    overlap = "shared sentence that both chunks contain. "
+    first = _hit(1, 0, "Opening text. " + overlap)
+    second = _hit(1, 1, overlap + "Closing text.")
+    contexts, used = pack_contexts("q", [second, first], context_length=100_000)
+
+    assert len(contexts) == 1
+    assert contexts[0].endswith("Opening text. " + overlap + "Closing text.")
+    assert contexts[0].count("shared sentence") == 1
+    assert {h.chunk_id for h in used} == {100, 101}
+
+
+def test_budget_keeps_best_ranked_blocks():
+    hits = [_hit(1, 0, "best", tokens=600), _hit(2, 5, "second", tokens=600), _hit(3, 9, "third", tokens=600)]
+    # Room for roughly two blocks once the answer reserve and prompt are taken out
+    contexts, used = pack_contexts("q", hits, context_length=settings.answer_token_reserve + 1500)
+
+    assert [h.file_id for h in used] == [1, 2]
+    assert contexts[0].endswith("best")
+
+
+def test_context_length_lookup_failure_is_not_pinned(monkeypatch):
+    monkeypatch.setattr(generation, "get_runtime_models", lambda: {"chat_provider": "ollama", "chat_model": "llama"})
+    listings = [[], [ModelInfo(id="llama", label="llama", context_length=32768)]]
+    monkeypatch.setattr(generation, "list_models_for_provider", lambda provider, kind: listings.pop(0))
+
+    assert generation.chat_context_length() == settings.default_context_length
+    # The provider came back: the next lookup sees the real window
+    assert generation.chat_context_length() == 32768
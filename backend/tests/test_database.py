@@ -0,0 +1,167 @@
+import asyncio
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+import sqlalchemy as sa
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import database
+from backend.config import settings
+from backend.database import Base
+from backend.dependencies import get_async_db
+from backend.main import app
+from backend.models import Chunk, File
+from backend.schemas import ChunkOut, FileMeta
+
+# Schema written by Base.metadata.create_all before Alembic existed. The docling and
+# raw_markdown columns are absent on databases older than migrate_add_docling_field.py.
+_BASELINE = [
+    """CREATE TABLE files (
+        id INTEGER NOT NULL PRIMARY KEY,
+        filename VARCHAR(255) NOT NULL,
+        filepath VARCHAR(512) NOT NULL UNIQUE,
+        filetype VARCHAR(32) NOT NULL,
+        size_mb FLOAT NOT NULL,
+        uploaded_at DATETIME,
+        updated_at DATETIME,
+        deleted BOOLEAN
+        {extra}
+    )""",
+    """CREATE TABLE chunks (
+        id INTEGER NOT NULL PRIMARY KEY,
+        file_id INTEGER REFERENCES files (id) ON DELETE CASCADE,
+        chunk_index INTEGER NOT NULL,
+        content TEXT NOT NULL,
+        section_heading VARCHAR(255),
+        page_number INTEGER,
+        created_at DATETIME
+    )""",
+]
+
+
+def _head() -> str:
+    backend_dir = Path(database.__file__).resolve().parent
+    config = Config(str(backend_dir / "alembic.ini"))
+    config.set_main_option("script_location", str(backend_dir / "alembic"))
+    return ScriptDirectory.from_config(config).get_current_head()
+
+
+def _pragmas(connection):
+    return {
+        name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+        for name in ("journal_mode", "synchronous", "busy_timeout", "temp_store")
+    }
+
+
+def test_sync_and_async_engines_get_the_pragmas(tmp_path):
+    assert event.contains(database.engine, "connect", database._apply_pragmas)
+    assert event.contains(database.async_engine.sync_engine, "connect", database._apply_pragmas)
+    expected = {"journal_mode": "wal", "synchronous": 1, "busy_timeout": settings.sqlite_busy_timeout_ms, "temp_store": 2}
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'sync.db'}")
+    event.listen(engine, "connect", database._apply_pragmas)
+    with engine.connect() as connection:
+        assert _pragmas(connection) == expected
+
+    async def read_async():
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}")
+        event.listen(async_engine.sync_engine, "connect", database._apply_pragmas)
+        try:
+            async with async_engine.connect() as connection:
+                return await connection.run_sync(_pragmas)
+        finally:
+            await async_engine.dispose()
+
+    assert asyncio.run(read_async()) == expected
+
+
+@pytest.mark.parametrize("docling_script_ran", [False, True])
+def test_baseline_database_migrates_to_head(monkeypatch, tmp_path, docling_script_ran):
+    path = tmp_path / "rag.db"
+    engine = create_engine(f"sqlite:///{path}")
+    extra = ", converted_with_docling BOOLEAN DEFAULT 0, raw_markdown TEXT" if docling_script_ran else ""
+    with engine.begin() as conn:
+        for statement in _BASELINE:
+            conn.execute(text(statement.format(extra=extra)))
+        conn.execute(text(
+            "INSERT INTO files (id, filename, filepath, filetype, size_mb, deleted) VALUES (1, 'a.txt', '/f/a.txt', 'txt', 0.1, 0)"
+        ))
+        conn.execute(text("INSERT INTO chunks (id, file_id, chunk_index, content) VALUES (1, 1, 0, 'hello')"))
+    monkeypatch.setattr(database, "DB_PATH", path)
+    monkeypatch.setattr(database, "engine", engine)
+
+    database.run_migrations()
+    database.run_migrations()  # already at head: a no-op
+
+    inspector = sa.inspect(engine)
+    assert {"converted_with_docling", "raw_markdown", "namespace"} <= {c["name"] for c in inspector.get_columns("files")}
+    assert "token_count" in {c["name"] for c in inspector.get_columns("chunks")}
+    assert {"ix_files_namespace", "ix_files_deleted_uploaded_at"} <= {ix["name"] for ix in inspector.get_indexes("files")}
+    assert "ix_chunks_file_id_chunk_index" in {ix["name"] for ix in inspector.get_indexes("chunks")}
+    with sessionmaker(bind=engine)() as session:
+        record = session.get(File, 1)
+        assert (record.namespace, bool(record.converted_with_docling)) == ("default", False)
+        assert session.get(Chunk, 1).token_count is None
+        assert session.scalar(text("SELECT version_num FROM alembic_version")) == _head()
+
+
+def test_async_read_routes_match_the_sync_queries(tmp_path):
+    path = tmp_path / "routes.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    start = datetime(2026, 1, 1)
+    with factory() as session:
+        for i, (name, namespace, deleted) in enumerate(
+            [("old.txt", "default", False), ("team.txt", "team-a", False), ("gone.txt", "default", True), ("new.txt", "default", False)]
+        ):
+            record = File(
+                filename=name, filepath=f"/f/{name}", filetype="txt", size_mb=0.1, namespace=namespace,
+                deleted=deleted, uploaded_at=start + timedelta(hours=i), updated_at=start,
+            )
+            session.add(record)
+            session.flush()
+            # Inserted out of order so the route's ordering is what sorts them
+            session.add_all(Chunk(file_id=record.id, chunk_index=c, content=f"{name} {c}") for c in (2, 0, 1))
+        session.commit()
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async_factory = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+    async def override():
+        async with async_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = override
+    try:
+        client = TestClient(app)
+        with factory() as db:
+            # The queries these routes ran before they moved to AsyncSession
+            for namespace in (None, "team-a"):
+                query = db.query(File).filter_by(deleted=False)
+                if namespace:
+                    query = query.filter_by(namespace=namespace)
+                expected = [FileMeta.model_validate(f).model_dump(mode="json") for f in query.order_by(File.uploaded_at.desc())]
+                response = client.get("/files", params={"namespace": namespace} if namespace else None)
+                assert response.status_code == 200
+                assert response.json() == expected
+            assert [f["filename"] for f in client.get("/files").json()] == ["new.txt", "team.txt", "old.txt"]
+
+            chunks = db.query(Chunk).filter_by(file_id=1).order_by(Chunk.chunk_index).all()
+            response = client.get("/file/1/chunks")
+            assert response.json() == [ChunkOut.model_validate(c).model_dump(mode="json") for c in chunks]
+            assert [c["chunk_index"] for c in response.json()] == [0, 1, 2]
+            assert client.get("/file/3/chunks").status_code == 404  # tombstoned
+            assert client.get("/file/99/chunks").status_code == 404
+
+        # Tombstoned files and their chunks are not counted
+        assert client.get("/stats").json() == {"files": 3, "chunks": 9}
+    finally:
+        app.dependency_overrides.pop(get_async_db, None)
+        asyncio.run(async_engine.dispose())
@@ -0,0 +1,38 @@
+from backend.services.search import RetrievedChunk
+from backend.tools.eval_retrieval import mark_pareto, recommend, score_hits, settings_grid
+
+
+def _hit(chunk_id: int) -> RetrievedChunk:
+    return RetrievedChunk(
+        chunk_id=chunk_id, file_id=1, doc_id="1", filename="a.txt", text="t",
+        section_heading=None, page_number=None, score=0.0,
+    )
+
+
+def test_score_hits_recall_and_reciprocal_rank():
+    hits = [_hit(5), _hit(7), _hit(9)]
+    assert score_hits(hits, {7, 9}) == (1.0, 0.5)
+    assert score_hits(hits, {7, 11}) == (0.5, 0.5)
+    assert score_hits(hits, {11}) == (0.0, 0.0)
+
+
+def test_grid_only_varies_parameters_the_strategy_uses():
+    grid = settings_grid(["similarity", "mmr", "similarity_score_threshold"], [4, 30], [20, 40], [0.5], [0.3])
+    assert sum(1 for s in grid if s["retrieval_strategy"] == "similarity") == 2
+    assert [(s["top_k"], s["fetch_k"]) for s in grid if s["retrieval_strategy"] == "mmr"] == [(4, 20), (4, 40), (30, 40)]
+    assert all(s["fetch_k"] is None for s in grid if s["retrieval_strategy"] != "mmr")
+
+
+def test_pareto_front_and_recommendation():
+    def row(name, recall, p95, tokens):
+        return {"name": name, "recall_at_k": recall, "mrr": recall, "p95_ms": p95, "prompt_tokens": tokens}
+
+    results = mark_pareto([
+        row("small", 0.80, 1.0, 1000),
+        row("big", 0.95, 2.0, 3000),
+        row("mid", 0.92, 1.5, 1800),
+        row("dominated", 0.90, 2.5, 2000),
+    ])
+    assert [r["name"] for r in results if r["pareto"]] == ["small", "big", "mid"]
+    assert recommend(results, target_recall=0.9)["name"] == "mid"
+    assert recommend(results, target_recall=0.99)["name"] == "big"
@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+
+from langchain_core.documents import Document
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.models import File
+from backend.services import file_catalog as catalog_module
+from backend.services import search
+from backend.services.file_catalog import FileCatalog
+
+
+def _catalog(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'catalog.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(catalog_module, "SessionLocal", factory)
+    return FileCatalog(), factory
+
+
+def _add(factory, filename, deleted=False):
+    with factory() as session:
+        record = File(filename=filename, filepath=f"/tmp/{filename}", filetype="txt", size_mb=0.1, deleted=deleted)
+        session.add(record)
+        session.commit()
+        return record.id
+
+
+def test_load_put_remove(monkeypatch, tmp_path):
+    catalog, factory = _catalog(monkeypatch, tmp_path)
+    first = _add(factory, "a.txt")
+    assert catalog.lookup({first})[first].filename == "a.txt"
+
+    catalog.put(SimpleNamespace(id=first, filename="renamed.txt", filetype="txt", deleted=False))
+    assert catalog.lookup({first})[first].filename == "renamed.txt"
+    catalog.remove(first)
+    assert len(catalog) == 0
+
+
+def test_unknown_id_reloads_once(monkeypatch, tmp_path):
+    catalog, factory = _catalog(monkeypatch, tmp_path)
+    catalog.load()
+    # Ingested by another worker after our load
+    later = _add(factory, "b.txt")
+    assert catalog.needs_reload({later})
+    assert catalog.lookup({later})[later].filename == "b.txt"
+
+    # Orphaned ids do not trigger a reload on every query
+    loads = []
+    monkeypatch.setattr(catalog, "load", lambda: loads.append(1))
+    catalog.lookup({999})
+    assert not catalog.needs_reload({999})
+    assert loads == []
+
+
+def test_retrieval_labels_hits_without_a_session(monkeypatch, tmp_path):
+    catalog, factory = _catalog(monkeypatch, tmp_path)
+    kept = _add(factory, "kept.txt")
+    gone = _add(factory, "gone.txt", deleted=True)
+    monkeypatch.setattr(search, "file_catalog", catalog)
+
+    def fake_retrieve(query, k, file_ids=None, namespaces=None):
+        return [
+            (Document(page_content="x", metadata={"file_id": kept, "chunk_id": 1, "doc_id": str(kept)}), 0.9),
+            (Document(page_content="y", metadata={"file_id": gone, "chunk_id": 2, "doc_id": str(gone)}), 0.8),
+        ]
+
+    monkeypatch.setattr(search, "retrieve", fake_retrieve)
+    hits = search.retrieve_chunks("q", top_k=2)
+    assert [(h.file_id, h.filename) for h in hits] == [(kept, "kept.txt")]
+
+
+def test_tombstones_from_another_worker_apply_before_serving(monkeypatch, tmp_path):
+    ours, factory = _catalog(monkeypatch, tmp_path)
+    theirs = FileCatalog()
+    gone = _add(factory, "gone.txt")
+    ours.load()
+    theirs.load()
+    assert not ours.stale()
+
+    with factory() as session:
+        record = session.get(File, gone)
+        record.deleted = True
+        session.commit()
+        theirs.tombstone(record, vectors=3)
+    assert not theirs.stale()
+    assert ours.stale() and ours.needs_reload({gone})
+    ours.refresh()
+    assert ours.tombstones("default") == {gone: 0}
+    assert ours.lookup({gone})[gone].deleted
@@ -9,3 +9,38 @@ def test_health():
     resp = client.get("/health")
     assert resp.status_code == 200
     assert resp.json()["status"] == "ok"
+
+
+def test_ready_reflects_warmup_state(monkeypatch):
+    from backend.services import warmup
+
+    monkeypatch.setattr(warmup, "state", warmup.WarmupState(steps={"chat_model": "pending"}))
+    resp = client.get("/ready")
+    assert resp.status_code == 503
+    assert resp.json()["status"] == "warming"
+
+    warmup.mark_ready()
+    resp = client.get("/ready")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "ready"
+
+
+def test_failed_ingest_imports_do_not_hold_readiness(monkeypatch):
+    import asyncio
+
+    from backend.services import warmup
+
+    def no_docling():
+        raise ImportError("No module named 'docling'")
+
+    monkeypatch.setattr(warmup, "state", warmup.WarmupState())
+    monkeypatch.setattr(warmup, "STEPS", [("imports", lambda: None)])
+    monkeypatch.setattr(warmup, "_import_ingest_stack", no_docling)
+    monkeypatch.setattr(warmup.settings, "enable_ingest", True)
+    monkeypatch.setattr(warmup.settings, "read_only", False)
+
+    asyncio.run(asyncio.wait_for(warmup.run_warmup(), timeout=5))
+
+    assert warmup.state.ready
+    assert warmup.state.steps["imports"] == "ok"
+    assert warmup.state.steps["ingest_imports"].startswith("skipped:")
@@ -0,0 +1,85 @@
+import asyncio
+
+from backend.services.hedging import HedgeDeclined, hedged_stream
+from backend.services.latency import LatencyHistogram
+
+
+def _run(primary, hedge, delay=0.05):
+    recorded = []
+
+    async def scenario():
+        stream = hedged_stream(primary, hedge, delay, lambda label, seconds: recorded.append(label))
+        return [item async for item in stream]
+
+    return asyncio.run(scenario()), recorded
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    closed = []
+
+    async def primary():
+        try:
+            await asyncio.sleep(60)
+            yield "slow"
+        finally:
+            closed.append("primary")
+
+    async def hedge():
+        yield "fast"
+        yield "!"
+
+    items, recorded = _run(primary, hedge)
+    assert items == ["fast", "!"]
+    assert closed == ["primary"]
+    # Only the completed call is timed; the cancelled primary never finished
+    assert recorded == ["hedge"]
+
+
+def test_fast_primary_never_starts_hedge():
+    started = []
+
+    async def primary():
+        yield "a"
+        yield "b"
+
+    async def hedge():
+        started.append(True)
+        yield "x"
+
+    items, recorded = _run(primary, hedge)
+    assert items == ["a", "b"]
+    assert not started
+    assert recorded == ["primary"]
+
+
+def test_failed_primary_fails_over_and_declined_hedge_reraises():
+    async def primary():
+        raise RuntimeError("node down")
+        yield  # pragma: no cover
+
+    async def hedge():
+        yield "backup"
+
+    items, _ = _run(primary, hedge, delay=10)
+    assert items == ["backup"]
+
+    async def declined():
+        raise HedgeDeclined()
+        yield  # pragma: no cover
+
+    try:
+        _run(primary, declined, delay=10)
+    except RuntimeError as exc:
+        assert str(exc) == "node down"
+    else:  # pragma: no cover
+        raise AssertionError("expected the primary failure")
+
+
+def test_histogram_quantiles():
+    hist = LatencyHistogram()
+    for _ in range(90):
+        hist.observe(0.1)
+    for _ in range(10):
+        hist.observe(2.0)
+    assert 0.1 <= hist.quantile(0.5) < 0.13
+    assert 2.0 <= hist.quantile(0.99) < 2.5
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from backend.config import settings
+from backend.main import app
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Cumulative import time of backend.main; about 1.5 s with the heavy stacks deferred
+# (about 10 s when they were imported eagerly). Generous to absorb slow CI runners.
+IMPORT_BUDGET_SECONDS = float(os.environ.get("RAG_IMPORT_BUDGET_SECONDS", "4.0"))
+
+# Only ever imported on first use
+DEFERRED = (
+    "docling", "torch", "transformers", "spacy", "nltk",
+    "langchain_ollama", "langchain_openai", "langchain_chroma", "chromadb", "ollama", "openai",
+)
+
+
+def _importtime() -> dict[str, int]:
+    """Cumulative microseconds per module from ``python -X importtime``, in a fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend.main"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    cumulative: dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum, name = line.removeprefix("import time:").split("|")
+        cumulative[name.strip()] = int(cum)
+    return cumulative
+
+
+def test_startup_defers_heavy_imports_and_stays_within_budget():
+    cumulative = _importtime()
+    eager = sorted(name for name in cumulative if name.split(".")[0] in DEFERRED)
+    assert not eager, f"imported at startup: {eager[:10]}"
+    seconds = cumulative["backend.main"] / 1e6
+    assert seconds < IMPORT_BUDGET_SECONDS, f"import backend.main took {seconds:.2f}s"
+
+
+def test_ingest_endpoints_disabled_on_query_only_instances(monkeypatch):
+    monkeypatch.setattr(settings, "enable_ingest", False)
+    client = TestClient(app)
+    resp = client.post("/ingest", files={"file": ("a.txt", b"text", "text/plain")})
+    assert resp.status_code == 403
+    assert resp.json()["code"] == "INGEST_DISABLED"
+    assert client.put("/file/1", files={"file": ("a.txt", b"text", "text/plain")}).status_code == 403
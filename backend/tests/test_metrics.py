@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import database
+from backend.config import settings
+from backend.database import Base
+from backend.main import app
+from backend.services import metrics, rag_store
+
+
+@pytest.fixture(autouse=True)
+def _isolated_scrape(monkeypatch, tmp_path):
+    """Every scrape (and REGISTRY.get_sample_value) reads Chroma and SQLite; keep it off backend/storage."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(rag_store, "index_status", lambda: [{"namespace": "default", "vectors": 3}])
+    monkeypatch.setattr(settings, "chroma_dir", tmp_path / "chroma")
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_metrics_endpoint_exposes_stage_histograms_and_gauges():
+    with metrics.ingest_stage("convert"):
+        pass
+    metrics.provider_error("ollama", "m", "llm")
+
+    client = TestClient(app)
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    body = response.text
+    for name in (
+        'rag_ingest_stage_seconds_count{stage="convert"}',
+        'rag_provider_errors_total{kind="llm",model="m",provider="ollama"}',
+        'rag_cache_requests_total{cache="query_embeddings",result="hit"}',
+        "rag_inflight_streams ",
+        'rag_index_vectors{namespace="default"} 3.0',
+        "rag_chunks 0.0",
+    ):
+        assert name in body
+
+
+def test_stream_metrics_and_inflight_gauge():
+    before = _sample("rag_stream_duration_seconds_count", provider="p", model="m")
+    metrics.record_stream("p", "m", started=0.0, first_token_at=None, text="")
+    assert _sample("rag_stream_duration_seconds_count", provider="p", model="m") == before + 1
+
+    async def source():
+        yield "a"
+        assert metrics.INFLIGHT_STREAMS._value.get() >= 1
+        yield "b"
+
+    async def drain():
+        return [item async for item in metrics.tracked_stream(source())]
+
+    idle = metrics.INFLIGHT_STREAMS._value.get()
+    assert asyncio.run(drain()) == ["a", "b"]
+    assert metrics.INFLIGHT_STREAMS._value.get() == idle
+
+
+def test_batch_query_embeddings_are_timed_and_failures_counted(monkeypatch):
+    class Embeddings:
+        fail = False
+
+        def embed_documents(self, texts):
+            if self.fail:
+                raise RuntimeError("provider down")
+            return [[float(len(text))] for text in texts]
+
+    client = Embeddings()
+    model = "batch-embed"
+    monkeypatch.setattr(rag_store, "get_runtime_models", lambda: {"embedding_provider": "ollama", "embedding_model": model})
+    monkeypatch.setattr(rag_store, "get_embeddings", lambda: client)
+    timed_before = _sample("rag_query_embedding_seconds_count", provider="ollama", model=model)
+
+    assert rag_store.embed_queries(["a", "bb"]) == [[1.0], [2.0]]
+    assert _sample("rag_query_embedding_seconds_count", provider="ollama", model=model) == timed_before + 1
+
+    client.fail = True
+    with pytest.raises(RuntimeError):
+        rag_store.embed_queries(["ccc"])
+    assert _sample("rag_provider_errors_total", provider="ollama", model=model, kind="embedding") == 1
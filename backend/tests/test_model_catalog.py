@@ -0,0 +1,36 @@
+import threading
+
+from backend.config import settings
+from backend.services.providers import ModelCatalog, ModelInfo
+
+
+def test_stale_entries_are_served_while_refreshing(monkeypatch):
+    monkeypatch.setattr(settings, "model_catalog_ttl_seconds", 0.0)
+    catalog = ModelCatalog()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        if len(calls) > 1:
+            release.wait(5)
+        return [ModelInfo(id=f"m{len(calls)}", label="m")]
+
+    assert [m.id for m in catalog.get("ollama", fetch)] == ["m1"]
+    # Stale: answered from cache immediately although the refresh is blocked
+    assert [m.id for m in catalog.get("ollama", fetch)] == ["m1"]
+    release.set()
+    catalog._entries["ollama"].refreshing.result(5)
+    monkeypatch.setattr(settings, "model_catalog_ttl_seconds", 60.0)
+    assert [m.id for m in catalog.get("ollama", fetch)] == ["m2"]
+
+
+def test_failed_refresh_keeps_last_good_list():
+    catalog = ModelCatalog()
+    catalog.get("openai", lambda: [ModelInfo(id="gpt", label="gpt")])
+
+    def down():
+        raise RuntimeError("provider down")
+
+    assert [m.id for m in catalog.get("openai", down, refresh=True)] == ["gpt"]
+    assert not catalog._entries["openai"].ok
@@ -0,0 +1,74 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.routers import query as query_router
+from backend.services.search import RetrievedChunk
+from backend.services.streaming import until_disconnected
+
+client = TestClient(app)
+
+
+def _hit() -> RetrievedChunk:
+    return RetrievedChunk(
+        chunk_id=1, file_id=1, doc_id="1", filename="a.txt", text="text",
+        section_heading=None, page_number=None, score=0.1,
+    )
+
+
+def test_query_streams_sse_protocol(monkeypatch):
+    async def fake_run_query(query_text, top_k, file_ids=None, namespaces=None):
+        async def answer():
+            for piece in ["Hel", "lo"]:
+                yield piece
+        return answer(), [_hit()]
+
+    monkeypatch.setattr(query_router, "run_query", fake_run_query)
+    resp = client.post("/query", json={"query": "hi"})
+    body = resp.text
+    assert resp.status_code == 200
+    assert body.index("event: context") < body.index("event: start") < body.index("event: end")
+    assert 'data: {"raw": "Hel", "cleaned": "Hel"}' in body
+
+
+def test_until_disconnected_closes_source_when_client_leaves():
+    closed = asyncio.Event()
+
+    async def slow_model():
+        try:
+            yield "first"
+            await asyncio.sleep(60)
+            yield "never"
+        finally:
+            closed.set()
+
+    async def scenario():
+        received = []
+        polls = iter([False, True])
+
+        async def is_disconnected():
+            return next(polls)
+
+        async for item in until_disconnected(slow_model(), is_disconnected, poll_interval=0.01):
+            received.append(item)
+        return received
+
+    assert asyncio.run(scenario()) == ["first"]
+    assert closed.is_set()
+
+
+def test_compact_framing_coalesces_tokens(monkeypatch):
+    async def fake_run_query(query_text, top_k, file_ids=None, namespaces=None):
+        async def answer():
+            for piece in ["Hel", "lo", " wor", "ld"]:
+                yield piece
+        return answer(), [_hit()]
+
+    monkeypatch.setattr(query_router, "run_query", fake_run_query)
+    resp = client.post("/query", json={"query": "hi compact", "framing": "compact"})
+    body = resp.text
+    assert resp.status_code == 200
+    assert 'data: {"text": "Hello world"}' in body
+    assert '"raw"' not in body
+    assert body.index("event: context") < body.index("event: start") < body.index("event: end")
@@ -0,0 +1,345 @@
+import hashlib
+import uuid
+
+import chromadb
+import numpy as np
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from backend.config import settings
+from backend.services import rag_store
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic embeddings so the test needs no model server."""
+
+    def _embed(self, text: str):
+        digest = hashlib.sha256(text.encode()).digest()
+        return [b / 255.0 for b in digest[:16]]
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def _collection(name: str):
+    return Chroma(
+        collection_name=f"test-{name}-{uuid.uuid4().hex[:8]}",
+        embedding_function=HashEmbeddings(),
+        client=chromadb.EphemeralClient(),
+        collection_metadata={"hnsw:space": "cosine"},
+    )
+
+
+def _store(monkeypatch, files: int, per_file: int, namespaces=("default",)):
+    shards = {ns: rag_store._Shard(namespace=ns, vectorstore=_collection(ns)) for ns in namespaces}
+    rag = {"retrieval_strategy": "similarity", "top_k": 5, "score_threshold": None, "fetch_k": 20, "lambda_mult": 0.5}
+    models = {"embedding_provider": "test", "embedding_model": uuid.uuid4().hex}
+    monkeypatch.setattr(rag_store, "_shard", lambda ns, write=False: shards[ns])
+    monkeypatch.setattr(rag_store, "list_namespaces", lambda: sorted(shards))
+    monkeypatch.setattr(rag_store, "get_runtime_rag", lambda: rag)
+    monkeypatch.setattr(rag_store, "get_runtime_models", lambda: models)
+    monkeypatch.setattr(rag_store, "get_embeddings", lambda: HashEmbeddings())
+    for f in range(1, files + 1):
+        ns = namespaces[f % len(namespaces)]
+        docs = [Document(page_content=f"file {f} chunk {c}", metadata={"file_id": f}) for c in range(per_file)]
+        rag_store.add_documents(docs, ids=[f"{f}-{c}" for c in range(per_file)], namespace=ns)
+    return shards[namespaces[0]].vectorstore
+
+
+def _filtered(vs, query, k, file_ids):
+    return [d.id for d, _ in vs.similarity_search_with_score(query, k=k, filter={"file_id": {"$in": file_ids}})]
+
+
+def test_exact_plan_matches_filtered_search(monkeypatch):
+    vs = _store(monkeypatch, files=20, per_file=10)
+    got = [d.id for d, _ in rag_store.retrieve("question", k=5, file_ids=[3, 7])]
+    assert got == _filtered(vs, "question", 5, [3, 7])
+    assert all(i.split("-")[0] in {"3", "7"} for i in got)
+
+
+def test_overfetch_plan_fills_k(monkeypatch):
+    monkeypatch.setattr(settings, "scoped_exact_max_chunks", 10)
+    _store(monkeypatch, files=10, per_file=20)
+    got = rag_store.retrieve("question", k=8, file_ids=[1, 2, 3])
+    assert len(got) == 8
+    assert {d.metadata["file_id"] for d, _ in got} <= {1, 2, 3}
+
+
+def test_unknown_scope_returns_nothing(monkeypatch):
+    _store(monkeypatch, files=2, per_file=3)
+    assert rag_store.retrieve("question", k=3, file_ids=[99]) == []
+
+
+def test_result_cache_invalidated_by_index_generation(monkeypatch):
+    vs = _store(monkeypatch, files=2, per_file=3)
+    before = rag_store.cache_stats()["retrieval_results"]["hits"]
+    first = rag_store.retrieve("question", k=3)
+    assert rag_store.retrieve("question", k=3) == first
+    assert rag_store.cache_stats()["retrieval_results"]["hits"] == before + 1
+
+    rag_store.add_documents([Document(page_content="question", metadata={"file_id": 3})], ids=["3-0"])
+    fresh = rag_store.retrieve("question", k=3)
+    assert fresh[0][0].id == "3-0"
+
+
+def test_result_cache_invalidated_by_writes_in_other_workers(monkeypatch):
+    from backend.services.shared_state import SharedStamp
+
+    _store(monkeypatch, files=2, per_file=3)
+    first = rag_store.retrieve("question", k=3)
+    hits = rag_store.cache_stats()["retrieval_results"]["hits"]
+    # Another process bumps the same stamp file; this one never wrote
+    SharedStamp("index_generation").bump()
+    assert rag_store.retrieve("question", k=3) == first
+    assert rag_store.cache_stats()["retrieval_results"]["hits"] == hits
+
+
+def test_scoped_search_sees_files_written_by_other_workers(monkeypatch):
+    from backend.services.shared_state import SharedStamp
+
+    vs = _store(monkeypatch, files=3, per_file=4)
+    assert rag_store.retrieve("question", k=3, file_ids=[9]) == []
+
+    # Another worker ingests file 9 and re-ingests file 1 under new vector ids
+    vs.add_documents([Document(page_content=f"file 9 chunk {c}", metadata={"file_id": 9}) for c in range(2)], ids=["9-0", "9-1"])
+    vs.delete(ids=[f"1-{c}" for c in range(4)])
+    vs.add_documents([Document(page_content="file 1 v2", metadata={"file_id": 1})], ids=["1-v2"])
+    SharedStamp("index_generation").bump()
+
+    assert {d.id for d, _ in rag_store.retrieve("question", k=5, file_ids=[9])} == {"9-0", "9-1"}
+    assert [d.id for d, _ in rag_store.retrieve("question", k=5, file_ids=[1])] == ["1-v2"]
+
+
+def test_mmr_keeps_selection_order(monkeypatch):
+    from langchain_chroma.vectorstores import maximal_marginal_relevance
+
+    vs = _store(monkeypatch, files=4, per_file=5)
+    rag = rag_store.get_runtime_rag()
+    rag.update(retrieval_strategy="mmr", fetch_k=20, lambda_mult=0.3)
+    query = HashEmbeddings().embed_query("question")
+    got = [d.id for d, _ in rag_store.retrieve("question", k=6)]
+
+    res = vs._collection.query(query_embeddings=[query], n_results=20, include=["embeddings"])
+    selected = maximal_marginal_relevance(np.array(query, dtype=np.float32), list(res["embeddings"][0]), k=6, lambda_mult=0.3)
+    assert got == [res["ids"][0][i] for i in selected]
+
+
+def test_fanout_merges_shards_into_global_top_k(monkeypatch):
+    _store(monkeypatch, files=6, per_file=5, namespaces=("a", "b", "c"))
+    merged = rag_store.retrieve("question", k=6)
+    distances = [score for _, score in merged]
+    assert len(merged) == 6
+    assert distances == sorted(distances)
+
+    everything = _collection("all")
+    for f in range(1, 7):
+        everything.add_documents(
+            [Document(page_content=f"file {f} chunk {c}", metadata={"file_id": f}) for c in range(5)],
+            ids=[f"{f}-{c}" for c in range(5)],
+        )
+    assert [d.id for d, _ in merged] == [d.id for d, _ in everything.similarity_search_with_score("question", k=6)]
+
+
+def test_tombstoned_files_are_excluded(monkeypatch):
+    from types import SimpleNamespace
+
+    from backend.services.file_catalog import FileCatalog
+
+    _store(monkeypatch, files=4, per_file=5)
+    catalog = FileCatalog()
+    monkeypatch.setattr(rag_store, "file_catalog", catalog)
+    catalog.tombstone(SimpleNamespace(id=2, filename="b", filetype="txt", namespace="default"), vectors=5)
+    rag_store.invalidate_results()
+
+    hits = rag_store.retrieve("question", k=15)
+    assert len(hits) == 15
+    assert 2 not in {d.metadata["file_id"] for d, _ in hits}
+    assert rag_store.retrieve("question", k=3, file_ids=[2]) == []
+
+    # Too many tombstoned vectors to over-fetch: Chroma's $nin filter
+    monkeypatch.setattr(settings, "tombstone_overfetch_max", 1)
+    rag_store.invalidate_results()
+    assert 2 not in {d.metadata["file_id"] for d, _ in rag_store.retrieve("question", k=15)}
+
+
+def test_namespace_names_end_with_a_letter_or_digit():
+    assert rag_store.validate_namespace("team-a1") == "team-a1"
+    for bad in ("team-", "team_", "-team", "a" * 64):
+        try:
+            rag_store.validate_namespace(bad)
+        except Exception as exc:
+            assert exc.detail["code"] == "INVALID_NAMESPACE"
+        else:
+            raise AssertionError(bad)
+
+
+def _client(monkeypatch, tmp_path):
+    """rag_store over a throwaway persistent Chroma, with the real shard machinery."""
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    rag = {"retrieval_strategy": "similarity", "top_k": 5, "score_threshold": None, "fetch_k": 20,
+           "lambda_mult": 0.5, "hnsw_m": 16, "hnsw_construction_ef": 100, "hnsw_search_ef": 100}
+    monkeypatch.setattr(rag_store, "get_client", lambda: client)
+    monkeypatch.setattr(rag_store, "get_runtime_rag", lambda: rag)
+    monkeypatch.setattr(rag_store, "get_runtime_models", lambda: {"embedding_provider": "test", "embedding_model": "hash"})
+    monkeypatch.setattr(rag_store, "_get_embedding_client", lambda provider, model: HashEmbeddings())
+    monkeypatch.setattr(rag_store, "get_embeddings", lambda: HashEmbeddings())
+    monkeypatch.setattr(rag_store, "_shards", {})
+    monkeypatch.setattr(rag_store, "_known_namespaces", None)
+    monkeypatch.setattr(rag_store, "_RETIRE_GRACE_SECONDS", 0)
+    return client
+
+
+def _add(namespace, file_id, chunks):
+    docs = [Document(page_content=f"file {file_id} chunk {c}", metadata={"file_id": file_id}) for c in range(chunks)]
+    rag_store.add_documents(docs, ids=[f"{file_id}-{c}" for c in range(chunks)], namespace=namespace)
+
+
+def test_read_paths_do_not_create_collections(monkeypatch, tmp_path):
+    from fastapi import HTTPException
+
+    client = _client(monkeypatch, tmp_path)
+
+    assert rag_store.retrieve("question", k=3) == []
+    try:
+        rag_store.retrieve("question", k=3, namespaces=["ghost"])
+    except HTTPException as exc:
+        assert (exc.status_code, exc.detail["code"]) == (404, "NAMESPACE_NOT_FOUND")
+    else:
+        raise AssertionError("unknown namespace searched")
+    assert rag_store.index_status() == []
+    assert rag_store.load_namespace("default")["vectors"] == 0
+    assert client.list_collections() == []
+
+    docs = [Document(page_content="hello", metadata={"file_id": 1})]
+    rag_store.add_documents(docs, ids=["1-0"], namespace="team-a")
+    assert [c.name for c in client.list_collections()] == [rag_store.collection_name("team-a")]
+    assert [s["namespace"] for s in rag_store.index_status()] == ["team-a"]
+
+
+def test_rebuild_keeps_the_distance_unless_configured_to_migrate(monkeypatch, tmp_path):
+    client = _client(monkeypatch, tmp_path)
+    _add("default", 1, 4)
+    [status] = rag_store.index_status()
+    assert (status["space"], status["vectors"], status["rebuild_required"]) == ("l2", 4, False)
+    before = [d.id for d, _ in rag_store.retrieve("file 1 chunk 2", k=2)]
+
+    rag_store.get_runtime_rag()["hnsw_m"] = 32
+    assert rag_store.index_status()[0]["rebuild_required"]
+    rebuilt = rag_store.rebuild_index("default")
+    assert (rebuilt["hnsw_m"], rebuilt["space"], rebuilt["vectors"]) == (32, "l2", 4)
+    assert "previous_space" not in rebuilt
+    assert [d.id for d, _ in rag_store.retrieve("file 1 chunk 2", k=2)] == before
+
+    monkeypatch.setattr(settings, "hnsw_space", "cosine")
+    assert rag_store.index_status()[0]["rebuild_required"]
+    migrated = rag_store.rebuild_index("default")
+    assert (migrated["space"], migrated["previous_space"]) == ("cosine", "l2")
+    assert [c.name for c in client.list_collections()] == [rag_store.collection_name("default")]
+
+
+def test_rebuild_locks_out_writers_and_other_rebuilds_across_workers(monkeypatch, tmp_path):
+    from fastapi import HTTPException
+
+    from backend.services.shared_state import FileLock
+
+    _client(monkeypatch, tmp_path)
+    _add("default", 1, 2)
+    # What a rebuild running in another worker holds
+    with rag_store._writes_lock("default").hold():
+        for write in (lambda: _add("default", 2, 1), lambda: rag_store.delete_by_file(1, "default"),
+                      lambda: rag_store.ensure_writable("default")):
+            try:
+                write()
+            except HTTPException as exc:
+                assert (exc.status_code, exc.detail["code"]) == (409, "INDEX_REBUILDING")
+            else:
+                raise AssertionError("write allowed during a rebuild")
+    with FileLock("rebuild-default").hold():
+        try:
+            rag_store.rebuild_index("default")
+        except HTTPException as exc:
+            assert exc.detail["code"] == "INDEX_REBUILDING"
+        else:
+            raise AssertionError("second rebuild started")
+    _add("default", 2, 1)
+
+
+def test_shards_reopen_collections_swapped_by_another_worker(monkeypatch, tmp_path):
+    _client(monkeypatch, tmp_path)
+    _add("default", 1, 3)
+    stale = rag_store._shard("default")
+    layout = rag_store._shards_layout
+    rag_store.rebuild_index("default")
+    # Another worker still caches the shard it opened before the swap
+    rag_store._shards[("test", "hash", "default")] = stale
+    rag_store._shards_layout = layout
+    fresh = rag_store._shard("default")
+    assert fresh is not stale
+    assert fresh.vectorstore._collection.id != stale.vectorstore._collection.id
+    assert len(rag_store.retrieve("file 1 chunk 0", k=3)) == 3
+
+
+def test_fanout_rescores_namespaces_with_different_distances(monkeypatch, tmp_path):
+    client = _client(monkeypatch, tmp_path)
+    _add("l2", 1, 5)
+    monkeypatch.setattr(settings, "hnsw_space", "cosine")
+    _add("cos", 2, 5)
+    monkeypatch.setattr(settings, "hnsw_space", "l2")
+    assert {s["namespace"]: s["space"] for s in rag_store.index_status()} == {"l2": "l2", "cos": "cosine"}
+
+    query = HashEmbeddings().embed_query("question")
+    got = rag_store.search_embedding(query, 10, rag_store.get_runtime_rag(), namespaces=["l2", "cos"])
+    vectors = {}
+    for name in ("l2", "cos"):
+        page = client.get_collection(rag_store.collection_name(name)).get(include=["embeddings"])
+        vectors.update(zip(page["ids"], page["embeddings"]))
+    l2 = {i: float(np.sum((np.asarray(v) - np.asarray(query)) ** 2)) for i, v in vectors.items()}
+    assert [d.id for d, _ in got] == sorted(l2, key=l2.get)
+    assert np.allclose([score for _, score in got], sorted(l2.values()), rtol=1e-4)
+
+
+def test_snapshot_collections_keep_the_primary_distance(monkeypatch, tmp_path):
+    _client(monkeypatch, tmp_path)
+    assert rag_store.namespace_space("team-a") is None
+    assert rag_store.ensure_collection("team-a", "cosine") == "cosine"
+    # An existing collection is never recreated; the caller compares distances
+    assert rag_store.ensure_collection("team-a", "l2") == "cosine"
+    assert "team-a" in rag_store.list_namespaces()
+
+
+def test_unloads_apply_to_every_worker(monkeypatch, tmp_path):
+    from backend.services.shared_state import state_path, write_atomic
+
+    _client(monkeypatch, tmp_path)
+    _add("default", 1, 2)
+    _add("team", 2, 2)
+    assert len(rag_store.retrieve("file 2 chunk 0", k=4)) == 4
+    assert ("test", "hash", "team") in rag_store._shards
+
+    # Another worker handled POST /namespaces/team/unload
+    write_atomic(state_path(rag_store._UNLOADED_FILE), '["team"]')
+    assert not rag_store.is_loaded("team")
+    assert ("test", "hash", "team") not in rag_store._shards
+    assert {d.metadata["file_id"] for d, _ in rag_store.retrieve("file 2 chunk 0", k=4)} == {1}
+
+    rag_store.load_namespace("team")
+    assert rag_store.is_loaded("team")
+    assert state_path(rag_store._UNLOADED_FILE).read_text() == "[]"
+
+
+def test_warming_a_loaded_namespace_keeps_the_index_generation(monkeypatch, tmp_path):
+    _client(monkeypatch, tmp_path)
+    _add("default", 1, 2)
+    generation = rag_store.index_generation()
+    assert rag_store.load_namespace("default")["vectors"] == 2
+    assert rag_store.index_generation() == generation
+
+    rag_store.unload_namespace("default")
+    unloaded = rag_store.index_generation()
+    assert unloaded != generation
+    rag_store.load_namespace("default")
+    assert rag_store.index_generation() != unloaded
@@ -0,0 +1,46 @@
+import json
+import os
+
+from backend.config import settings
+from backend.services import runtime_config
+
+
+def _isolate(monkeypatch, tmp_path):
+    path = tmp_path / "runtime_config.json"
+    monkeypatch.setattr(runtime_config, "_CONFIG_PATH", path)
+    monkeypatch.setattr(runtime_config, "_loaded", False)
+    # Restored afterwards so later tests don't see this test's snapshot
+    monkeypatch.setattr(runtime_config, "_current", runtime_config._current)
+    monkeypatch.setattr(runtime_config, "_checked_at", 0.0)
+    monkeypatch.setattr(settings, "runtime_config_poll_seconds", 0.0)
+    return path
+
+
+def test_read_path_never_writes(monkeypatch, tmp_path):
+    path = _isolate(monkeypatch, tmp_path)
+    assert runtime_config.get_runtime_rag()["top_k"] == settings.top_k
+    assert runtime_config.get_runtime_snapshot().version == 0
+    assert not path.exists()
+
+
+def test_writes_are_versioned_and_external_changes_are_picked_up(monkeypatch, tmp_path):
+    path = _isolate(monkeypatch, tmp_path)
+    rag = runtime_config.get_runtime_rag()
+    rag["top_k"] = 7
+    assert runtime_config.set_runtime_rag(rag)["top_k"] == 7
+    assert runtime_config.get_runtime_snapshot().version == 1
+    assert not [p for p in tmp_path.iterdir() if p.name.endswith(".tmp")]
+
+    # Another worker replaces the file
+    raw = json.loads(path.read_text())
+    raw["rag"]["top_k"] = 9
+    raw["version"] = 2
+    tmp = tmp_path / "other.json"
+    tmp.write_text(json.dumps(raw))
+    os.replace(tmp, path)
+    snapshot = runtime_config.get_runtime_snapshot()
+    assert (snapshot.version, snapshot.rag["top_k"]) == (2, 9)
+
+    # Returned dicts are copies; the snapshot itself is read-only
+    runtime_config.get_runtime_rag()["top_k"] = 100
+    assert runtime_config.get_runtime_rag()["top_k"] == 9
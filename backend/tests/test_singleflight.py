@@ -0,0 +1,52 @@
+import asyncio
+
+from backend.services.singleflight import SingleFlight
+
+
+def test_concurrent_subscribers_share_one_run_and_late_joiners_replay():
+    runs = []
+
+    async def pipeline():
+        runs.append(1)
+        for frame in ["a", "b", "c"]:
+            await asyncio.sleep(0.01)
+            yield frame
+
+    async def scenario():
+        flights = SingleFlight()
+
+        async def collect(delay):
+            await asyncio.sleep(delay)
+            return [frame async for frame in flights.subscribe("q", pipeline)]
+
+        # The second subscriber joins after "a" has already been produced
+        return await asyncio.gather(collect(0), collect(0.015)), flights
+
+    results, flights = asyncio.run(scenario())
+    assert results == [["a", "b", "c"], ["a", "b", "c"]]
+    assert len(runs) == 1
+    assert flights.stats() == {"in_flight": 0, "started": 1, "joined": 1}
+
+
+def test_producer_cancelled_when_last_subscriber_leaves():
+    closed = asyncio.Event()
+
+    async def pipeline():
+        try:
+            yield "first"
+            await asyncio.sleep(60)
+            yield "never"
+        finally:
+            closed.set()
+
+    async def scenario():
+        flights = SingleFlight()
+        stream = flights.subscribe("q", pipeline)
+        assert await stream.__anext__() == "first"
+        await stream.aclose()
+        await asyncio.sleep(0)
+        return flights
+
+    flights = asyncio.run(scenario())
+    assert closed.is_set()
+    assert flights.stats()["in_flight"] == 0
@@ -0,0 +1,181 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import sessionmaker
+
+from backend.config import settings
+from backend.database import Base
+from backend.dependencies import require_writable
+from backend.models import Chunk, File
+from backend.services import file_catalog as catalog_module
+from backend.services import snapshot as snapshot_module
+from backend.services.file_catalog import FileCatalog
+
+MODELS = {"embedding_provider": "ollama", "embedding_model": "embed", "llm_provider": "ollama", "llm_model": "chat"}
+
+
+class _Node:
+    """One node's SQLite database and a dict standing in for its Chroma collections."""
+
+    def __init__(self, tmp_path, name):
+        engine = create_engine(f"sqlite:///{tmp_path / f'{name}.db'}")
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+            conn.execute(text("INSERT INTO alembic_version VALUES ('head1')"))
+        self.factory = sessionmaker(bind=engine)
+        self.vectors = {}  # chunk id -> (namespace, vector, metadata)
+        self.state = tmp_path / f"{name}-state.json"
+        self.spaces = {}  # namespace -> collection distance
+
+    def use(self, monkeypatch):
+        monkeypatch.setattr(snapshot_module, "SessionLocal", self.factory)
+        monkeypatch.setattr(catalog_module, "SessionLocal", self.factory)
+        monkeypatch.setattr(snapshot_module, "_STATE_PATH", self.state)
+        monkeypatch.setattr(snapshot_module, "fetch_embeddings", self.fetch)
+        monkeypatch.setattr(snapshot_module, "upsert_vectors", self.upsert)
+        monkeypatch.setattr(snapshot_module, "purge_file", self.purge)
+        monkeypatch.setattr(snapshot_module, "namespace_space", self.spaces.get)
+        monkeypatch.setattr(snapshot_module, "ensure_collection", self.spaces.setdefault)
+
+    def fetch(self, namespace, ids):
+        return {i: self.vectors[i][1] for i in ids if i in self.vectors}
+
+    def upsert(self, ids, embeddings, documents, metadatas, namespace):
+        for vector_id, vector, meta in zip(ids, embeddings, metadatas):
+            self.vectors[vector_id] = (namespace, list(vector), meta)
+
+    def purge(self, file_id, namespace, batch_size):
+        for vector_id in [i for i, (_, _, meta) in self.vectors.items() if meta["file_id"] == file_id]:
+            del self.vectors[vector_id]
+
+    def add_file(self, name, chunks, namespace="default", vectors=True):
+        self.spaces.setdefault(namespace, "l2")
+        with self.factory() as session:
+            record = File(filename=name, filepath=f"/files/{name}", filetype="txt", size_mb=0.0, namespace=namespace)
+            session.add(record)
+            session.flush()
+            rows = [Chunk(file_id=record.id, chunk_index=i, content=f"{name} {i}") for i in range(chunks)]
+            session.add_all(rows)
+            session.commit()
+            if vectors:
+                for row in rows:
+                    meta = {"file_id": record.id, "chunk_id": row.id}
+                    self.vectors[str(row.id)] = (namespace, [float(row.id), 1.0, 0.0], meta)
+            return record.id
+
+    def contents(self):
+        with self.factory() as session:
+            files = {f.id: (f.filename, f.namespace) for f in session.scalars(select(File))}
+            chunks = {(c.id, c.file_id, c.content) for c in session.scalars(select(Chunk))}
+        return files, chunks, {i: v[1] for i, v in self.vectors.items()}
+
+
+@pytest.fixture
+def nodes(monkeypatch, tmp_path):
+    monkeypatch.setattr(snapshot_module, "get_runtime_models", lambda: MODELS)
+    monkeypatch.setattr(snapshot_module, "invalidate_results", lambda: None)
+    monkeypatch.setattr(snapshot_module, "file_catalog", FileCatalog())
+    return _Node(tmp_path, "primary"), _Node(tmp_path, "replica")
+
+
+def test_full_then_delta_snapshot_keeps_replica_in_sync(monkeypatch, tmp_path, nodes):
+    primary, replica = nodes
+    monkeypatch.setattr(snapshot_module, "PART_ROWS", 2)
+    kept = primary.add_file("kept.txt", 3)
+    changed = primary.add_file("changed.txt", 2, namespace="team-a")
+    gone = primary.add_file("gone.txt", 1)
+    pending = primary.add_file("pending.txt", 2, vectors=False)  # mid-ingest: left for the next snapshot
+
+    primary.use(monkeypatch)
+    full = snapshot_module.export_snapshot(tmp_path / "s1")
+    assert (full["kind"], full["counts"]) == ("full", {"files": 3, "chunks": 6, "live_files": 3})
+    assert full["embedding"]["dim"] == 3
+    assert len(full["skipped_files"]) == 1
+
+    replica.use(monkeypatch)
+    applied = snapshot_module.apply_snapshot(tmp_path / "s1")
+    assert (applied["files"], applied["chunks"]) == (3, 6)
+    files, chunks, vectors = replica.contents()
+    assert set(files) == {kept, changed, gone}
+    assert vectors["1"] == [1.0, 1.0, 0.0]
+    assert replica.spaces == {"default": "l2", "team-a": "l2"}
+    assert replica.vectors["4"][2]["namespace"] == "team-a"
+
+    # Reingest one file (new chunks, newer updated_at) and tombstone another
+    with primary.factory() as session:
+        session.execute(Chunk.__table__.delete().where(Chunk.file_id == changed))
+        record = session.get(File, changed)
+        record.updated_at = datetime.utcnow() + timedelta(seconds=1)
+        session.add(Chunk(file_id=changed, chunk_index=0, content="changed v2"))
+        session.get(File, gone).deleted = True
+        session.commit()
+        new_chunk = session.scalar(select(Chunk.id).where(Chunk.file_id == changed))
+    primary.vectors[str(new_chunk)] = ("team-a", [9.0, 9.0, 9.0], {"file_id": changed, "chunk_id": new_chunk})
+    for chunk_id in (7, 8):  # pending's ingest finished
+        primary.vectors[str(chunk_id)] = ("default", [0.0, 0.0, 1.0], {"file_id": pending, "chunk_id": chunk_id})
+
+    primary.use(monkeypatch)
+    delta = snapshot_module.export_snapshot(tmp_path / "s2", base=tmp_path / "s1")
+    assert (delta["kind"], delta["base"]) == ("delta", full["snapshot_id"])
+    # The changed file and the file that was pending last time
+    assert delta["counts"] == {"files": 2, "chunks": 3, "live_files": 3}
+
+    replica.use(monkeypatch)
+    other_worker = FileCatalog()
+    other_worker.load()
+    snapshot_module.apply_snapshot(tmp_path / "s2")
+    primary_files, primary_chunks, primary_vectors = primary.contents()
+    files, chunks, vectors = replica.contents()
+    assert gone not in files
+    assert files == {fid: v for fid, v in primary_files.items() if fid != gone}
+    assert chunks == {c for c in primary_chunks if c[1] != gone}
+    assert vectors[str(new_chunk)] == [9.0, 9.0, 9.0]
+    assert snapshot_module.applied_snapshot()["snapshot_id"] == delta["snapshot_id"]
+    # Other workers see the change through the shared catalog stamp
+    assert other_worker.stale()
+
+    # Applying the same delta again is refused: the replica is no longer at its base
+    with pytest.raises(HTTPException) as exc:
+        snapshot_module.apply_snapshot(tmp_path / "s2")
+    assert exc.value.detail["code"] == "SNAPSHOT_BASE_MISMATCH"
+
+
+def test_apply_rejects_tampered_or_incompatible_bundles(monkeypatch, tmp_path, nodes):
+    primary, replica = nodes
+    primary.add_file("a.txt", 2)
+    primary.use(monkeypatch)
+    snapshot_module.export_snapshot(tmp_path / "s1")
+
+    replica.use(monkeypatch)
+    replica.add_file("local.txt", 1)
+    with pytest.raises(HTTPException) as exc:
+        snapshot_module.apply_snapshot(tmp_path / "s1")
+    assert exc.value.detail["code"] == "SNAPSHOT_TARGET_NOT_EMPTY"
+
+    replica.spaces["default"] = "cosine"
+    with pytest.raises(HTTPException) as exc:
+        snapshot_module.apply_snapshot(tmp_path / "s1", replace=True)
+    assert exc.value.detail["code"] == "SNAPSHOT_INCOMPATIBLE"
+    replica.spaces["default"] = "l2"
+
+    monkeypatch.setattr(snapshot_module, "get_runtime_models", lambda: {**MODELS, "embedding_model": "other"})
+    with pytest.raises(HTTPException) as exc:
+        snapshot_module.apply_snapshot(tmp_path / "s1", replace=True)
+    assert exc.value.detail["code"] == "SNAPSHOT_INCOMPATIBLE"
+
+    part = next((tmp_path / "s1").glob("vectors-*.npy"))
+    np.save(part, np.zeros((2, 3), dtype=np.float32))
+    with pytest.raises(HTTPException) as exc:
+        snapshot_module.apply_snapshot(tmp_path / "s1", replace=True)
+    assert exc.value.detail["code"] == "SNAPSHOT_INVALID"
+
+
+def test_read_only_refuses_writes(monkeypatch):
+    monkeypatch.setattr(settings, "read_only", True)
+    with pytest.raises(HTTPException) as exc:
+        require_writable()
+    assert (exc.value.status_code, exc.value.detail["code"]) == (403, "READ_ONLY")
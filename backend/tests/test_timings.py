@@ -0,0 +1,127 @@
+import asyncio
+import json
+import pstats
+
+import httpx
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from backend.config import settings
+from backend.main import app
+from backend.routers import query as query_router
+from backend.services import timings
+from backend.services.profiling import Profiler
+from backend.services.search import RetrievedChunk
+
+client = TestClient(app)
+
+
+def test_query_stream_ends_with_timings_event(monkeypatch):
+    async def fake_run_query(query_text, top_k, file_ids=None, namespaces=None):
+        with timings.stage("retrieve"):
+            pass
+
+        async def answer():
+            yield "ok"
+
+        hit = RetrievedChunk(
+            chunk_id=1, file_id=1, doc_id="1", filename="a.txt", text="text",
+            section_heading=None, page_number=None, score=0.1,
+        )
+        return answer(), [hit]
+
+    monkeypatch.setattr(query_router, "run_query", fake_run_query)
+    resp = client.post("/query", json={"query": "timed question", "framing": "compact"})
+    body = resp.text
+    assert body.index("event: start") < body.index("event: timings") < body.index("event: end")
+    frame = body[body.index("event: timings"):].split("\n")[1]
+    payload = json.loads(frame.removeprefix("data: "))
+    assert payload["correlation_id"] == resp.headers["x-correlation-id"]
+    assert {"retrieve", "first_token", "generate"} <= set(payload["stages_ms"])
+    assert "server-timing" not in resp.headers
+
+
+def test_coalesced_subscribers_see_their_own_correlation_id(monkeypatch):
+    runs = []
+
+    async def failing_run_query(query_text, top_k, file_ids=None, namespaces=None):
+        runs.append(query_text)
+        await asyncio.sleep(0.05)  # long enough for the second request to join
+        raise HTTPException(status_code=503, detail={"code": "MODEL_DOWN", "message": "down"})
+
+    monkeypatch.setattr(settings, "query_coalescing_enabled", True)
+    monkeypatch.setattr(query_router, "run_query", failing_run_query)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            async def ask(delay):
+                await asyncio.sleep(delay)
+                return await http.post("/query", json={"query": "shared question", "framing": "compact"})
+
+            return await asyncio.gather(ask(0), ask(0.01))
+
+    responses = asyncio.run(scenario())
+    assert len(runs) == 1
+    ids = [resp.headers["x-correlation-id"] for resp in responses]
+    assert ids[0] != ids[1]
+    for resp, cid in zip(responses, ids):
+        frames = [line.removeprefix("data: ") for line in resp.text.split("\n") if line.startswith("data: ")]
+        error, timings_frame = json.loads(frames[0]), json.loads(frames[1])
+        assert (error["code"], error["correlation_id"], timings_frame["correlation_id"]) == ("MODEL_DOWN", cid, cid)
+
+
+def test_server_timing_header_on_plain_endpoints():
+    resp = client.get("/health")
+    assert resp.headers["server-timing"].startswith("total;dur=")
+    assert resp.headers["x-correlation-id"]
+
+
+def test_unhandled_errors_report_the_request_correlation_id(caplog):
+    from backend.dependencies import get_async_db
+
+    async def broken_db():
+        raise RuntimeError("disk on fire")
+        yield  # pragma: no cover
+
+    app.dependency_overrides[get_async_db] = broken_db
+    try:
+        resp = TestClient(app, raise_server_exceptions=False).get("/stats")
+    finally:
+        app.dependency_overrides.pop(get_async_db, None)
+
+    assert resp.status_code == 500
+    cid = resp.json()["correlation_id"]
+    assert resp.headers["x-correlation-id"] == cid
+    assert f"cid={cid}" in caplog.text
+
+
+def test_admin_endpoints_require_token(monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", "")
+    assert client.get("/admin/profile").status_code == 403
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    assert client.get("/admin/profile").status_code == 401
+    resp = client.post(
+        "/admin/profile", json={"target": "ingest", "mode": "cprofile"}, headers={"X-Admin-Token": "secret"}
+    )
+    assert resp.status_code == 200
+    assert resp.json()["ingest"] == {"mode": "cprofile", "remaining": 1}
+    client.delete("/admin/profile/ingest", headers={"X-Admin-Token": "secret"})
+
+
+def test_armed_profiler_captures_one_request(tmp_path):
+    profiler = Profiler(tmp_path)
+    with profiler.capture("query", "cid") as name:
+        assert name is None
+
+    profiler.arm("query", "cprofile")
+    with profiler.capture("query", "cid-1") as name:
+        sum(range(1000))
+    assert name.endswith("-query-cid-1.prof")
+    pstats.Stats(str(profiler.path(name)))
+
+    profiler.arm("query", "tracemalloc")
+    with profiler.capture("query", "cid-2") as name:
+        [bytes(100) for _ in range(10)]
+    assert name.endswith(".tracemalloc")
+    assert [p["name"] for p in profiler.list()][0] == name
+    assert profiler.status() == {}
@@ -0,0 +1,28 @@
+import numpy as np
+
+from backend.tools.tune_hnsw import exact_top_k, recommend, run_grid
+
+
+def test_exact_top_k_uses_the_collection_distance():
+    corpus = np.array([[1.0, 0.0], [10.0, 1.0], [0.0, 1.0]], dtype=np.float32)
+    query = np.array([[2.0, 0.3]], dtype=np.float32)
+    # Nearest by squared L2 is [1, 0]; by angle it is [10, 1]
+    assert exact_top_k(corpus, query, 1, "l2")[0].tolist() == [0]
+    assert exact_top_k(corpus, query, 1, "cosine")[0].tolist() == [1]
+    assert exact_top_k(corpus, query, 1, "ip")[0].tolist() == [1]
+
+
+def test_grid_measures_recall_and_recommends_the_fastest_passing_setting():
+    rng = np.random.default_rng(0)
+    corpus = rng.normal(size=(300, 8)).astype(np.float32)
+    ids = [str(i) for i in range(len(corpus))]
+    results = run_grid(ids, corpus, np.arange(20), 5, [8], [100], [16, 200], "l2")
+    assert [r["hnsw_search_ef"] for r in results] == [16, 200]
+    assert results[1]["recall_at_k"] >= 0.95
+
+    def row(ef, recall, p99):
+        return {"hnsw_search_ef": ef, "recall_at_k": recall, "p99_ms": p99, "build_s": 1.0}
+
+    rows = [row(16, 0.90, 0.1), row(64, 0.97, 0.3), row(200, 0.99, 0.8)]
+    assert recommend(rows, 0.95)["hnsw_search_ef"] == 64
+    assert recommend(rows, 0.999)["hnsw_search_ef"] == 200
@@ -0,0 +1,200 @@
+"""Answer a JSONL file of questions in bulk and write results to JSONL.
+
+Input lines are ``{"id": ..., "query": "...", "file_ids": [...], "namespaces": [...]}``
+(only ``query`` is required; ``id`` defaults to the line number). Questions are
+processed in batches: one embedding call per batch, retrievals in parallel, and
+generation with bounded concurrency (still subject to provider admission control).
+Each output line carries the answer, the contexts used and per-stage timings.
+Results are appended as they complete, so re-running with the same ``--output``
+skips questions already answered (with ``--retry-errors`` failed ones are re-run
+and appended, so the last line for an id wins).
+
+    python -m backend.tools.batch_query questions.jsonl --output answers.jsonl
+    python -m backend.tools.batch_query questions.jsonl --output hits.jsonl --no-generate
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Set, TextIO
+
+from ..config import settings
+from ..database import run_migrations
+from ..services.file_catalog import file_catalog
+from ..services.generation import chat_context_length
+from ..services.providers import QueuePosition
+from ..services.query_service import pack_contexts, run_query
+from ..services.rag_store import embed_queries
+from ..services.runtime_config import get_runtime_rag
+from ..services.search import RetrievedChunk, aretrieve_chunks
+
+
+def load_questions(path: Path) -> List[Dict[str, Any]]:
+    questions = []
+    with path.open(encoding="utf-8") as handle:
+        for line_no, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not item.get("query"):
+                raise ValueError(f"{path}:{line_no}: missing 'query'")
+            item.setdefault("id", line_no)
+            questions.append(item)
+    return questions
+
+
+def completed_ids(path: Path, retry_errors: bool) -> Set[str]:
+    """Ids already present in a previous (possibly interrupted) output file."""
+    done: Set[str] = set()
+    if not path.exists():
+        return done
+    with path.open(encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by the interruption
+            if retry_errors and result.get("error"):
+                continue
+            done.add(str(result["id"]))
+    return done
+
+
+def drop_partial_line(path: Path) -> None:
+    """Cut a last line left unterminated by an interruption, so appends start on a fresh line."""
+    if not path.exists():
+        return
+    with path.open("rb+") as handle:
+        end = pos = handle.seek(0, os.SEEK_END)
+        keep = 0
+        while pos > 0:
+            step = min(pos, 64 * 1024)
+            pos -= step
+            handle.seek(pos)
+            newline = handle.read(step).rfind(b"\n")
+            if newline != -1:
+                keep = pos + newline + 1
+                break
+        if keep != end:
+            handle.truncate(keep)
+
+
+def _context(hit: RetrievedChunk) -> Dict[str, Any]:
+    return {
+        "chunk_id": hit.chunk_id,
+        "doc_id": hit.doc_id,
+        "filename": hit.filename,
+        "page": hit.page_number,
+        "section": hit.section_heading,
+        "score": hit.score,
+        "text": hit.text,
+    }
+
+
+async def _answer_one(
+    item: Dict[str, Any],
+    embed_ms: float,
+    top_k: int,
+    generate: bool,
+    retrieval_slots: asyncio.Semaphore,
+    generation_slots: asyncio.Semaphore,
+) -> Dict[str, Any]:
+    query = item["query"]
+    file_ids = item.get("file_ids") or None
+    namespaces = item.get("namespaces") or None
+    result: Dict[str, Any] = {"id": item["id"], "query": query, "answer": None, "contexts": [], "error": None}
+    timings = {"embed_ms": round(embed_ms, 2)}
+    started = time.perf_counter()
+    try:
+        async with retrieval_slots:
+            if generate:
+                answer_stream, used = await run_query(query, top_k, file_ids=file_ids, namespaces=namespaces)
+            else:
+                retrieved = await aretrieve_chunks(query, top_k=top_k, file_ids=file_ids, namespaces=namespaces)
+                # Same budget run_query packs against, so both modes report the same contexts
+                context_length = await asyncio.to_thread(chat_context_length)
+                _, used = pack_contexts(query, retrieved, context_length)
+        retrieved_at = time.perf_counter()
+        timings["retrieve_ms"] = round((retrieved_at - started) * 1000, 2)
+        result["contexts"] = [_context(hit) for hit in used]
+        if generate:
+            async with generation_slots:
+                generation_started = time.perf_counter()
+                pieces = [piece async for piece in answer_stream if not isinstance(piece, QueuePosition)]
+                timings["generate_ms"] = round((time.perf_counter() - generation_started) * 1000, 2)
+            result["answer"] = "".join(pieces)
+    except Exception as exc:
+        result["error"] = str(getattr(exc, "detail", exc))
+    timings["total_ms"] = round(embed_ms + (time.perf_counter() - started) * 1000, 2)
+    result["timings"] = timings
+    return result
+
+
+async def run_batch(
+    questions: List[Dict[str, Any]],
+    out: TextIO,
+    batch_size: int,
+    retrieval_workers: int,
+    generation_concurrency: int,
+    generate: bool,
+) -> int:
+    top_k = get_runtime_rag()["top_k"]
+    retrieval_slots = asyncio.Semaphore(retrieval_workers)
+    generation_slots = asyncio.Semaphore(generation_concurrency)
+    written = 0
+    for start in range(0, len(questions), batch_size):
+        batch = questions[start:start + batch_size]
+        embed_started = time.perf_counter()
+        # One provider round trip for the whole batch; retrievals then hit the LRU
+        await asyncio.to_thread(embed_queries, [item["query"] for item in batch])
+        embed_ms = (time.perf_counter() - embed_started) * 1000 / len(batch)
+        tasks = [
+            asyncio.create_task(_answer_one(item, embed_ms, top_k, generate, retrieval_slots, generation_slots))
+            for item in batch
+        ]
+        for finished in asyncio.as_completed(tasks):
+            result = await finished
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            written += 1
+        print(f"{min(start + batch_size, len(questions))}/{len(questions)} questions", file=sys.stderr)
+    return written
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", type=Path, help="JSONL file of questions")
+    parser.add_argument("--output", type=Path, required=True, help="JSONL results (appended; enables resume)")
+    # Kept below the query-embedding LRU size so a batch's vectors are still cached at retrieval
+    parser.add_argument("--batch-size", type=int, default=min(256, settings.query_embedding_cache_size // 2 or 1))
+    parser.add_argument("--retrieval-workers", type=int, default=settings.shard_search_workers)
+    parser.add_argument("--generation-concurrency", type=int, default=4)
+    parser.add_argument("--no-generate", action="store_true", help="retrieve and pack contexts only")
+    parser.add_argument("--retry-errors", action="store_true", help="re-run questions whose previous result has an error")
+    args = parser.parse_args(argv)
+
+    run_migrations()
+    file_catalog.load()
+    questions = load_questions(args.input)
+    done = completed_ids(args.output, args.retry_errors)
+    pending = [item for item in questions if str(item["id"]) not in done]
+    print(f"{len(questions)} questions, {len(questions) - len(pending)} already done", file=sys.stderr)
+
+    # completed_ids skipped the fragment; appending after it would corrupt the next record
+    drop_partial_line(args.output)
+    with args.output.open("a", encoding="utf-8") as out:
+        asyncio.run(
+            run_batch(
+                pending, out, args.batch_size, args.retrieval_workers,
+                args.generation_concurrency, generate=not args.no_generate,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
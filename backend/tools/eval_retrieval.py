@@ -0,0 +1,223 @@
+"""Sweep retrieval settings against labelled questions: quality versus latency and prompt size.
+
+Input lines are ``{"query": "...", "relevant": [chunk_id, ...], "file_ids": [...], "namespaces": [...]}``
+(``file_ids``/``namespaces`` optional, as in batch_query). Queries are embedded once;
+each setting of retrieval_strategy x top_k (x fetch_k x lambda_mult for mmr, x
+score_threshold for similarity_score_threshold) then searches the live index directly,
+bypassing the retrieval cache, and reports recall@k, MRR, search latency, the recall
+of what survives prompt packing, and the resulting prompt tokens. Settings on the
+Pareto front (no other setting is at least as good on recall, MRR, p95 latency and
+prompt tokens, and better on one) are marked with ``*``.
+
+    python -m backend.tools.eval_retrieval labelled.jsonl --top-k 4,8,12,20 --json eval.json
+    python -m backend.tools.eval_retrieval labelled.jsonl --target-recall 0.9 --apply
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from itertools import product
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from ..database import run_migrations
+from ..services.file_catalog import file_catalog
+from ..services.generation import build_prompt, chat_context_length
+from ..services.query_service import pack_contexts
+from ..services.rag_store import embed_queries, search_embedding
+from ..services.runtime_config import get_runtime_rag
+from ..services.search import RetrievedChunk, label_results
+from ..services.tokens import count_tokens
+
+_SETTING_KEYS = ("retrieval_strategy", "top_k", "fetch_k", "lambda_mult", "score_threshold")
+
+
+def _ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _floats(value: str) -> List[float]:
+    return [float(v) for v in value.split(",") if v.strip()]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    return float(np.percentile(np.asarray(values), pct)) if values else 0.0
+
+
+def load_labelled(path: Path) -> List[Dict[str, Any]]:
+    questions = []
+    with path.open(encoding="utf-8") as handle:
+        for line_no, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not item.get("query") or not item.get("relevant"):
+                raise ValueError(f"{path}:{line_no}: needs 'query' and a non-empty 'relevant' list")
+            item["relevant"] = {int(chunk_id) for chunk_id in item["relevant"]}
+            questions.append(item)
+    return questions
+
+
+def settings_grid(
+    strategies: List[str],
+    top_ks: List[int],
+    fetch_ks: List[int],
+    lambdas: List[float],
+    thresholds: List[float],
+) -> List[Dict[str, Any]]:
+    grid: List[Dict[str, Any]] = []
+    for strategy, k in product(strategies, top_ks):
+        base = {"retrieval_strategy": strategy, "top_k": k, "fetch_k": None, "lambda_mult": None, "score_threshold": None}
+        if strategy == "mmr":
+            # fetch_k below k would just be k
+            grid += [{**base, "fetch_k": f, "lambda_mult": lam} for f, lam in product(fetch_ks, lambdas) if f >= k]
+        elif strategy == "similarity_score_threshold":
+            grid += [{**base, "score_threshold": t} for t in thresholds]
+        else:
+            grid.append(base)
+    return grid
+
+
+def score_hits(hits: List[RetrievedChunk], relevant: set[int]) -> tuple[float, float]:
+    """Recall of the relevant chunks among hits, and reciprocal rank of the first one."""
+    ids = [hit.chunk_id for hit in hits]
+    recall = len(relevant.intersection(ids)) / len(relevant)
+    rank = next((i for i, chunk_id in enumerate(ids, start=1) if chunk_id in relevant), None)
+    return recall, (1 / rank if rank else 0.0)
+
+
+def evaluate(
+    questions: List[Dict[str, Any]],
+    embeddings: List[List[float]],
+    setting: Dict[str, Any],
+    base_rag: Dict[str, Any],
+    context_length: int,
+) -> Dict[str, Any]:
+    rag = {**base_rag, **setting}
+    k = setting["top_k"]
+    recalls, mrrs, prompt_recalls, latencies, prompt_tokens = [], [], [], [], []
+    for item, embedding in zip(questions, embeddings):
+        started = time.perf_counter()
+        results = search_embedding(
+            embedding, k, rag, file_ids=item.get("file_ids") or None, namespaces=item.get("namespaces") or None
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits = label_results(results)
+        recall, rr = score_hits(hits, item["relevant"])
+        recalls.append(recall)
+        mrrs.append(rr)
+        contexts, used = pack_contexts(item["query"], hits, context_length)
+        prompt_recalls.append(score_hits(used, item["relevant"])[0])
+        prompt_tokens.append(count_tokens(build_prompt(item["query"], contexts)))
+    return {
+        **setting,
+        "recall_at_k": round(float(np.mean(recalls)), 4),
+        "mrr": round(float(np.mean(mrrs)), 4),
+        "prompt_recall": round(float(np.mean(prompt_recalls)), 4),
+        "p50_ms": round(_percentile(latencies, 50), 3),
+        "p95_ms": round(_percentile(latencies, 95), 3),
+        "prompt_tokens": round(float(np.mean(prompt_tokens)), 1),
+    }
+
+
+def _dominates(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    better_or_equal = (
+        a["recall_at_k"] >= b["recall_at_k"]
+        and a["mrr"] >= b["mrr"]
+        and a["p95_ms"] <= b["p95_ms"]
+        and a["prompt_tokens"] <= b["prompt_tokens"]
+    )
+    strictly = (
+        a["recall_at_k"] > b["recall_at_k"]
+        or a["mrr"] > b["mrr"]
+        or a["p95_ms"] < b["p95_ms"]
+        or a["prompt_tokens"] < b["prompt_tokens"]
+    )
+    return better_or_equal and strictly
+
+
+def mark_pareto(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    for r in results:
+        r["pareto"] = not any(_dominates(other, r) for other in results if other is not r)
+    return results
+
+
+def recommend(results: List[Dict[str, Any]], target_recall: float) -> Dict[str, Any]:
+    """Lowest p95 among front settings meeting the recall target within 5% of their fewest prompt tokens.
+
+    Falls back to the best recall when nothing meets the target.
+    """
+    passing = [r for r in results if r["pareto"] and r["recall_at_k"] >= target_recall]
+    if passing:
+        fewest = min(r["prompt_tokens"] for r in passing)
+        cheap = [r for r in passing if r["prompt_tokens"] <= fewest * 1.05]
+        return min(cheap, key=lambda r: (r["p95_ms"], r["prompt_tokens"]))
+    return max(results, key=lambda r: (r["recall_at_k"], r["mrr"], -r["p95_ms"]))
+
+
+def _fmt(value: Any) -> str:
+    return "-" if value is None else str(value)
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", type=Path, help="JSONL of labelled questions")
+    parser.add_argument("--strategies", default="similarity,similarity_score_threshold,mmr")
+    parser.add_argument("--top-k", type=_ints, default=[4, 8, 12, 20])
+    parser.add_argument("--fetch-k", type=_ints, default=[20, 40])
+    parser.add_argument("--lambda-mult", type=_floats, default=[0.3, 0.5, 0.7])
+    parser.add_argument("--score-threshold", type=_floats, default=[0.2, 0.4])
+    parser.add_argument("--target-recall", type=float, default=0.9)
+    parser.add_argument("--json", type=Path, help="write all results here")
+    parser.add_argument("--apply", action="store_true", help="write the recommendation to runtime config")
+    args = parser.parse_args(argv)
+
+    run_migrations()
+    file_catalog.load()
+    questions = load_labelled(args.input)
+    started = time.perf_counter()
+    embeddings = embed_queries([item["query"] for item in questions])
+    embed_ms = (time.perf_counter() - started) * 1000 / len(questions)
+    base_rag = dict(get_runtime_rag())
+    context_length = chat_context_length()
+
+    grid = settings_grid(
+        [s.strip() for s in args.strategies.split(",") if s.strip()],
+        args.top_k, args.fetch_k, args.lambda_mult, args.score_threshold,
+    )
+    # Warm the shards and HNSW pages so the first setting is not charged for loading
+    evaluate(questions[:1], embeddings[:1], grid[0], base_rag, context_length)
+    results = mark_pareto([evaluate(questions, embeddings, s, base_rag, context_length) for s in grid])
+    results.sort(key=lambda r: (-r["recall_at_k"], -r["mrr"], r["prompt_tokens"]))
+
+    print(f"{len(questions)} questions, query embedding {embed_ms:.1f} ms each (not included below)")
+    print(
+        f"  {'strategy':<27} {'k':>3} {'fetch':>5} {'lambda':>6} {'thresh':>6} {'recall':>7} {'mrr':>6} "
+        f"{'in-prompt':>9} {'p50 ms':>7} {'p95 ms':>7} {'tokens':>7}"
+    )
+    for r in results:
+        print(
+            f"{'*' if r['pareto'] else ' '} {r['retrieval_strategy']:<27} {r['top_k']:>3} {_fmt(r['fetch_k']):>5} "
+            f"{_fmt(r['lambda_mult']):>6} {_fmt(r['score_threshold']):>6} {r['recall_at_k']:>7.4f} {r['mrr']:>6.4f} "
+            f"{r['prompt_recall']:>9.4f} {r['p50_ms']:>7.2f} {r['p95_ms']:>7.2f} {r['prompt_tokens']:>7.0f}"
+        )
+    best = recommend(results, args.target_recall)
+    print("recommended:", json.dumps({key: best[key] for key in _SETTING_KEYS}))
+
+    if args.json:
+        args.json.write_text(json.dumps({"embed_ms": round(embed_ms, 2), "results": results}, indent=2) + "\n", encoding="utf-8")
+
+    if args.apply:
+        from ..services.runtime_config import set_runtime_rag
+
+        rag = get_runtime_rag()
+        rag.update({key: best[key] for key in _SETTING_KEYS if best[key] is not None})
+        set_runtime_rag(rag)
+        print("applied to runtime config")
+
+
+if __name__ == "__main__":
+    main()
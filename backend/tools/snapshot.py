@@ -0,0 +1,65 @@
+"""Export the index as a versioned snapshot bundle, or load one on a read replica.
+
+A bundle is a directory: ``manifest.json`` (snapshot id, base, schema revision,
+embedding model and dimension, every live file's version, sha256 of each data file),
+``files.jsonl`` (file rows) and per-namespace parts of aligned ``chunks-*.jsonl``
+(chunk rows, text included) and ``vectors-*.npy`` (float32). A delta (``--base``)
+carries only the files changed since the base bundle; files its manifest no longer
+lists are deleted on import. Deltas apply in order on top of their base.
+
+    python -m backend.tools.snapshot export snapshots/0001
+    python -m backend.tools.snapshot export snapshots/0002 --base snapshots/0001
+    RAG_READ_ONLY=true python -m backend.tools.snapshot import snapshots/0001
+    python -m backend.tools.snapshot verify snapshots/0002
+
+Import while the replica's server is stopped (it opens the same Chroma directory),
+or apply deltas to a running one with POST /admin/snapshot/apply.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import List
+
+from fastapi import HTTPException
+
+from ..database import run_migrations
+from ..services.file_catalog import file_catalog
+from ..services.snapshot import apply_snapshot, export_snapshot, verify_snapshot
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="write a full or delta bundle")
+    export.add_argument("out", type=Path, help="new bundle directory")
+    export.add_argument("--base", type=Path, help="earlier bundle (or its manifest.json) to write a delta against")
+    load = commands.add_parser("import", help="apply a bundle to this node")
+    load.add_argument("bundle", type=Path)
+    load.add_argument("--replace", action="store_true", help="overwrite an index that did not come from a snapshot")
+    verify = commands.add_parser("verify", help="check a bundle's checksums")
+    verify.add_argument("bundle", type=Path)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "verify":
+            manifest = verify_snapshot(args.bundle)
+            result = {key: manifest[key] for key in ("snapshot_id", "kind", "base", "created_at", "counts")}
+        else:
+            run_migrations()
+            file_catalog.load()
+            if args.command == "export":
+                result = export_snapshot(args.out, args.base)
+            else:
+                result = apply_snapshot(args.bundle, replace=args.replace)
+    except HTTPException as exc:
+        print(json.dumps(exc.detail, indent=2), file=sys.stderr)
+        return 1
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""Benchmark HNSW parameters against exact search and recommend a setting.
+
+Samples stored chunk vectors from a namespace as queries, computes exact top-k by
+brute force in the collection's own distance (hnsw:space), then for each
+(M, construction_ef) builds a throwaway in-memory index with that distance and
+sweeps search_ef, measuring recall@k and p50/p99 query latency.
+
+    python -m backend.tools.tune_hnsw --namespace default --k 10 --target-recall 0.95
+    python -m backend.tools.tune_hnsw --apply   # write the recommendation to runtime config
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import uuid
+from typing import Any, Dict, List
+
+import chromadb
+import numpy as np
+
+from ..config import settings
+from ..services.chroma_client import get_client
+from ..services.rag_store import collection_space, collection_name
+
+
+def _ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    return float(np.percentile(np.asarray(values), pct)) if values else 0.0
+
+
+def load_corpus(namespace: str, max_corpus: int, batch_size: int = 5000):
+    collection = get_client().get_collection(collection_name(namespace))
+    ids: List[str] = []
+    vectors: List[np.ndarray] = []
+    offset = 0
+    while len(ids) < max_corpus:
+        page = collection.get(include=["embeddings"], limit=min(batch_size, max_corpus - len(ids)), offset=offset)
+        if not len(page["ids"]):
+            break
+        ids.extend(page["ids"])
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+    if not ids:
+        raise SystemExit(f"Namespace '{namespace}' has no vectors to benchmark")
+    return ids, np.vstack(vectors), collection_space(collection)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int, space: str = "l2") -> np.ndarray:
+    if space == "cosine":
+        corpus = corpus / np.maximum(np.linalg.norm(corpus, axis=1, keepdims=True), 1e-12)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    if space in ("cosine", "ip"):
+        distances = -(queries @ corpus.T)
+    else:  # squared l2; the per-query |q|^2 term does not change the ranking
+        distances = (corpus * corpus).sum(axis=1) - 2.0 * (queries @ corpus.T)
+    return np.argpartition(distances, k - 1, axis=1)[:, :k]
+
+
+def run_grid(
+    ids: List[str],
+    corpus: np.ndarray,
+    sample: np.ndarray,
+    k: int,
+    grid_m: List[int],
+    grid_construction_ef: List[int],
+    grid_search_ef: List[int],
+    space: str = "l2",
+) -> List[Dict[str, Any]]:
+    truth = exact_top_k(corpus, corpus[sample], k, space)
+    truth_ids = [{ids[i] for i in row} for row in truth]
+    client = chromadb.EphemeralClient()
+    results: List[Dict[str, Any]] = []
+    for m in grid_m:
+        for construction_ef in grid_construction_ef:
+            name = f"tune-{uuid.uuid4().hex[:12]}"
+            collection = client.create_collection(
+                name,
+                metadata={"hnsw:space": space, "hnsw:M": m, "hnsw:construction_ef": construction_ef},
+            )
+            started = time.perf_counter()
+            for start in range(0, len(ids), 5000):
+                collection.add(ids=ids[start:start + 5000], embeddings=corpus[start:start + 5000])
+            build_s = time.perf_counter() - started
+            for search_ef in grid_search_ef:
+                collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+                latencies: List[float] = []
+                recall = 0.0
+                for row, idx in enumerate(sample):
+                    t0 = time.perf_counter()
+                    res = collection.query(query_embeddings=[corpus[idx]], n_results=k, include=[])
+                    latencies.append((time.perf_counter() - t0) * 1000)
+                    recall += len(truth_ids[row] & set(res["ids"][0])) / k
+                results.append(
+                    {
+                        "hnsw_m": m,
+                        "hnsw_construction_ef": construction_ef,
+                        "hnsw_search_ef": search_ef,
+                        "recall_at_k": round(recall / len(sample), 4),
+                        "p50_ms": round(_percentile(latencies, 50), 3),
+                        "p99_ms": round(_percentile(latencies, 99), 3),
+                        "build_s": round(build_s, 3),
+                    }
+                )
+            client.delete_collection(name)
+    return results
+
+
+def recommend(results: List[Dict[str, Any]], target_recall: float) -> Dict[str, Any]:
+    """Lowest-p99 setting meeting the recall target, else the highest-recall one."""
+    passing = [r for r in results if r["recall_at_k"] >= target_recall]
+    if passing:
+        return min(passing, key=lambda r: (r["p99_ms"], r["build_s"]))
+    return max(results, key=lambda r: (r["recall_at_k"], -r["p99_ms"]))
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--namespace", default=settings.default_namespace)
+    parser.add_argument("--k", type=int, default=settings.top_k)
+    parser.add_argument("--samples", type=int, default=200, help="stored chunks used as queries")
+    parser.add_argument("--max-corpus", type=int, default=200_000, help="vectors loaded for the benchmark")
+    parser.add_argument("--grid-m", type=_ints, default=[8, 16, 32])
+    parser.add_argument("--grid-construction-ef", type=_ints, default=[100, 200])
+    parser.add_argument("--grid-search-ef", type=_ints, default=[16, 32, 64, 128, 256])
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--apply", action="store_true", help="write the recommendation to runtime config")
+    args = parser.parse_args(argv)
+
+    ids, corpus, space = load_corpus(args.namespace, args.max_corpus)
+    k = min(args.k, len(ids))
+    rng = np.random.default_rng(args.seed)
+    sample = rng.choice(len(ids), size=min(args.samples, len(ids)), replace=False)
+    results = run_grid(ids, corpus, sample, k, args.grid_m, args.grid_construction_ef, args.grid_search_ef, space)
+
+    print(f"{'M':>4} {'c_ef':>6} {'s_ef':>6} {'recall':>8} {'p50 ms':>8} {'p99 ms':>8} {'build s':>8}")
+    for r in results:
+        print(
+            f"{r['hnsw_m']:>4} {r['hnsw_construction_ef']:>6} {r['hnsw_search_ef']:>6} "
+            f"{r['recall_at_k']:>8.4f} {r['p50_ms']:>8.3f} {r['p99_ms']:>8.3f} {r['build_s']:>8.3f}"
+        )
+    best = recommend(results, args.target_recall)
+    print("recommended:", json.dumps(best))
+
+    if args.apply:
+        from ..services.runtime_config import get_runtime_rag, set_runtime_rag
+
+        rag = get_runtime_rag()
+        rag.update({key: best[key] for key in ("hnsw_m", "hnsw_construction_ef", "hnsw_search_ef")})
+        set_runtime_rag(rag)
+        print("applied; POST /providers/rag/index/rebuild to rebuild collections with the new M/construction_ef")
+
+
+if __name__ == "__main__":
+    main()